@@ -15,42 +15,31 @@ Usage:
     --app-pass "APPLICATION PASSWORD" \
     --limit 10 \
     --out comparison.csv \
-    --json summary.json
+    --json summary.json \
+    [--warmup 2 --repeat 9 --order random] \
+    [--resume] [--checkpoint-every 50] \
+    [--record run.dnirec | --replay run.dnirec [--replay-timing original]]
+
+Rows are written to the CSV as posts complete and checkpointed; after a
+crash or Ctrl-C, rerun with the same arguments plus --resume to continue.
 """
 
 import argparse
+import asyncio
 import base64
-import csv
+import itertools
 import json
+import random
 import sys
-import time
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
-
-
-def fetch(url, headers=None, timeout=20):
-    """Fetch URL and return (status, headers_dict, body_bytes, elapsed_ms)"""
-    req = Request(url)
-    if headers:
-        for k, v in headers.items():
-            req.add_header(k, v)
+from urllib.parse import urlsplit
 
-    start = time.time()
-    try:
-        with urlopen(req, timeout=timeout) as resp:
-            status = resp.getcode()
-            body = resp.read()
-            elapsed = (time.time() - start) * 1000  # ms
-            hdrs = {k.lower(): v for k, v in resp.headers.items()}
-            return status, hdrs, body, elapsed
-    except HTTPError as e:
-        elapsed = (time.time() - start) * 1000
-        hdrs = {k.lower(): v for k, v in (e.headers.items() if e.headers else [])}
-        body = e.read() if hasattr(e, 'read') else b""
-        return e.code, hdrs, body, elapsed
-    except Exception as e:
-        elapsed = (time.time() - start) * 1000
-        return 0, {}, b"", elapsed
+from dni_engine import Engine, format_rate_stats, iterate_in_thread, run_pipeline
+from dni_http import ACCEPT_ENCODING, PHASES, digest_label, fmt_metric, format_pool_stats, phase_values, server_metrics
+from dni_jsonstream import CatalogStreamError, open_catalog
+from dni_replay import TIMINGS, format_archive_stats, make_pool
+from dni_report import ReportError, RunningStats, StreamingReport
+from dni_stats import bootstrap_ci, bootstrap_resamples, describe, median, median_fields
+from dni_tokens import DEFAULT_CACHE, TokenCounter, content_key, format_token_stats, load_backend
 
 
 def b64_basic(user, pw):
@@ -62,11 +51,6 @@ def kb(nbytes):
     return round((nbytes or 0) / 1024.0, 2)
 
 
-def estimate_tokens_raw(nbytes):
-    # Heuristic: ~1 token per 4 bytes
-    return int(round((nbytes or 0) / 4.0))
-
-
 def analyze_noise(standard_json):
     """Analyze noise in Standard API response"""
     noise_analysis = {
@@ -86,6 +70,88 @@ def analyze_noise(standard_json):
     return noise_analysis
 
 
+def standard_first(order, post_idx, pair_idx, rng):
+    """Whether pair pair_idx (warmups included) of the post_idx-th post fetches Standard first.
+
+    alternate flips with both the post and the pair, so even --repeat 1
+    splits the posts half Standard-first, half DNI-first.
+    """
+    if order == "fixed":
+        return True
+    if order == "alternate":
+        return (post_idx + pair_idx) % 2 == 0
+    return rng.random() < 0.5
+
+
+def protocol_statistics(stats, n_boot, seed):
+    """Percentiles and 95% bootstrap CIs over per-post medians.
+
+    The speedup CI resamples posts with their Standard/DNI pair intact and
+    uses the ratio of median latencies, which one slow outlier cannot move.
+    """
+    std_ms, dni_ms, std_kb, dni_kb = (stats.values(f"pair.{n}") for n in ("standard_ms", "dni_ms", "standard_kb", "dni_kb"))
+    if not std_ms:
+        return {}
+
+    def speedup_of(pairs):
+        d = median([p[1] for p in pairs])
+        return median([p[0] for p in pairs]) / d if d > 0 else 0.0
+
+    pairs = list(zip(std_ms, dni_ms))
+    lo, hi = bootstrap_ci(pairs, speedup_of, n_boot, 0.95, seed)
+    return {
+        "standard_time_ms": describe(std_ms, n_boot=n_boot, seed=seed),
+        "dni_time_ms": describe(dni_ms, n_boot=n_boot, seed=seed),
+        "standard_kb": describe(std_kb, n_boot=n_boot, seed=seed),
+        "dni_kb": describe(dni_kb, n_boot=n_boot, seed=seed),
+        "size_savings_pct": describe([(s - d) / s * 100.0 for s, d in zip(std_kb, dni_kb) if s > 0], n_boot=n_boot, seed=seed),
+        "speedup": {
+            "ratio_of_medians": round(speedup_of(pairs), 3),
+            "ci95": [round(lo, 3), round(hi, 3)],
+            "per_post": describe([s / d for s, d in pairs if d > 0], n_boot=n_boot, seed=seed),
+        },
+    }
+
+
+def phase_summary(stats, n_boot, seed):
+    """Percentiles per request phase and API, and the paired Standard - DNI TTFB difference.
+
+    The TTFB difference isolates server work from body size: download time
+    grows with the payload, time to first byte does not.
+    """
+    if not stats.names("phase."):
+        return {}
+    pairs = list(zip(stats.values("ttfb_pair.standard"), stats.values("ttfb_pair.dni")))
+
+    def diff_of(ps):
+        return median([a - b for a, b in ps])
+
+    lo, hi = bootstrap_ci(pairs, diff_of, n_boot, 0.95, seed) if pairs else (0.0, 0.0)
+    return {
+        "standard_api": stats.describe_prefix("phase.standard.", seed=seed),
+        "dual_native_api": stats.describe_prefix("phase.dni.", seed=seed),
+        "ttfb_standard_minus_dni_ms": {
+            "median": round(diff_of(pairs), 3) if pairs else 0.0,
+            "ci95": [round(lo, 3), round(hi, 3)],
+        },
+    }
+
+
+def server_summary(stats, n_boot, seed):
+    """Percentiles of each profiler metric per API, plus DNI - Standard mean deltas."""
+    if not stats.names("srv."):
+        return {}
+    standard = stats.describe_prefix("srv.standard.", n_boot=n_boot, seed=seed)
+    dni = stats.describe_prefix("srv.dni.", n_boot=n_boot, seed=seed)
+    return {
+        "standard_api": standard,
+        "dual_native_api": dni,
+        "dni_minus_standard_mean": {
+            n: round(dni[n]["mean"] - standard[n]["mean"], 3) for n in sorted(set(standard) & set(dni))
+        },
+    }
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--base", required=True, help="WordPress base URL")
@@ -94,49 +160,101 @@ def main():
     ap.add_argument("--limit", type=int, default=10, help="Max number of posts to test")
     ap.add_argument("--out", required=True, help="CSV output path")
     ap.add_argument("--json", required=True, help="Summary JSON output path")
-    ap.add_argument("--delay", type=float, default=0.3, help="Delay between requests (seconds)")
+    ap.add_argument("--concurrency", type=int, default=1, help="Max in-flight requests per host, and posts in flight (default: 1 = serial)")
+    ap.add_argument("--rate", default="adaptive", choices=("adaptive", "fixed"), help="adaptive: find the concurrency the site sustains, up to --concurrency; fixed: always --concurrency")
+    ap.add_argument("--throttle-retries", dest="throttle_retries", type=int, default=3, help="Retries of a request throttled with 429/503 (after Retry-After)")
+    ap.add_argument("--endpoint-concurrency", dest="endpoint_concurrency", type=int, default=None, help="Max in-flight requests per endpoint (Standard/DNI); default: --concurrency")
     ap.add_argument("--status", default="publish", help="Post status filter")
+    ap.add_argument("--warmup", type=int, default=0, help="Unmeasured request pairs per post before sampling")
+    ap.add_argument("--repeat", type=int, default=1, help="Measured request pairs per post (per-post time = median)")
+    ap.add_argument("--order", default="alternate", choices=["parallel", "fixed", "alternate", "random"],
+                    help="Within a pair: both at once, Standard first, ABBA alternation (default), or seeded random")
+    ap.add_argument("--seed", type=int, default=0, help="Seed for --order random and the bootstrap")
+    ap.add_argument("--bootstrap", type=int, default=0, help="Bootstrap resamples for confidence intervals (default: 2000, fewer above 1000 posts)")
+    ap.add_argument("--accept-encoding", dest="accept_encoding", default=ACCEPT_ENCODING,
+                    help=f"Accept-Encoding to negotiate (default: {ACCEPT_ENCODING}; 'identity' = uncompressed)")
+    ap.add_argument("--resume", action="store_true", help="Continue an interrupted run from <out>.ckpt, skipping posts already written")
+    ap.add_argument("--checkpoint-every", dest="checkpoint_every", type=int, default=50, help="Posts between CSV/journal checkpoints")
+    ap.add_argument("--tokenizer", default="auto", help="Token counter: auto, tiktoken[:ENC], hf:PATH, approx, bytes (see dni_tokens.py)")
+    ap.add_argument("--token-cache", dest="token_cache", default=DEFAULT_CACHE, help=f"SQLite cache of token counts by ETag/CID (default {DEFAULT_CACHE}; '' to disable)")
+    archive = ap.add_mutually_exclusive_group()
+    archive.add_argument("--record", help="Also write every HTTP exchange to this archive (see dni_replay.py)")
+    archive.add_argument("--replay", help="Answer every request from this archive instead of the network")
+    ap.add_argument("--replay-timing", dest="replay_timing", default="fast", choices=TIMINGS, help="fast: memory speed; original: recorded TTFB and download times")
     args = ap.parse_args()
+    args.repeat = max(1, args.repeat)
+
+    try:
+        counter = TokenCounter(load_backend(args.tokenizer), args.token_cache or None)
+    except (ImportError, ValueError) as e:
+        print(f"ERROR: Tokenizer {args.tokenizer!r} unavailable: {e}")
+        sys.exit(1)
+    print(f"Tokenizer: {counter.backend.name}")
 
     base = args.base.rstrip("/")
+    site = urlsplit(base).netloc
+    # Per-post values stream into running accumulators; only fields that need
+    # percentiles or a bootstrap keep their samples
+    stats = RunningStats(keep=("pair.", "phase.", "ttfb_pair.", "srv."))
+    report = StreamingReport(args.out, stats, resume=args.resume, checkpoint_every=args.checkpoint_every, fingerprint={
+        "tool": "benchmark_api_vs_dni", "base": base, "status": args.status, "limit": args.limit,
+        "warmup": args.warmup, "repeat": args.repeat, "order": args.order, "seed": args.seed,
+        "accept_encoding": args.accept_encoding,
+    })
+    try:
+        resumed = report.open()
+    except (ReportError, OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    if resumed:
+        print(f"Resuming: {resumed} posts already in {args.out}")
     auth_header = f"Basic {b64_basic(args.user, args.app_pass)}"
     headers = {"Authorization": auth_header, "Accept": "application/json"}
+    # One keep-alive pool for every request, so timings exclude per-request handshakes
+    try:
+        pool = make_pool(args.record, args.replay, args.replay_timing, accept_encoding=args.accept_encoding)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
 
-    # Fetch catalog from DNI
+    # Stream the catalog from DNI: posts start as soon as their entry arrives
     print(f"Fetching catalog from {base}/wp-json/dual-native/v1/catalog...")
     catalog_url = f"{base}/wp-json/dual-native/v1/catalog?status={args.status}"
-    st, hdrs, body, elapsed = fetch(catalog_url, headers)
+    st, stream = open_catalog(pool, catalog_url, headers)
 
     if st != 200:
         print(f"ERROR: Catalog fetch failed with HTTP {st}")
         sys.exit(1)
 
     try:
-        catalog = json.loads(body.decode("utf-8"))
-    except Exception as e:
+        meta = stream.read_header()
+    except CatalogStreamError as e:
         print(f"ERROR: Invalid catalog JSON: {e}")
         sys.exit(1)
 
-    items = catalog.get("items", [])
-    total = len(items)
+    # The plugin emits count before items, so the total is known up front
+    total = int(meta.get("count") or 0)
     print(f"Found {total} posts in catalog")
 
-    sample = items[:args.limit] if args.limit > 0 else items
-    print(f"Testing {len(sample)} posts...\n")
+    sample = itertools.islice(stream, args.limit) if args.limit > 0 else stream
+    n_sample = min(total, args.limit) if args.limit > 0 else total
+    # --limit picks the same catalog prefix on every attempt; finished posts are skipped
+    todo = (it for it in sample if it.get("rid") not in report.done)
+    print(f"Testing {n_sample - report.resumed} posts...\n")
 
-    rows = []
     n_304_standard = 0
     n_304_dni = 0
+    engine = Engine(pool.fetch, args.concurrency, args.endpoint_concurrency, adaptive=args.rate == "adaptive",
+                    max_retries=args.throttle_retries)
 
-    for idx, item in enumerate(sample, 1):
+    async def benchmark_post(idx, item):
+        nonlocal n_304_standard, n_304_dni
         rid = item.get("rid")
         cid = item.get("cid", "")
         title = item.get("title", "")
 
         if not rid:
-            continue
-
-        print(f"[{idx}/{len(sample)}] Post {rid}: {title[:60]}")
+            return None
 
         # Standard WordPress REST API endpoint
         standard_url = f"{base}/wp-json/wp/v2/posts/{rid}"
@@ -144,162 +262,272 @@ def main():
         # Dual-Native API endpoint
         dni_url = f"{base}/wp-json/dual-native/v1/posts/{rid}"
 
-        # Fetch Standard API (first time)
-        st_standard, h_standard, b_standard, time_standard = fetch(standard_url, headers)
+        # Protocol: --warmup unmeasured pairs, then --repeat measured pairs.
+        # The order within a pair is fixed, alternating (ABBA, across posts and
+        # pairs) or seeded-random per post. Pairs are numbered across the warmup.
+        rng = random.Random(f"{args.seed}:{rid}")
+        pairs = itertools.count()
+
+        async def measure_pair():
+            if args.order == "parallel":
+                return await asyncio.gather(
+                    engine.fetch(standard_url, headers, "standard"),
+                    engine.fetch(dni_url, headers, "dni"),
+                )
+            if standard_first(args.order, idx, next(pairs), rng):
+                r_s = await engine.fetch(standard_url, headers, "standard")
+                return r_s, await engine.fetch(dni_url, headers, "dni")
+            r_d = await engine.fetch(dni_url, headers, "dni")
+            return await engine.fetch(standard_url, headers, "standard"), r_d
+
+        for _ in range(args.warmup):
+            await measure_pair()
+        res_standard, res_dni = await measure_pair()
+        st_standard, h_standard, b_standard, _ = res_standard
+        st_dni, h_dni, b_dni, _ = res_dni
+        runs_standard = [res_standard]
+        runs_dni = [res_dni]
+        for _ in range(1, args.repeat if st_standard == st_dni == 200 else 0):
+            r_s, r_d = await measure_pair()
+            if r_s[0] == 200:
+                runs_standard.append(r_s)
+            if r_d[0] == 200:
+                runs_dni.append(r_d)
+        samples_standard = [r[3] for r in runs_standard]
+        samples_dni = [r[3] for r in runs_dni]
+        time_standard = median(samples_standard)
+        time_dni = median(samples_dni)
+        # Server-side profiler values (X-Bench-*, Server-Timing), median over the samples
+        srv_standard = median_fields([server_metrics(r[1]) for r in runs_standard])
+        srv_dni = median_fields([server_metrics(r[1]) for r in runs_dni])
 
         if st_standard != 200:
-            print(f"  WARN: Standard API fetch failed with HTTP {st_standard}")
-            continue
-
-        # Fetch DNI API (first time)
-        st_dni, h_dni, b_dni, time_dni = fetch(dni_url, headers)
+            print(f"[{idx}/{n_sample}] Post {rid}: WARN: Standard API fetch failed with HTTP {st_standard}")
+            return None
 
         if st_dni != 200:
-            print(f"  WARN: DNI API fetch failed with HTTP {st_dni}")
-            continue
+            print(f"[{idx}/{n_sample}] Post {rid}: WARN: DNI API fetch failed with HTTP {st_dni}")
+            return None
 
         # Parse both responses
         try:
             standard_json = json.loads(b_standard.decode("utf-8"))
             dni_json = json.loads(b_dni.decode("utf-8"))
         except Exception as e:
-            print(f"  WARN: JSON parse error: {e}")
-            continue
+            print(f"[{idx}/{n_sample}] Post {rid}: WARN: JSON parse error: {e}")
+            return None
+
+        # Content-Digest was checked while the DNI body streamed in
+        dni_digest = digest_label(res_dni.digest_ok)
+        if dni_digest == "mismatch":
+            print(f"[{idx}/{n_sample}] Post {rid}: WARN: DNI Content-Digest mismatch")
 
         # Analyze noise in Standard API
         noise = analyze_noise(standard_json)
 
-        # Test zero-fetch for Standard API
+        # Test zero-fetch for Standard API and DNI API
         etag_standard = h_standard.get("etag", "").strip().strip('"')
-        if etag_standard:
-            st_cg, h_cg, b_cg, _ = fetch(standard_url, {**headers, "If-None-Match": f'"{etag_standard}"'})
-            if st_cg == 304:
-                n_304_standard += 1
-
-        # Test zero-fetch for DNI API
         etag_dni = h_dni.get("etag", "").strip().strip('"')
-        if etag_dni:
-            st_cg2, h_cg2, b_cg2, _ = fetch(dni_url, {**headers, "If-None-Match": f'"{etag_dni}"'})
-            if st_cg2 == 304:
-                n_304_dni += 1
 
-        # Calculate sizes
+        async def conditional(url, etag, endpoint):
+            if not etag:
+                return None
+            return await engine.fetch(url, {**headers, "If-None-Match": f'"{etag}"'}, endpoint)
+
+        cg_standard, cg_dni = await asyncio.gather(
+            conditional(standard_url, etag_standard, "standard"),
+            conditional(dni_url, etag_dni, "dni"),
+        )
+        if cg_standard and cg_standard[0] == 304:
+            n_304_standard += 1
+        if cg_dni and cg_dni[0] == 304:
+            n_304_dni += 1
+
+        # Calculate sizes: decoded (what a client parses) and on the wire (what egress costs)
         standard_kb = kb(len(b_standard))
         dni_kb = kb(len(b_dni))
-
-        # Calculate tokens
-        standard_tokens = estimate_tokens_raw(len(b_standard))
-        dni_tokens = estimate_tokens_raw(len(b_dni))
+        standard_wire_kb = kb(res_standard.transfer["wire_bytes"])
+        dni_wire_kb = kb(res_dni.transfer["wire_bytes"])
+        decode_standard = median([r.transfer["decode_ms"] for r in runs_standard])
+        decode_dni = median([r.transfer["decode_ms"] for r in runs_dni])
+
+        # Calculate tokens (cached by ETag/CID, tokenized off the event loop)
+        standard_tokens, dni_tokens = await asyncio.get_running_loop().run_in_executor(None, counter.count_many, [
+            (content_key("wp", b_standard, etag_standard, site), b_standard),
+            (content_key("mr", b_dni, etag_dni, site), b_dni),
+        ])
 
         # Calculate savings
         size_savings_pct = round(((standard_kb - dni_kb) / standard_kb * 100), 2) if standard_kb > 0 else 0.0
+        wire_savings_pct = round(((standard_wire_kb - dni_wire_kb) / standard_wire_kb * 100), 2) if standard_wire_kb > 0 else 0.0
         token_savings_pct = round(((standard_tokens - dni_tokens) / standard_tokens * 100), 2) if standard_tokens > 0 else 0.0
         speedup = round(time_standard / time_dni, 2) if time_dni > 0 else 0.0
+        timing = "ms" if args.repeat == 1 else f"ms, median of {args.repeat}"
+
+        print(f"[{idx}/{n_sample}] Post {rid}: {title[:60]}\n"
+              f"  Standard API: {standard_kb:.2f} KB, {standard_tokens} tokens ({time_standard:.1f}{timing})\n"
+              f"  Dual-Native:  {dni_kb:.2f} KB, {dni_tokens} tokens ({time_dni:.1f}{timing})\n"
+              f"  Savings: {size_savings_pct:.1f}% size, {token_savings_pct:.1f}% tokens, {speedup:.2f}x faster\n"
+              f"  Wire: Standard {standard_wire_kb:.2f} KB ({res_standard.transfer['encoding']}), "
+              f"DNI {dni_wire_kb:.2f} KB ({res_dni.transfer['encoding']}), {wire_savings_pct:.1f}% smaller\n"
+              f"  Noise: {noise['links_count']} _links, {noise['wp_comments']} WP comments, {noise['wp_classes']} WP classes")
+        if "queries_delta" in srv_standard and "queries_delta" in srv_dni:
+            print(f"  Server: Standard {srv_standard.get('time_route_ms', 0):.0f} ms route, {srv_standard['queries_delta']:.0f} queries | "
+                  f"DNI {srv_dni.get('time_route_ms', 0):.0f} ms route, {srv_dni['queries_delta']:.0f} queries")
+        ph_standard = median_fields([phase_values(r) for r in runs_standard])
+        ph_dni = median_fields([phase_values(r) for r in runs_dni])
+
+        row = {
+            "rid": rid,
+            "title": title,
+            "standard_kb": f"{standard_kb:.2f}",
+            "dni_kb": f"{dni_kb:.2f}",
+            "standard_tokens": standard_tokens,
+            "dni_tokens": dni_tokens,
+            "size_savings_pct": f"{size_savings_pct:.2f}",
+            "token_savings_pct": f"{token_savings_pct:.2f}",
+            "time_standard_ms": f"{time_standard:.1f}",
+            "time_dni_ms": f"{time_dni:.1f}",
+            "speedup_factor": f"{speedup:.2f}",
+            "has_links": noise['has_links'],
+            "links_count": noise['links_count'],
+            "wp_comments_count": noise['wp_comments'],
+            "wp_classes_count": noise['wp_classes'],
+            "html_escaped_chars": noise['html_escaped_chars'],
+            "etag_standard": etag_standard[:20] if etag_standard else "",
+            "etag_dni": etag_dni[:20] if etag_dni else "",
+            "dni_digest": dni_digest,
+            "time_standard_samples_ms": ";".join(f"{t:.2f}" for t in samples_standard),
+            "time_dni_samples_ms": ";".join(f"{t:.2f}" for t in samples_dni),
+            "standard_wire_kb": f"{standard_wire_kb:.2f}",
+            "dni_wire_kb": f"{dni_wire_kb:.2f}",
+            "wire_savings_pct": f"{wire_savings_pct:.2f}",
+            "standard_encoding": res_standard.transfer["encoding"],
+            "dni_encoding": res_dni.transfer["encoding"],
+            "standard_decode_ms": f"{decode_standard:.3f}",
+            "dni_decode_ms": f"{decode_dni:.3f}",
+        }
+        row.update({f"standard_{p}": fmt_metric(ph_standard.get(p)) for p in PHASES})
+        row.update({f"dni_{p}": fmt_metric(ph_dni.get(p)) for p in PHASES})
+        row.update({f"standard_srv_{n}": fmt_metric(v) for n, v in sorted(srv_standard.items())})
+        row.update({f"dni_srv_{n}": fmt_metric(v) for n, v in sorted(srv_dni.items())})
+
+        # Exact numbers behind the summary; journaled so --resume can replay them
+        values = {
+            "standard_kb": standard_kb, "dni_kb": dni_kb,
+            "standard_wire_kb": standard_wire_kb, "dni_wire_kb": dni_wire_kb,
+            "standard_decode_ms": decode_standard, "dni_decode_ms": decode_dni,
+            "standard_tokens": standard_tokens, "dni_tokens": dni_tokens,
+            "size_savings_pct": size_savings_pct, "wire_savings_pct": wire_savings_pct,
+            "token_savings_pct": token_savings_pct, "speedup_factor": speedup,
+            "time_standard_ms": time_standard, "time_dni_ms": time_dni,
+            "links_count": noise["links_count"], "wp_comments": noise["wp_comments"], "wp_classes": noise["wp_classes"],
+            "digest_mismatch": int(dni_digest == "mismatch"), "digest_missing": int(dni_digest == "none"),
+            "pair.standard_ms": time_standard, "pair.dni_ms": time_dni,
+            "pair.standard_kb": len(b_standard) / 1024.0, "pair.dni_kb": len(b_dni) / 1024.0,
+        }
+        values.update({f"phase.standard.{p}": v for p, v in ph_standard.items()})
+        values.update({f"phase.dni.{p}": v for p, v in ph_dni.items()})
+        if "ttfb_ms" in ph_standard and "ttfb_ms" in ph_dni:
+            values.update({"ttfb_pair.standard": ph_standard["ttfb_ms"], "ttfb_pair.dni": ph_dni["ttfb_ms"]})
+        values.update({f"srv.standard.{n}": v for n, v in srv_standard.items()})
+        values.update({f"srv.dni.{n}": v for n, v in srv_dni.items()})
+        report.write(rid, row, values)
+        return None
+
+    async def run():
+        return await run_pipeline(iterate_in_thread(todo), benchmark_post, args.concurrency)
 
-        print(f"  Standard API: {standard_kb:.2f} KB, {standard_tokens} tokens ({time_standard:.0f}ms)")
-        print(f"  Dual-Native:  {dni_kb:.2f} KB, {dni_tokens} tokens ({time_dni:.0f}ms)")
-        print(f"  Savings: {size_savings_pct:.1f}% size, {token_savings_pct:.1f}% tokens, {speedup:.2f}x faster")
-        print(f"  Noise: {noise['links_count']} _links, {noise['wp_comments']} WP comments, {noise['wp_classes']} WP classes")
-
-        rows.append([
-            rid,
-            title,
-            f"{standard_kb:.2f}",
-            f"{dni_kb:.2f}",
-            standard_tokens,
-            dni_tokens,
-            f"{size_savings_pct:.2f}",
-            f"{token_savings_pct:.2f}",
-            f"{time_standard:.0f}",
-            f"{time_dni:.0f}",
-            f"{speedup:.2f}",
-            noise['has_links'],
-            noise['links_count'],
-            noise['wp_comments'],
-            noise['wp_classes'],
-            noise['html_escaped_chars'],
-            etag_standard[:20] if etag_standard else "",
-            etag_dni[:20] if etag_dni else "",
-        ])
-
-        time.sleep(args.delay)
-
-    # Write CSV
-    print(f"\nWriting results to {args.out}...")
-    with open(args.out, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow([
-            "rid",
-            "title",
-            "standard_kb",
-            "dni_kb",
-            "standard_tokens",
-            "dni_tokens",
-            "size_savings_pct",
-            "token_savings_pct",
-            "time_standard_ms",
-            "time_dni_ms",
-            "speedup_factor",
-            "has_links",
-            "links_count",
-            "wp_comments_count",
-            "wp_classes_count",
-            "html_escaped_chars",
-            "etag_standard",
-            "etag_dni",
-        ])
-        w.writerows(rows)
-
-    # Calculate summary
-    def avg(vals):
-        vals = [v for v in vals if isinstance(v, (int, float))]
-        return round(sum(vals) / len(vals), 2) if vals else 0.0
-
-    standard_kbs = [float(r[2]) for r in rows]
-    dni_kbs = [float(r[3]) for r in rows]
-    standard_tokens_list = [int(r[4]) for r in rows]
-    dni_tokens_list = [int(r[5]) for r in rows]
-    size_savings = [float(r[6]) for r in rows]
-    token_savings = [float(r[7]) for r in rows]
-    standard_times = [float(r[8]) for r in rows]
-    dni_times = [float(r[9]) for r in rows]
-    speedups = [float(r[10]) for r in rows]
-    links_counts = [int(r[12]) for r in rows]
-    wp_comments = [int(r[13]) for r in rows]
-    wp_classes = [int(r[14]) for r in rows]
-
-    total_tested = len(rows)
+    try:
+        asyncio.run(run())
+    except CatalogStreamError as e:
+        print(f"ERROR: Invalid catalog JSON: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted after {report.rows} posts; rerun with --resume to continue")
+        sys.exit(130)
+    finally:
+        engine.close()
+        stream.close()
+        report.close()
+    catalog_stats = {
+        "items_read": stream.items_seen,
+        "first_item_ms": round(stream.first_item_ms or 0.0, 1),
+        "stream_ms": round(stream.response.elapsed_ms or 0.0, 1),
+    }
+    pool_stats = pool.stats()
+    archive_stats = pool.archive_stats() if args.record or args.replay else {}
+    pool.close()
+    rate_stats = engine.rate_stats()
+    token_stats = counter.stats()
+    counter.close()
+    print("\n" + format_pool_stats(pool_stats))
+    if archive_stats:
+        print(format_archive_stats(archive_stats))
+    print(format_rate_stats(rate_stats))
+    print(format_token_stats(token_stats))
+
+    print(f"\nWrote {report.rows} rows to {args.out}")
+
+    total_tested = report.rows
+    n_boot = args.bootstrap or bootstrap_resamples(total_tested)
     summary = {
         "site": args.base,
         "posts_tested": total_tested,
         "standard_api": {
-            "avg_payload_kb": avg(standard_kbs),
-            "avg_tokens": avg(standard_tokens_list),
-            "avg_time_ms": avg(standard_times),
+            "avg_payload_kb": stats.mean("standard_kb"),
+            "avg_wire_kb": stats.mean("standard_wire_kb"),
+            "avg_decode_ms": stats.mean("standard_decode_ms"),
+            "avg_tokens": stats.mean("standard_tokens"),
+            "avg_time_ms": stats.mean("time_standard_ms"),
             "data_type": "Escaped HTML String",
             "safety": "None (Overwrite)",
-            "avg_links_count": avg(links_counts),
-            "avg_wp_comments": avg(wp_comments),
-            "avg_wp_classes": avg(wp_classes),
+            "avg_links_count": stats.mean("links_count"),
+            "avg_wp_comments": stats.mean("wp_comments"),
+            "avg_wp_classes": stats.mean("wp_classes"),
             "zero_fetch_support": "Limited (ETags available)",
         },
         "dual_native_api": {
-            "avg_payload_kb": avg(dni_kbs),
-            "avg_tokens": avg(dni_tokens_list),
-            "avg_time_ms": avg(dni_times),
+            "avg_payload_kb": stats.mean("dni_kb"),
+            "avg_wire_kb": stats.mean("dni_wire_kb"),
+            "avg_decode_ms": stats.mean("dni_decode_ms"),
+            "avg_tokens": stats.mean("dni_tokens"),
+            "avg_time_ms": stats.mean("time_dni_ms"),
             "data_type": "Structured JSON",
             "safety": "Optimistic Locking (If-Match)",
             "avg_links_count": 0,
             "avg_wp_comments": 0,
             "avg_wp_classes": 0,
             "zero_fetch_support": "Full (CID-based)",
+            "digest_mismatches": int(stats.total("digest_mismatch")),
+            "digest_missing": int(stats.total("digest_missing")),
+            "digest_mb_per_s": pool_stats["digest_mb_per_s"],
         },
         "improvements": {
-            "avg_size_savings_pct": avg(size_savings),
-            "avg_token_savings_pct": avg(token_savings),
-            "avg_speedup_factor": avg(speedups),
+            "avg_size_savings_pct": stats.mean("size_savings_pct"),
+            "avg_wire_savings_pct": stats.mean("wire_savings_pct"),
+            "avg_token_savings_pct": stats.mean("token_savings_pct"),
+            "avg_speedup_factor": stats.mean("speedup_factor"),
             "noise_eliminated": "100% (_links, WP comments, HTML escaping)",
-        }
+        },
+        "protocol": {
+            "warmup": args.warmup,
+            "repeat": args.repeat,
+            "order": args.order,
+            "seed": args.seed,
+            "bootstrap_resamples": n_boot,
+            "clock": "perf_counter_ns",
+            "accept_encoding": args.accept_encoding,
+            "resumed_posts": report.resumed,
+        },
+        "statistics": protocol_statistics(stats, n_boot, args.seed),
+        "phases": phase_summary(stats, n_boot, args.seed),
+        "server_metrics": server_summary(stats, min(500, n_boot), args.seed),
+        "tokens": token_stats,
+        "catalog": catalog_stats,
+        "http_pool": pool_stats,
+        "archive": archive_stats,
+        "rate_control": rate_stats,
     }
 
     print(f"Writing summary to {args.json}...")
@@ -319,8 +547,17 @@ def main():
     print(f"{'Metric':<30} {'Standard API':<20} {'Dual-Native':<20} {'Improvement':<20}")
     print("-"*70)
     print(f"{'Payload Size':<30} {summary['standard_api']['avg_payload_kb']:.2f} KB{'':<14} {summary['dual_native_api']['avg_payload_kb']:.2f} KB{'':<14} ~{summary['improvements']['avg_size_savings_pct']:.0f}% Smaller")
+    print(f"{'Wire Size':<30} {summary['standard_api']['avg_wire_kb']:.2f} KB{'':<14} {summary['dual_native_api']['avg_wire_kb']:.2f} KB{'':<14} ~{summary['improvements']['avg_wire_savings_pct']:.0f}% Smaller")
     print(f"{'Token Count':<30} {summary['standard_api']['avg_tokens']:.0f}{'':<16} {summary['dual_native_api']['avg_tokens']:.0f}{'':<16} ~{summary['improvements']['avg_token_savings_pct']:.0f}% Cheaper")
     print(f"{'Response Time':<30} {summary['standard_api']['avg_time_ms']:.0f} ms{'':<15} {summary['dual_native_api']['avg_time_ms']:.0f} ms{'':<15} {summary['improvements']['avg_speedup_factor']:.2f}x Faster")
+    speedup_stats = summary["statistics"].get("speedup")
+    if speedup_stats:
+        lo, hi = speedup_stats["ci95"]
+        print(f"{'Speedup (median ratio)':<30} {speedup_stats['ratio_of_medians']:.2f}x, 95% CI {lo:.2f}x - {hi:.2f}x")
+    ttfb = summary["phases"].get("ttfb_standard_minus_dni_ms")
+    if ttfb:
+        lo, hi = ttfb["ci95"]
+        print(f"{'TTFB gap (Standard - DNI)':<30} {ttfb['median']:.2f} ms, 95% CI {lo:.2f} - {hi:.2f} ms")
     print(f"{'Data Type':<30} {summary['standard_api']['data_type']:<20} {summary['dual_native_api']['data_type']:<20} Better Logic")
     print(f"{'Safety':<30} {summary['standard_api']['safety']:<20} {summary['dual_native_api']['safety']:<20} Safe Writes")
     print(f"{'Noise (_links)':<30} {summary['standard_api']['avg_links_count']:.0f} objects{'':<13} {summary['dual_native_api']['avg_links_count']} objects{'':<13} 100% Clean")
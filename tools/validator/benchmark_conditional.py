@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Conditional-request benchmark: the 304 fast path vs a full 200
+
+get_post_mr answers a matching If-None-Match with 304 straight from the
+stored _dni_cid post meta, without building the MR. That is the main
+server-side saving for an agent that re-reads posts. This tool measures it
+per post, for every route and for each way a request can meet the cache:
+
+  200    no If-None-Match: the MR is built and sent
+  304    If-None-Match with the current ETag: the fast path
+  stale  If-None-Match with an outdated tag (an agent behind an edit): the
+         tags are compared, then the MR is built and sent
+  cold   the stored CID is missing (--cold): the post is re-saved with its
+         content unchanged, which deletes _dni_cid like any save_post, then
+         requested with its old tag. The MR is built, the CID computed and
+         stored, and a 200 sent
+
+Routes: mr and md (Application Password auth), plus public_mr and public_md
+with --public. The Markdown route has no fast path: it builds the MR and
+the Markdown before comparing, so its 304 only saves bytes. The report
+shows that next to the MR numbers.
+
+Each post gets --reps rounds. A round runs every (route, case) once in a
+shuffled order, so drift on the server hits every case alike. Timed per
+request: total time, TTFB, body bytes and, when the site sends profiler
+headers (X-Bench-*, Server-Timing), the server route time and query count.
+
+Usage:
+  python tools/validator/benchmark_conditional.py \
+    --base https://example.com \
+    --user USERNAME \
+    --app-pass "APPLICATION PASSWORD" \
+    [--posts 12,40-60 | --limit 20 --status publish] [--reps 10] [--public] \
+    [--cold] [--label 1.0.0] [--out conditional.csv] [--samples requests.csv] [--json conditional.json] \
+    [--record run.dnirec | --replay run.dnirec [--replay-timing original]]
+
+  # Track the fast path across plugin versions
+  python tools/validator/benchmark_conditional.py ... --label 1.0.0 --out before.csv
+  # upgrade
+  python tools/validator/benchmark_conditional.py ... --label 1.1.0 --out after.csv
+  python tools/validator/dni_compare.py before.csv after.csv
+
+Notes:
+  - --out has one row per post with the median of each route/case metric
+    (mr_304_ms, mr_200_ttfb_ms, mr_cold_srv_time_route_ms, ...), the shape
+    dni_compare.py reads.
+  - --cold MODIFIES the posts: each cold sample re-saves the post through
+    /wp/v2/posts/{id}, which bumps its modified date and, with revisions
+    enabled, adds a revision. Use scratch posts (or dni_standin.py).
+  - Requests are sent one at a time, so each one is timed without
+    contention from the tool itself.
+  - Exit status is 1 if a 304 case was answered with anything but 304 (the
+    fast path is not working) or a 200 case failed.
+"""
+
+import argparse
+import base64
+import csv
+import json
+import random
+import sys
+import time
+
+from dni_client import DualNativeError, bare_etag
+from dni_http import format_pool_stats, server_metrics
+from dni_jsonstream import CatalogStreamError, open_catalog
+from dni_replay import TIMINGS, format_archive_stats, make_pool
+from dni_stats import bootstrap_ci, describe, median, wilcoxon_greater
+
+API_PREFIX = "/wp-json/dual-native/v1"
+# route -> (path under API_PREFIX, Accept, needs auth)
+ROUTES = {
+    "mr": ("/posts/{rid}", "application/json", True),
+    "md": ("/posts/{rid}/md", "text/markdown", True),
+    "public_mr": ("/public/posts/{rid}", "application/json", False),
+    "public_md": ("/public/posts/{rid}/md", "text/markdown", False),
+}
+CASES = ("200", "304", "stale", "cold")
+EXPECTED = {"200": 200, "304": 304, "stale": 200, "cold": 200}
+# Well-formed but never a real CID or Markdown ETag
+STALE_TAG = "sha256-" + "0" * 64
+# Per-request values summarized per route/case and written per post to --out
+METRICS = ("ms", "ttfb_ms", "srv_time_route_ms", "srv_queries_delta")
+
+
+def b64_basic(user, pw):
+    raw = f"{user}:{pw}".encode("utf-8")
+    return base64.b64encode(raw).decode("ascii")
+
+
+def parse_post_list(spec):
+    """"12,40-60" -> [12, 40, 41, ..., 60] (order kept, duplicates dropped); raises ValueError."""
+    out = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, sep, hi = part.partition("-")
+        if sep:
+            a, b = int(lo), int(hi)
+            if b < a:
+                raise ValueError(f"empty range {part}")
+            out.extend(range(a, b + 1))
+        else:
+            out.append(int(part))
+    return list(dict.fromkeys(out))
+
+
+class Prober:
+    """Sends the timed requests for one site over a shared pool."""
+
+    def __init__(self, pool, base, user, app_pass, timeout=20):
+        self.pool = pool
+        self.base = base.rstrip("/")
+        self.auth = {"Authorization": f"Basic {b64_basic(user, app_pass)}"}
+        self.timeout = timeout
+
+    def get(self, route, rid, tag=None):
+        path, accept, auth = ROUTES[route]
+        h = {"Accept": accept}
+        if auth:
+            h.update(self.auth)
+        if tag:
+            h["If-None-Match"] = f'"{tag}"'
+        return self.pool.fetch(self.base + API_PREFIX + path.format(rid=rid), h, self.timeout)
+
+    def resave(self, rid):
+        """Save the post with its content unchanged (save_post clears _dni_cid); returns ms or raises DualNativeError."""
+        url = f"{self.base}/wp-json/wp/v2/posts/{rid}"
+        h = dict(self.auth, Accept="application/json")
+        st, _, body, read_ms = self.pool.request("GET", url + "?context=edit", h, None, self.timeout)
+        if st != 200:
+            raise DualNativeError(st, f"wp/v2 edit-context read of {rid} failed")
+        try:
+            raw = json.loads(body.decode("utf-8"))["content"]["raw"]
+        except (ValueError, KeyError, TypeError):
+            raise DualNativeError(st, "wp/v2 response has no content.raw (needs edit_post capability)")
+        h["Content-Type"] = "application/json"
+        payload = json.dumps({"content": raw}).encode("utf-8")
+        st, _, _, write_ms = self.pool.request("POST", url, h, payload, self.timeout)
+        if st != 200:
+            raise DualNativeError(st, f"wp/v2 update of {rid} failed")
+        return read_ms + write_ms
+
+
+def sample_row(res, rid, route, case, rep):
+    st, headers, body, ms = res
+    row = {"rid": rid, "route": route, "case": case, "rep": rep, "status": st,
+           "expected": EXPECTED[case], "ms": round(ms, 3),
+           "ttfb_ms": round(res.phases["ttfb_ms"], 3) if res.phases and "ttfb_ms" in res.phases else None,
+           "bytes": len(body), "wire_bytes": res.transfer["wire_bytes"] if res.transfer else len(body)}
+    row.update({f"srv_{k}": v for k, v in server_metrics(headers).items()})
+    return row
+
+
+def profile_post(prober, rid, routes, cases, reps, rng, rows, skipped):
+    """Run --reps shuffled rounds of every (route, case) on one post, appending sample rows."""
+    tags = {}
+    for route in routes:
+        st, headers, _, _ = prober.get(route, rid)
+        if st == 200 and bare_etag(headers.get("etag")):
+            tags[route] = bare_etag(headers.get("etag"))
+        else:
+            skipped.append({"rid": rid, "route": route, "reason": f"HTTP {st}" if st != 200 else "no ETag"})
+    pairs = [(r, c) for r in tags for c in cases if c != "cold" or r in ("mr", "public_mr")]
+    for rep in range(reps):
+        rng.shuffle(pairs)
+        for route, case in pairs:
+            if case == "cold":
+                prober.resave(rid)
+            tag = {"200": None, "304": tags[route], "stale": STALE_TAG, "cold": tags[route]}[case]
+            res = prober.get(route, rid, tag)
+            rows.append(sample_row(res, rid, route, case, rep))
+            if case == "cold":
+                # The re-save changed the post's modified date, so every route has a new ETag
+                for other in tags:
+                    st, headers, _, _ = res if other == route else prober.get(other, rid)
+                    if st == 200 and bare_etag(headers.get("etag")):
+                        tags[other] = bare_etag(headers.get("etag"))
+
+
+def _values(rows, metric):
+    return [r[metric] for r in rows if r.get(metric) is not None]
+
+
+def paired(by_post, a, b, metric):
+    """[(median a, median b)] per post that has both cases."""
+    out = []
+    for cases in by_post.values():
+        va, vb = _values(cases.get(a, []), metric), _values(cases.get(b, []), metric)
+        if va and vb:
+            out.append((median(va), median(vb)))
+    return out
+
+
+def ratio_of_medians(pairs):
+    den = median([p[1] for p in pairs])
+    return median([p[0] for p in pairs]) / den if den > 0 else 0.0
+
+
+def compare_cases(by_post, slow, fast, n_boot, seed):
+    """How much faster `fast` is than `slow` over the posts that have both, per metric."""
+    out = {}
+    for metric in METRICS:
+        pairs = paired(by_post, slow, fast, metric)
+        if not pairs:
+            continue
+        diffs = [s - f for s, f in pairs]
+        n, _, p = wilcoxon_greater(diffs)
+        lo, hi = bootstrap_ci(pairs, ratio_of_medians, n_boot, 0.95, seed)
+        out[metric] = {
+            "posts": len(pairs),
+            f"{slow}_p50": round(median([s for s, _ in pairs]), 3),
+            f"{fast}_p50": round(median([f for _, f in pairs]), 3),
+            "saving_p50": round(median(diffs), 3),
+            "ratio": round(ratio_of_medians(pairs), 3),
+            "ratio_ci": [round(lo, 3), round(hi, 3)],
+            "p_value": round(p, 6),
+        }
+    return out
+
+
+def summarize(rows, routes, cases, n_boot, seed):
+    groups = {}
+    for r in rows:
+        groups.setdefault((r["route"], r["case"]), []).append(r)
+    report = {}
+    for route in routes:
+        per_case = {}
+        by_post = {}
+        for r in rows:
+            if r["route"] == route:
+                by_post.setdefault(r["rid"], {}).setdefault(r["case"], []).append(r)
+        for case in cases:
+            g = groups.get((route, case))
+            if not g:
+                continue
+            per_case[case] = {
+                "requests": len(g),
+                "unexpected_status": sum(1 for r in g if r["status"] != r["expected"]),
+                "bytes_p50": median([r["bytes"] for r in g]),
+            }
+            for metric in METRICS:
+                vals = _values(g, metric)
+                if vals:
+                    per_case[case][metric] = describe(vals, (50, 90, 99), n_boot=n_boot, seed=seed)
+        if not per_case:
+            continue
+        report[route] = {"cases": per_case, "fast_path": compare_cases(by_post, "200", "304", n_boot, seed)}
+        if "stale" in per_case:
+            report[route]["stale_vs_200"] = compare_cases(by_post, "stale", "200", n_boot, seed)
+        if "cold" in per_case:
+            report[route]["cold_penalty"] = compare_cases(by_post, "cold", "200", n_boot, seed)
+    return report
+
+
+def per_post_rows(rows):
+    """One row per post: the median of every route/case metric, named like mr_304_ttfb_ms."""
+    cells = {}
+    for r in rows:
+        for metric in METRICS:
+            if r.get(metric) is not None:
+                cells.setdefault(r["rid"], {}).setdefault(f"{r['route']}_{r['case']}_{metric}", []).append(r[metric])
+    out = []
+    for rid in sorted(cells):
+        row = {"rid": rid}
+        row.update({k: round(median(v), 3) for k, v in sorted(cells[rid].items())})
+        out.append(row)
+    return out
+
+
+def write_csv(path, rows):
+    fields = []
+    for r in rows:
+        fields.extend(k for k in r if k not in fields)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_report(report):
+    print(f"\n{'Route':<10} {'Case':<6} {'n':>5} {'p50 ms':>8} {'p90 ms':>8} {'TTFB p50':>9} "
+          f"{'srv ms':>7} {'queries':>8} {'bytes':>8} {'bad':>4}")
+    for route, r in report.items():
+        for case, c in r["cases"].items():
+            cell = {}
+            for metric, q in (("ms", "p50"), ("ms", "p90"), ("ttfb_ms", "p50"), ("srv_time_route_ms", "p50"),
+                              ("srv_queries_delta", "p50")):
+                cell[metric, q] = f"{c[metric][q]:.1f}" if metric in c else "-"
+            print(f"{route:<10} {case:<6} {c['requests']:>5} {cell['ms', 'p50']:>8} {cell['ms', 'p90']:>8} "
+                  f"{cell['ttfb_ms', 'p50']:>9} {cell['srv_time_route_ms', 'p50']:>7} "
+                  f"{cell['srv_queries_delta', 'p50']:>8} {c['bytes_p50']:>8.0f} {c['unexpected_status']:>4}")
+    print()
+    for route, r in report.items():
+        fp = r["fast_path"].get("ttfb_ms") or r["fast_path"].get("ms")
+        if fp:
+            line = (f"{route}: 200 - 304 = {fp['saving_p50']:+.1f} ms TTFB per request "
+                    f"({fp['ratio']:.2f}x, 95% CI {fp['ratio_ci'][0]:.2f}-{fp['ratio_ci'][1]:.2f}, p={fp['p_value']:.4f})")
+            srv = r["fast_path"].get("srv_time_route_ms")
+            if srv:
+                line += f"; server route {srv['200_p50']:.1f} -> {srv['304_p50']:.1f} ms"
+            print(line)
+        cold = (r.get("cold_penalty") or {}).get("ttfb_ms")
+        if cold:
+            print(f"{route}: cold - 200 = {cold['saving_p50']:+.1f} ms TTFB per request, the cost of a missing stored CID "
+                  f"({cold['ratio']:.2f}x, p={cold['p_value']:.4f})")
+
+
+def catalog_rids(pool, base, headers, status, limit):
+    st, stream = open_catalog(pool, f"{base}{API_PREFIX}/catalog?status={status}", headers)
+    if st != 200:
+        raise DualNativeError(st, "catalog fetch failed")
+    rids = []
+    try:
+        for item in stream:
+            if item.get("rid"):
+                rids.append(item["rid"])
+            if limit and len(rids) >= limit:
+                break
+    finally:
+        stream.close()
+    return rids
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure If-None-Match 304 vs 200 latency and server cost per post")
+    ap.add_argument("--base", required=True, help="WordPress base URL")
+    ap.add_argument("--user", required=True, help="WordPress username")
+    ap.add_argument("--app-pass", dest="app_pass", required=True, help="WordPress Application Password")
+    ap.add_argument("--posts", help="Post IDs and ranges, e.g. 12,40-60 (default: first --limit catalog posts)")
+    ap.add_argument("--limit", type=int, default=20, help="Catalog posts to profile when --posts is not given")
+    ap.add_argument("--status", default="publish", help="Catalog status filter (publish, draft, any)")
+    ap.add_argument("--reps", type=int, default=10, help="Rounds of every route/case per post")
+    ap.add_argument("--public", action="store_true", help="Also profile the public routes (published posts only)")
+    ap.add_argument("--cold", action="store_true", help="Add the cold case; re-saves every post (see Notes)")
+    ap.add_argument("--seed", type=int, default=1, help="Shuffle and bootstrap seed")
+    ap.add_argument("--bootstrap", type=int, default=1000, help="Bootstrap resamples for confidence intervals")
+    ap.add_argument("--label", default="", help="Free-form run label stored in the JSON (e.g. the plugin version)")
+    ap.add_argument("--out", help="Per-post CSV of median metrics (dni_compare.py input)")
+    ap.add_argument("--samples", help="Per-request CSV")
+    ap.add_argument("--json", help="Write the summary JSON here")
+    archive = ap.add_mutually_exclusive_group()
+    archive.add_argument("--record", help="Also write every HTTP exchange to this archive (see dni_replay.py)")
+    archive.add_argument("--replay", help="Answer every request from this archive instead of the network")
+    ap.add_argument("--replay-timing", dest="replay_timing", default="fast", choices=TIMINGS, help="fast: memory speed; original: recorded TTFB and download times")
+    args = ap.parse_args()
+
+    base = args.base.rstrip("/")
+    try:
+        pool = make_pool(args.record, args.replay, args.replay_timing)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        return 1
+    prober = Prober(pool, base, args.user, args.app_pass)
+    try:
+        if args.posts:
+            rids = parse_post_list(args.posts)
+        else:
+            rids = catalog_rids(pool, base, dict(prober.auth, Accept="application/json"), args.status, args.limit)
+    except ValueError as e:
+        print(f"ERROR: Invalid --posts: {e}")
+        return 2
+    except (DualNativeError, CatalogStreamError) as e:
+        print(f"ERROR: {e}")
+        return 1
+    if not rids:
+        print("ERROR: No posts to profile")
+        return 1
+
+    routes = ["mr", "md"] + (["public_mr", "public_md"] if args.public else [])
+    cases = [c for c in CASES if c != "cold" or args.cold]
+    print(f"Profiling {len(rids)} posts x {args.reps} rounds: routes {', '.join(routes)}; cases {', '.join(cases)}"
+          + (" (cold re-saves each post)" if args.cold else ""))
+    rng = random.Random(args.seed)
+    rows, skipped, failed = [], [], []
+    started = time.perf_counter()
+    for i, rid in enumerate(rids, 1):
+        try:
+            profile_post(prober, rid, routes, cases, args.reps, rng, rows, skipped)
+        except DualNativeError as e:
+            failed.append({"rid": rid, "error": str(e)})
+            print(f"  FAIL post {rid}: {e}")
+        if i % 10 == 0:
+            print(f"  ... {i}/{len(rids)} posts")
+    elapsed = time.perf_counter() - started
+    for s in skipped:
+        print(f"  SKIP post {s['rid']} {s['route']}: {s['reason']}")
+
+    report = summarize(rows, routes, cases, args.bootstrap, args.seed)
+    print_report(report)
+    unexpected = sum(c["unexpected_status"] for r in report.values() for c in r["cases"].values())
+    pool_stats = pool.stats()
+    archive_stats = pool.archive_stats() if args.record or args.replay else {}
+    pool.close()
+    print("\n" + format_pool_stats(pool_stats))
+    if archive_stats:
+        print(format_archive_stats(archive_stats))
+
+    if args.out:
+        write_csv(args.out, per_post_rows(rows))
+    if args.samples:
+        write_csv(args.samples, rows)
+    if args.json:
+        summary = {"site": base, "label": args.label, "posts": len(rids), "reps": args.reps, "routes": routes,
+                   "cases": cases, "requests": len(rows), "unexpected_status": unexpected,
+                   "elapsed_s": round(elapsed, 3), "report": report, "skipped": skipped, "failed": failed,
+                   "http_pool": pool_stats, "archive": archive_stats}
+        with open(args.json, "w", encoding="utf-8") as jf:
+            json.dump(summary, jf, ensure_ascii=False, indent=2)
+    if unexpected:
+        print(f"\nFAIL: {unexpected} requests got an unexpected status (see the 'bad' column)")
+    return 1 if unexpected or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Write-path benchmark: safe block inserts vs a core /wp/v2 update
+
+POST /dual-native/v1/posts/{id}/blocks does much more than a read. It
+builds the MR for the If-Match check, parses blocks up to three times, runs
+wp_update_post, rebuilds the MR and recomputes the CID. This tool measures
+how that cost grows with post size. It also measures how the endpoint behaves
+when several writers edit one post.
+
+Scaling: the scratch post is grown (by appends) to each --sizes block count.
+At each size, --reps inserts of one paragraph are timed for every --modes
+mode (append, prepend, index = middle of the server's top-level block list,
+whitespace blocks included, from X-DNI-Top-Level-Count). The same paragraph is
+then added with a core update: GET /wp/v2/posts/{id}?context=edit, add it to
+content.raw, then POST /wp/v2/posts/{id}. That is the read+write a client
+without the plugin pays. The report has latency percentiles per size and
+mode, the server route time (with profiler headers), and a least-squares
+slope in ms per 100 blocks.
+
+Contention: --writers clients each append --writes-per-writer paragraphs to
+the post concurrently. Each write chains If-Match from the previous
+response and rebases on 412 (as dni_write.py does). The report has the 412
+rate, committed writes per second, commit latency percentiles (including
+retries) and lost updates. Lost updates are blocks that were acknowledged
+but are missing from the final MR. The same load through /wp/v2
+read-modify-write shows what happens without a precondition.
+
+Usage:
+  python tools/validator/benchmark_writes.py \
+    --base https://example.com \
+    --user USERNAME \
+    --app-pass "APPLICATION PASSWORD" \
+    --post 123 \
+    [--sizes 10,50,100,200,400] [--reps 5] [--modes append,prepend,index] [--no-v2] \
+    [--writers 8] [--writes-per-writer 10] [--skip-scaling] [--skip-contention] \
+    [--out writes.csv] [--json writes.json]
+
+Notes:
+  - This tool MODIFIES the --post it is given and leaves it much larger. Use
+    a scratch post (or dni_standin.py), never real content.
+  - Sizes below the post's current block count are skipped, since the
+    dual-native API cannot remove blocks.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import threading
+import time
+
+from dni_client import DualNativeClient, DualNativeError, PreconditionFailed
+from dni_engine import Engine, run_pipeline
+from dni_http import HttpPool, format_pool_stats, server_metrics
+from dni_stats import describe
+
+MODES = ("append", "prepend", "index")
+V2_PARAGRAPH = "\n\n<!-- wp:paragraph -->\n<p>{}</p>\n<!-- /wp:paragraph -->"
+GROW_CHUNK = 100
+
+
+def paragraph(text):
+    return {"type": "core/paragraph", "content": text}
+
+
+def linear_slope(points):
+    """Least-squares slope of [(x, y), ...]; 0.0 when x does not vary."""
+    n = len(points)
+    if n < 2:
+        return 0.0
+    mx = sum(x for x, _ in points) / n
+    my = sum(y for _, y in points) / n
+    sxx = sum((x - mx) ** 2 for x, _ in points)
+    if sxx == 0:
+        return 0.0
+    return sum((x - mx) * (y - my) for x, y in points) / sxx
+
+
+class ScratchPost:
+    """The post under test: its current CID and block counts, kept in step with every write.
+
+    blocks is the MR block count. top_level is the server's parsed top-level
+    count (whitespace blocks included), which is what an insert index refers
+    to. It is only known from X-DNI-Top-Level-Count on an insert response.
+    """
+
+    def __init__(self, client, rid):
+        self.client = client
+        self.rid = rid
+        self.refresh()
+
+    def refresh(self):
+        mr = self.client.get_mr(self.rid)
+        self.cid = mr.get("cid")
+        self.blocks = len(mr.get("blocks") or [])
+        self.top_level = None
+
+    def insert(self, mode, blocks):
+        # Middle of the server's block list; the MR count only until an insert has reported it
+        index = (self.top_level if self.top_level is not None else self.blocks) // 2 if mode == "index" else None
+        w = self.client.write_blocks(self.rid, blocks, mode, index, if_match=self.cid)
+        self.cid = w.cid
+        self.blocks += len(blocks)
+        self.top_level = w.count_after
+        return w
+
+    def grow_to(self, target):
+        while self.blocks < target:
+            n = min(GROW_CHUNK, target - self.blocks)
+            self.insert("append", [paragraph(f"Filler block {self.blocks + i}") for i in range(n)])
+
+
+def v2_update(client, rid, text):
+    """Core read-modify-write of post_content; returns (read_ms, write_ms, srv_route_ms) or raises DualNativeError."""
+    url = f"{client.base}/wp-json/wp/v2/posts/{rid}"
+    h = dict(client.headers)
+    h["Accept"] = "application/json"
+    st, _, body, read_ms = client.pool.request("GET", url + "?context=edit", h, None, client.timeout)
+    if st != 200:
+        raise DualNativeError(st, "wp/v2 edit-context read failed")
+    try:
+        raw = json.loads(body.decode("utf-8"))["content"]["raw"]
+    except (ValueError, KeyError, TypeError):
+        raise DualNativeError(st, "wp/v2 response has no content.raw (needs edit_post capability)")
+    h["Content-Type"] = "application/json"
+    payload = json.dumps({"content": raw + V2_PARAGRAPH.format(text)}).encode("utf-8")
+    st, headers, _, write_ms = client.pool.request("POST", url, h, payload, client.timeout)
+    if st != 200:
+        raise DualNativeError(st, "wp/v2 update failed")
+    return read_ms, write_ms, server_metrics(headers).get("time_route_ms")
+
+
+def run_scaling(args, client, post, rows):
+    sizes = sorted({int(s) for s in args.sizes.split(",") if s.strip()})
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    results = {}
+    points = {}
+    for size in sizes:
+        if size < post.blocks:
+            print(f"  skip size {size}: post already has {post.blocks} blocks")
+            continue
+        post.grow_to(size)
+        per_size = {}
+        for mode in modes:
+            ms, srv, before = [], [], []
+            for rep in range(args.reps):
+                w = post.insert(mode, [paragraph(f"Benchmark {mode} {size}/{rep}")])
+                route_ms = server_metrics(w.headers).get("time_route_ms")
+                ms.append(w.elapsed_ms)
+                before.append(post.blocks - 1)
+                if route_ms is not None:
+                    srv.append(route_ms)
+                points.setdefault(mode, []).append((post.blocks - 1, w.elapsed_ms))
+                rows.append({"phase": "scaling", "api": "dni", "mode": mode, "target_blocks": size,
+                             "blocks_before": post.blocks - 1, "inserted_at": w.inserted_at,
+                             "ms": round(w.elapsed_ms, 2), "srv_route_ms": route_ms, "read_ms": ""})
+            per_size[mode] = {"ms": describe(ms, (50, 90, 99), n_boot=200),
+                              "srv_route_ms": describe(srv, (50, 90), n_boot=200) if srv else None,
+                              "blocks_before": round(sum(before) / len(before), 1)}
+        if args.v2:
+            post_ms, total_ms, srv = [], [], []
+            for rep in range(args.reps):
+                read_ms, write_ms, route_ms = v2_update(client, post.rid, f"Benchmark wp/v2 {size}/{rep}")
+                post.blocks += 1
+                post_ms.append(write_ms)
+                total_ms.append(read_ms + write_ms)
+                if route_ms is not None:
+                    srv.append(route_ms)
+                points.setdefault("wp_v2", []).append((post.blocks - 1, read_ms + write_ms))
+                rows.append({"phase": "scaling", "api": "wp_v2", "mode": "append", "target_blocks": size,
+                             "blocks_before": post.blocks - 1, "inserted_at": "", "ms": round(write_ms, 2),
+                             "srv_route_ms": route_ms, "read_ms": round(read_ms, 2)})
+            per_size["wp_v2"] = {"update_ms": describe(post_ms, (50, 90, 99), n_boot=200),
+                                 "read_plus_update_ms": describe(total_ms, (50, 90, 99), n_boot=200),
+                                 "srv_route_ms": describe(srv, (50, 90), n_boot=200) if srv else None}
+            # The core update changed the CID behind the chain
+            post.refresh()
+        results[size] = per_size
+        line = "  ".join(f"{m} {per_size[m]['ms']['p50']:.1f}" for m in modes)
+        if args.v2:
+            line += f"  wp/v2 {per_size['wp_v2']['read_plus_update_ms']['p50']:.1f} (update {per_size['wp_v2']['update_ms']['p50']:.1f})"
+        print(f"  {size:>6} blocks  p50 ms: {line}")
+    slopes = {m: round(linear_slope(p) * 100, 3) for m, p in points.items()}
+    return {"sizes": results, "slope_ms_per_100_blocks": slopes}
+
+
+def run_contention(args, client, post, api, rows):
+    """--writers concurrent writers on one post; api is "dni" (If-Match + rebase) or "wp_v2"."""
+    post.refresh()
+    start_blocks = post.blocks
+    lock = threading.Lock()
+    counts = {"attempts": 0, "conflicts_412": 0, "committed": 0, "errors": 0}
+    commit_ms = []
+    engine = Engine(client.pool.fetch, args.writers)
+
+    def one_write(writer, seq, cid):
+        """Blocking: commit one paragraph; returns (cid, attempts, conflicts) or raises DualNativeError."""
+        attempts = conflicts = 0
+        text = f"Contention {api} writer {writer} write {seq}"
+        while True:
+            attempts += 1
+            if api == "wp_v2":
+                v2_update(client, post.rid, text)
+                return None, attempts, conflicts
+            try:
+                return client.write_blocks(post.rid, [paragraph(text)], "append", if_match=cid).cid, attempts, conflicts
+            except PreconditionFailed as e:
+                conflicts += 1
+                if not e.current_cid or conflicts > args.max_retries:
+                    raise
+                cid = e.current_cid
+
+    async def writer(idx, _):
+        cid = post.cid
+        for seq in range(args.writes_per_writer):
+            t0 = time.perf_counter()
+            try:
+                cid, attempts, conflicts = await engine.run(client.api, lambda s=seq, c=cid: one_write(idx, s, c), api,
+                                                            idempotent=False)
+                ok = True
+            except DualNativeError:
+                attempts, conflicts, ok = 1, 0, False
+            elapsed = (time.perf_counter() - t0) * 1000
+            with lock:
+                counts["attempts"] += attempts
+                counts["conflicts_412"] += conflicts
+                counts["committed" if ok else "errors"] += 1
+                if ok:
+                    commit_ms.append(elapsed)
+            rows.append({"phase": "contention", "api": api, "mode": "append", "target_blocks": "",
+                         "blocks_before": "", "inserted_at": "", "ms": round(elapsed, 2), "srv_route_ms": "",
+                         "read_ms": ""})
+        return None
+
+    started = time.perf_counter()
+    try:
+        asyncio.run(run_pipeline(range(args.writers), writer, args.writers))
+    finally:
+        engine.close()
+    wall = time.perf_counter() - started
+    post.refresh()
+    lost = start_blocks + counts["committed"] - post.blocks
+    out = dict(counts)
+    out.update({
+        "api": api,
+        "writers": args.writers,
+        "conflict_rate_pct": round(counts["conflicts_412"] / counts["attempts"] * 100.0, 2) if counts["attempts"] else 0.0,
+        "commits_per_s": round(counts["committed"] / wall, 2) if wall > 0 else 0.0,
+        "commit_ms": describe(commit_ms, (50, 90, 99), n_boot=200),
+        "lost_updates": lost,
+        "elapsed_s": round(wall, 3),
+    })
+    cm = out["commit_ms"]
+    print(f"  {api:<6} {args.writers} writers: {counts['committed']} committed, {out['conflict_rate_pct']:.1f}% 412, "
+          f"{out['commits_per_s']:.1f} commits/s, p50 {cm.get('p50', 0):.1f} / p99 {cm.get('p99', 0):.1f} ms, "
+          f"{lost} lost updates")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the safe-write endpoint against post size and concurrent writers")
+    ap.add_argument("--base", required=True, help="WordPress base URL")
+    ap.add_argument("--user", required=True, help="WordPress username")
+    ap.add_argument("--app-pass", dest="app_pass", required=True, help="WordPress Application Password")
+    ap.add_argument("--post", type=int, required=True, help="Scratch post ID (it will be modified)")
+    ap.add_argument("--sizes", default="10,50,100,200,400", help="Post sizes (MR blocks) to measure at, comma list")
+    ap.add_argument("--reps", type=int, default=5, help="Inserts per size and mode")
+    ap.add_argument("--modes", default="append,prepend,index", help="Insert modes to measure, comma list")
+    ap.add_argument("--no-v2", dest="v2", action="store_false", help="Skip the /wp/v2 update comparison")
+    ap.add_argument("--writers", type=int, default=8, help="Concurrent writers in the contention test")
+    ap.add_argument("--writes-per-writer", dest="writes_per_writer", type=int, default=10, help="Appends per writer")
+    ap.add_argument("--max-retries", dest="max_retries", type=int, default=50, help="412 rebases per write before it counts as failed")
+    ap.add_argument("--skip-scaling", dest="scaling", action="store_false", help="Only run the contention test")
+    ap.add_argument("--skip-contention", dest="contention", action="store_false", help="Only run the scaling test")
+    ap.add_argument("--out", help="Write one CSV row per timed request here")
+    ap.add_argument("--json", help="Write the summary JSON here")
+    args = ap.parse_args()
+
+    bad = [m for m in args.modes.split(",") if m.strip() and m.strip() not in MODES]
+    if bad:
+        print(f"ERROR: Unknown mode(s): {', '.join(bad)} (known: {', '.join(MODES)})")
+        return 2
+
+    pool = HttpPool()
+    client = DualNativeClient(args.base, args.user, args.app_pass, pool=pool, cache_bytes=0)
+    try:
+        post = ScratchPost(client, args.post)
+    except DualNativeError as e:
+        print(f"ERROR: Cannot read post {args.post}: {e}")
+        return 1
+    print(f"Scratch post {args.post}: {post.blocks} blocks (this run modifies it)")
+
+    rows = []
+    report = {"site": args.base, "post": args.post, "start_blocks": post.blocks}
+    try:
+        if args.scaling:
+            print("Insert latency by post size:")
+            report["scaling"] = run_scaling(args, client, post, rows)
+            slopes = report["scaling"]["slope_ms_per_100_blocks"]
+            print("  slope (ms per 100 blocks): " + ", ".join(f"{k} {v:+.2f}" for k, v in slopes.items()))
+        if args.contention:
+            print("Concurrent writers on one post:")
+            report["contention"] = {"dni": run_contention(args, client, post, "dni", rows)}
+            if args.v2:
+                report["contention"]["wp_v2"] = run_contention(args, client, post, "wp_v2", rows)
+    except DualNativeError as e:
+        print(f"ERROR: {e}")
+        pool.close()
+        return 1
+    report["end_blocks"] = post.blocks
+
+    if args.out and rows:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    pool_stats = pool.stats()
+    pool.close()
+    report["http_pool"] = pool_stats
+    print(format_pool_stats(pool_stats))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as jf:
+            json.dump(report, jf, ensure_ascii=False, indent=2)
+    lost = report.get("contention", {}).get("dni", {}).get("lost_updates", 0)
+    return 1 if lost else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,840 @@
+#!/usr/bin/env python3
+"""
+DNI Cache Proxy: shared HTTP cache in front of the dual-native routes
+
+A local caching reverse proxy for agents. Many processes point their --base
+at it instead of at the site and share one store. Responses are keyed by
+URL plus auth scope (a hash of the Authorization/Cookie headers, so
+credentials are never stored and one user never gets another's
+representation).
+
+Caching follows RFC 9111 for a shared cache:
+  - Only 200/203 responses to GET are stored. no-store and private are
+    honored, and a response to an authorized request is stored only if it
+    says must-revalidate, public or s-maxage.
+  - Freshness comes from s-maxage / max-age / Expires. There is no heuristic
+    freshness. The plugin sends max-age=0, must-revalidate, so every read is
+    revalidated upstream with If-None-Match (the CID) and a 304 is answered
+    from the store. Agents still get a body, while the upstream sends none.
+  - Concurrent misses and revalidations of the same key are collapsed into
+    one upstream request; the rest wait for it and share its answer.
+  - If the upstream is unreachable and the entry is must-revalidate, the
+    client gets 504, never the stale body.
+  - POST/PUT/PATCH/DELETE pass through and, when they succeed, drop every
+    cached representation of the post they touch (all scopes).
+  - Client If-None-Match / If-Modified-Since are answered by the proxy.
+  - Each response carries Cache-Status (RFC 9211) and Age.
+
+With --user/--app-pass the proxy also polls /catalog?cursor= every --poll
+seconds. A post whose CID changed is dropped from the store before any agent
+asks for it. With --prefetch its cached representations are fetched again
+under the watcher's scope and for anonymous /public routes. The next agent
+revalidation is then a 304 from the plugin's fast path instead of a full
+200.
+
+Usage:
+  python tools/validator/dni_cache_proxy.py \
+    --upstream https://example.com \
+    --port 8090 \
+    [--max-mb 256] [--db dni_cache.sqlite] \
+    [--user USERNAME --app-pass "APPLICATION PASSWORD" --poll 10 --prefetch] \
+    [--json proxy_stats.json]
+
+  Then point any tool or agent at --base http://127.0.0.1:8090
+  Metrics: GET http://127.0.0.1:8090/_dni/metrics
+
+Notes:
+  - Upstream bodies are fetched compressed, digest-checked and stored
+    decoded. Clients get identity bodies (the proxy is meant to run next to
+    them). Vary: Accept-Encoding is therefore ignored; any other Vary header
+    selects the stored variant. A body whose Content-Digest does not match
+    is passed through but never stored.
+  - --db writes entries through to SQLite (zlib-compressed) so they outlive
+    the process; memory holds the most recently used --max-mb of bodies.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode, urlsplit
+
+from dni_http import HttpPool, format_pool_stats
+from dni_jsonstream import CatalogStreamError, open_catalog
+from dni_sync import delta_since
+
+API_PREFIX = "/wp-json/dual-native/v1"
+METRICS_PATH = "/_dni/metrics"
+CACHE_NAME = "dni-proxy"
+# Per-connection headers (RFC 9110 7.6.1); never forwarded or stored
+HOP_BY_HOP = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "proxy-connection", "te",
+              "trailer", "transfer-encoding", "upgrade"}
+# Describe the upstream's encoding of the body, not the decoded body the proxy serves
+BODY_HEADERS = {"content-encoding", "content-length"}
+# Evaluated by the proxy against its own entry, not forwarded
+CONDITIONAL_HEADERS = {"if-none-match", "if-modified-since", "if-match", "if-unmodified-since", "if-range"}
+UNSAFE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+STORABLE_STATUSES = (200, 203)
+# The post a URL belongs to: dual-native reads/writes and core /wp/v2 updates
+RID_PATH = re.compile(r"/(?:dual-native/v1/(?:public/)?posts|wp/v2/(?:posts|pages))/(\d+)(?:/|$)")
+MR_PATH = re.compile(r"/dual-native/v1/(?:public/)?posts/\d+$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    scope TEXT NOT NULL,
+    url TEXT NOT NULL,
+    rid INTEGER,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    request TEXT NOT NULL,
+    vary TEXT NOT NULL,
+    body BLOB NOT NULL,
+    stored_at REAL NOT NULL,
+    age REAL NOT NULL,
+    wire_bytes INTEGER NOT NULL,
+    PRIMARY KEY (scope, url)
+);
+CREATE INDEX IF NOT EXISTS responses_rid ON responses (rid);
+"""
+
+
+def b64_basic(user, pw):
+    raw = f"{user}:{pw}".encode("utf-8")
+    return base64.b64encode(raw).decode("ascii")
+
+
+def parse_cache_control(value):
+    """Cache-Control directives as {name: argument or True}, names lower-cased."""
+    out = {}
+    for part in (value or "").split(","):
+        name, eq, arg = part.strip().partition("=")
+        name = name.strip().lower()
+        if name:
+            out[name] = arg.strip().strip('"') if eq else True
+    return out
+
+
+def _seconds(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _http_time(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _iso_time(value):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers):
+    """Seconds a stored response stays fresh in a shared cache; 0 without explicit freshness."""
+    cc = parse_cache_control(headers.get("cache-control"))
+    if "no-cache" in cc:
+        return 0
+    for directive in ("s-maxage", "max-age"):
+        if directive in cc:
+            return _seconds(cc[directive]) or 0
+    expires, date = _http_time(headers.get("expires")), _http_time(headers.get("date"))
+    if expires is not None and date is not None:
+        return max(0, int(expires - date))
+    return 0
+
+
+def etag_list(value):
+    """If-None-Match tags without quotes or W/ (weak comparison); "*" kept."""
+    out = []
+    for tok in (value or "").split(","):
+        t = tok.strip()
+        if t[:2].upper() == "W/":
+            t = t[2:].strip()
+        t = t.strip('"')
+        if t:
+            out.append(t)
+    return out
+
+
+def auth_scope(authorization, cookie=""):
+    """Store scope for a set of credentials: 'anon', or a hash of them."""
+    if not authorization and not cookie:
+        return "anon"
+    return hashlib.sha256(f"{authorization or ''}\n{cookie or ''}".encode("utf-8")).hexdigest()[:16]
+
+
+def rid_of(url):
+    m = RID_PATH.search(urlsplit(url).path)
+    return int(m.group(1)) if m else None
+
+
+def _title(name):
+    # Sent title-cased so the pool's own User-Agent/Accept-Encoding are replaced, not duplicated
+    return "-".join(p.capitalize() for p in name.split("-"))
+
+
+def _vary_names(headers):
+    """Request headers the response varies on, lower-cased (accept-encoding excluded: bodies are stored decoded)."""
+    names = [v.strip().lower() for v in headers.get("vary", "").split(",") if v.strip()]
+    return tuple(sorted(n for n in names if n != "accept-encoding"))
+
+
+def _json_error(status, code, message):
+    body = json.dumps({"code": code, "message": message, "data": {"status": status}}).encode("utf-8")
+    return status, {"content-type": "application/json; charset=UTF-8"}, body
+
+
+class Entry:
+    """A stored response: decoded body, replayable headers and freshness state.
+
+    Entries are never modified in place; a revalidation stores a new one.
+    """
+
+    __slots__ = ("status", "headers", "body", "request", "vary", "stored_at", "age", "wire_bytes", "rid",
+                 "etag", "lifetime", "must_revalidate")
+
+    def __init__(self, status, headers, body, request, vary, stored_at, age=0.0, wire_bytes=0, rid=None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        # The forwarded request headers minus credentials, for prefetching
+        self.request = request
+        # ((header, value), ...) of the request this variant answers
+        self.vary = vary
+        self.stored_at = stored_at
+        # Age the response already had when it was stored
+        self.age = age
+        self.wire_bytes = wire_bytes
+        self.rid = rid
+        tags = etag_list(headers.get("etag"))
+        self.etag = tags[0] if tags else ""
+        self.lifetime = freshness_lifetime(headers)
+        cc = parse_cache_control(headers.get("cache-control"))
+        self.must_revalidate = "must-revalidate" in cc or "proxy-revalidate" in cc or "s-maxage" in cc
+
+    @classmethod
+    def from_response(cls, status, headers, body, request, wire_bytes, rid):
+        """Entry for an upstream response, or None if the response must not be stored."""
+        cc = parse_cache_control(headers.get("cache-control"))
+        if status not in STORABLE_STATUSES or "no-store" in cc or "private" in cc:
+            return None
+        if "authorization" in request or "cookie" in request:
+            if not ("must-revalidate" in cc or "public" in cc or "s-maxage" in cc):
+                return None
+        if "*" in headers.get("vary", ""):
+            return None
+        stored = {k: v for k, v in headers.items()
+                  if k not in HOP_BY_HOP and k not in BODY_HEADERS and k not in ("set-cookie", "age")}
+        if "content-digest" in stored and headers.get("content-encoding", "identity").lower() != "identity":
+            # The body is served decoded, so the digest must be over the decoded bytes
+            stored["content-digest"] = "sha-256=:" + base64.b64encode(hashlib.sha256(body).digest()).decode("ascii") + ":"
+        vary = tuple((n, request.get(n, "")) for n in _vary_names(headers))
+        public = {k: v for k, v in request.items() if k not in ("authorization", "cookie")}
+        return cls(status, stored, body, public, vary, time.time(), float(_seconds(headers.get("age")) or 0),
+                   wire_bytes, rid)
+
+    def refreshed(self, headers):
+        """Entry after a 304: the new header values replace the stored ones, the body is kept."""
+        merged = dict(self.headers)
+        for k, v in headers.items():
+            if k not in HOP_BY_HOP and k not in BODY_HEADERS and k not in ("set-cookie", "age", "content-digest"):
+                merged[k] = v
+        return Entry(self.status, merged, self.body, self.request, self.vary, time.time(),
+                     float(_seconds(headers.get("age")) or 0), self.wire_bytes, self.rid)
+
+    def current_age(self, now=None):
+        return self.age + max(0.0, (now or time.time()) - self.stored_at)
+
+    def fresh(self, now=None):
+        return self.current_age(now) < self.lifetime
+
+    def matches(self, request):
+        """Whether this variant answers request (lower-cased forwarded headers)."""
+        return all(request.get(name, "") == value for name, value in self.vary)
+
+
+class CacheStore:
+    """Thread-safe response store keyed by (scope, url).
+
+    Memory is an LRU bounded by body bytes. With db_path every entry is also
+    written through to SQLite, and a memory miss falls back to it, so the
+    store survives restarts and is not limited by max_bytes.
+    """
+
+    def __init__(self, max_bytes, db_path=None):
+        self.max_bytes = max(0, int(max_bytes))
+        self.bytes = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._by_rid = {}
+        self._lock = threading.Lock()
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self.db.executescript(SCHEMA)
+
+    def _remember(self, key, entry):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.bytes -= len(old.body)
+        if len(entry.body) > self.max_bytes:
+            return
+        self._items[key] = entry
+        self.bytes += len(entry.body)
+        if entry.rid is not None:
+            self._by_rid.setdefault(entry.rid, set()).add(key)
+        while self.bytes > self.max_bytes:
+            evicted_key, evicted = self._items.popitem(last=False)
+            self.bytes -= len(evicted.body)
+            self.evictions += 1
+            self._unindex(evicted_key, evicted)
+
+    def _unindex(self, key, entry):
+        keys = self._by_rid.get(entry.rid)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_rid[entry.rid]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+                return entry
+            if self.db is None:
+                return None
+            row = self.db.execute("SELECT status, headers, request, vary, body, stored_at, age, wire_bytes, rid "
+                                  "FROM responses WHERE scope=? AND url=?", key).fetchone()
+            if row is None:
+                return None
+            status, headers, request, vary, body, stored_at, age, wire_bytes, rid = row
+            entry = Entry(status, json.loads(headers), zlib.decompress(body), json.loads(request),
+                          tuple(tuple(v) for v in json.loads(vary)), stored_at, age, wire_bytes, rid)
+            self._remember(key, entry)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._remember(key, entry)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses (scope, url, rid, status, headers, request, vary, body, stored_at, "
+                    "age, wire_bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key[0], key[1], entry.rid, entry.status, json.dumps(entry.headers), json.dumps(entry.request),
+                     json.dumps(entry.vary), zlib.compress(entry.body), entry.stored_at, entry.age, entry.wire_bytes),
+                )
+
+    def discard(self, key):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old.body)
+                self._unindex(key, old)
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses WHERE scope=? AND url=?", key)
+
+    def keys_for_rid(self, rid):
+        with self._lock:
+            keys = set(self._by_rid.get(rid, ()))
+            if self.db is not None:
+                keys.update(self.db.execute("SELECT scope, url FROM responses WHERE rid=?", (rid,)).fetchall())
+            return keys
+
+    def size(self):
+        """(entries, body bytes) in memory, plus entries on disk."""
+        with self._lock:
+            on_disk = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self.db is not None else 0
+            return len(self._items), self.bytes, on_disk
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+
+
+class Flights:
+    """Collapses concurrent calls with the same key into one."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def run(self, key, fn):
+        """Return (fn(), collapsed). Callers arriving while fn runs for key wait and share its value.
+
+        If the leader raises, the waiting callers get None.
+        """
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = [threading.Event(), None]
+        if not leader:
+            flight[0].wait()
+            return flight[1], True
+        try:
+            flight[1] = fn()
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight[0].set()
+        return flight[1], False
+
+
+class CacheProxy:
+    """The caching logic, independent of the HTTP server in front of it.
+
+    get() and forward() return (status, headers, body) with lower-cased
+    header names; the body is always identity-encoded.
+    """
+
+    def __init__(self, upstream, store, pool, collapse=True):
+        self.upstream = upstream.rstrip("/")
+        self.store = store
+        self.pool = pool
+        self.collapse = collapse
+        self.flights = Flights()
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "cacheable": 0,
+            "hits": 0,
+            "revalidated": 0,
+            "misses": 0,
+            "collapsed": 0,
+            "stale_served": 0,
+            "gateway_timeouts": 0,
+            "passthrough": 0,
+            "client_not_modified": 0,
+            "stored": 0,
+            "upstream_requests": 0,
+            "upstream_errors": 0,
+            "upstream_body_bytes": 0,
+            "upstream_wire_bytes": 0,
+            "saved_bytes": 0,
+            "saved_wire_bytes": 0,
+            "invalidations": 0,
+            "polls": 0,
+            "poll_errors": 0,
+            "catalog_changes": 0,
+            "prefetched": 0,
+        }
+
+    def count(self, **deltas):
+        with self._lock:
+            for k, v in deltas.items():
+                self._stats[k] += v
+
+    # -- upstream ------------------------------------------------------------
+
+    def _upstream(self, method, url, headers, body=None):
+        res = self.pool.request(method, self.upstream + url, {_title(k): v for k, v in headers.items()}, body)
+        self.count(upstream_requests=1, upstream_errors=res[0] == 0, upstream_body_bytes=len(res[2]),
+                   upstream_wire_bytes=res.transfer.get("wire_bytes", 0))
+        return res
+
+    def _fill(self, key, url, request, entry):
+        """Revalidate entry (or fetch url) upstream and store the result.
+
+        Returns ("revalidated" | "stored", entry) when the client can be
+        answered from the store, else ("forward", FetchResult).
+        """
+        headers = dict(request)
+        if entry is not None:
+            if entry.etag:
+                headers["if-none-match"] = f'"{entry.etag}"'
+            if entry.headers.get("last-modified"):
+                headers["if-modified-since"] = entry.headers["last-modified"]
+        res = self._upstream("GET", url, headers)
+        status, res_headers, body, _ = res
+        if status == 304 and entry is not None:
+            fresh = entry.refreshed(res_headers)
+            self.store.put(key, fresh)
+            return "revalidated", fresh
+        if status in STORABLE_STATUSES and res.digest_ok is not False:
+            new = Entry.from_response(status, res_headers, body, request, res.transfer.get("wire_bytes", len(body)),
+                                      rid_of(url))
+            if new is not None:
+                self.store.put(key, new)
+                self.count(stored=1)
+                return "stored", new
+        if status in (404, 410) and entry is not None:
+            self.store.discard(key)
+        return "forward", res
+
+    # -- requests --------------------------------------------------------------
+
+    def get(self, url, request):
+        """Answer a GET (or HEAD) for url; request is the client's headers, lower-cased."""
+        self.count(requests=1)
+        req_cc = parse_cache_control(request.get("cache-control"))
+        if "no-store" in req_cc:
+            return self.forward("GET", url, request)
+        forwarded = {k: v for k, v in request.items()
+                     if k not in HOP_BY_HOP and k not in CONDITIONAL_HEADERS and k not in ("host", "accept-encoding", "content-length")}
+        key = (auth_scope(request.get("authorization"), request.get("cookie")), url)
+        self.count(cacheable=1)
+        entry = self.store.get(key)
+        if entry is not None and not entry.matches(forwarded):
+            entry = None
+        if entry is not None and entry.fresh() and "no-cache" not in req_cc and req_cc.get("max-age") != "0":
+            self.count(hits=1, saved_bytes=len(entry.body), saved_wire_bytes=entry.wire_bytes)
+            return self._respond(entry, request, "hit")
+
+        def fill():
+            return self._fill(key, url, forwarded, entry)
+
+        outcome, collapsed = self.flights.run(key, fill) if self.collapse else (fill(), False)
+        if collapsed and (outcome is None or outcome[0] == "forward" or not outcome[1].matches(forwarded)):
+            # Nothing shareable came back: ask for ourselves
+            outcome, collapsed = fill(), False
+        kind, value = outcome
+        if collapsed:
+            self.count(collapsed=1, saved_bytes=len(value.body), saved_wire_bytes=value.wire_bytes)
+            return self._respond(value, request, "fwd=stale; fwd-status=304; collapsed" if kind == "revalidated"
+                                 else "fwd=miss; stored; collapsed")
+        if kind == "revalidated":
+            self.count(revalidated=1, saved_bytes=len(value.body), saved_wire_bytes=value.wire_bytes)
+            return self._respond(value, request, "fwd=stale; fwd-status=304")
+        if kind == "stored":
+            self.count(misses=1)
+            return self._respond(value, request, f"fwd={'stale' if entry else 'miss'}; fwd-status=200; stored")
+        res = value
+        if res[0] == 0 and entry is not None:
+            if entry.must_revalidate:
+                # RFC 9111 4.2.4: a must-revalidate response is never served stale
+                self.count(gateway_timeouts=1)
+                return self._with_status(_json_error(504, "dni_proxy_upstream_unreachable",
+                                                     "Upstream unreachable and the cached response must be revalidated."),
+                                         "fwd=stale; detail=unreachable")
+            self.count(stale_served=1, saved_bytes=len(entry.body), saved_wire_bytes=entry.wire_bytes)
+            return self._respond(entry, request, "hit; detail=unreachable")
+        self.count(misses=1)
+        return self._forwarded(res, f"fwd={'stale' if entry else 'miss'}; fwd-status={res[0]}")
+
+    def forward(self, method, url, request, body=None):
+        """Pass a request through; a successful unsafe method drops the cached post it touched."""
+        if method != "GET":
+            self.count(requests=1)
+        self.count(passthrough=1)
+        headers = {k: v for k, v in request.items() if k not in HOP_BY_HOP and k not in ("host", "accept-encoding", "content-length")}
+        res = self._upstream(method, url, headers, body)
+        if method in UNSAFE_METHODS and 0 < res[0] < 400:
+            rid = rid_of(url)
+            if rid is not None:
+                self.invalidate_rid(rid)
+            else:
+                self.store.discard((auth_scope(request.get("authorization"), request.get("cookie")), url))
+        return self._forwarded(res, "fwd=bypass")
+
+    def invalidate_rid(self, rid):
+        """Drop every stored representation of post rid; returns the dropped entries."""
+        dropped = []
+        for key in self.store.keys_for_rid(rid):
+            entry = self.store.get(key)
+            self.store.discard(key)
+            if entry is not None:
+                dropped.append((key, entry))
+        self.count(invalidations=len(dropped))
+        return dropped
+
+    def prefetch(self, key, request):
+        """Fetch url into the store under key (collapsed with any agent request for it)."""
+        outcome, _ = self.flights.run(key, lambda: self._fill(key, key[1], request, None))
+        if outcome is not None and outcome[0] == "stored":
+            self.count(prefetched=1)
+
+    # -- responses -------------------------------------------------------------
+
+    def _respond(self, entry, request, cache_status):
+        headers = dict(entry.headers)
+        headers["age"] = str(int(entry.current_age()))
+        inm = request.get("if-none-match")
+        if inm is not None:
+            tags = etag_list(inm)
+            not_modified = bool(entry.etag) and ("*" in tags or entry.etag in tags)
+        else:
+            ims, lm = _http_time(request.get("if-modified-since")), _http_time(entry.headers.get("last-modified"))
+            not_modified = ims is not None and lm is not None and lm <= ims
+        if not_modified:
+            self.count(client_not_modified=1)
+            keep = ("etag", "cache-control", "last-modified", "expires", "vary", "content-location", "date", "age")
+            return self._with_status((304, {k: v for k, v in headers.items() if k in keep}, b""), cache_status)
+        return self._with_status((entry.status, headers, entry.body), cache_status)
+
+    def _forwarded(self, res, cache_status):
+        status, headers, body, _ = res
+        if status == 0:
+            return self._with_status(_json_error(502, "dni_proxy_upstream_unreachable", "Upstream request failed."),
+                                     cache_status)
+        headers = {k: v for k, v in headers.items() if k not in HOP_BY_HOP and k not in BODY_HEADERS}
+        return self._with_status((status, headers, body), cache_status)
+
+    @staticmethod
+    def _with_status(response, cache_status):
+        status, headers, body = response
+        headers["cache-status"] = f"{CACHE_NAME}; {cache_status}"
+        return status, headers, body
+
+    # -- metrics ---------------------------------------------------------------
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+        from_store = s["hits"] + s["revalidated"] + s["collapsed"] + s["stale_served"]
+        s["hit_ratio_pct"] = round(from_store / s["cacheable"] * 100.0, 2) if s["cacheable"] else 0.0
+        s["fresh_hit_ratio_pct"] = round(s["hits"] / s["cacheable"] * 100.0, 2) if s["cacheable"] else 0.0
+        s["upstream_requests_saved"] = s["hits"] + s["collapsed"] + s["stale_served"]
+        s["entries"], s["store_bytes"], s["entries_on_disk"] = self.store.size()
+        s["evictions"] = self.store.evictions
+        s["uptime_s"] = round(time.time() - self.started, 1)
+        s["http_pool"] = self.pool.stats()
+        return s
+
+
+def format_proxy_stats(stats):
+    """One-line human summary of CacheProxy.stats()."""
+    return (f"Cache: {stats['requests']} requests, hit ratio {stats['hit_ratio_pct']}% "
+            f"({stats['hits']} fresh, {stats['revalidated']} revalidated, {stats['collapsed']} collapsed, "
+            f"{stats['misses']} misses, {stats['passthrough']} passthrough), "
+            f"upstream {stats['upstream_requests']} requests / {stats['upstream_wire_bytes']} B, "
+            f"saved {stats['saved_bytes']} B body ({stats['saved_wire_bytes']} B wire), "
+            f"{stats['invalidations']} invalidated, {stats['prefetched']} prefetched, "
+            f"{stats['entries']} entries / {stats['store_bytes']} B")
+
+
+class CatalogWatcher:
+    """Polls /catalog?cursor= and drops (or refetches) cached posts whose CID changed."""
+
+    def __init__(self, proxy, authorization, interval=10.0, status="any", overlap=2, prefetch=False, log=print):
+        self.proxy = proxy
+        self.headers = {"Authorization": authorization, "Accept": "application/json"}
+        self.scope = auth_scope(authorization)
+        self.interval = interval
+        self.status = status
+        self.overlap = overlap
+        self.prefetch = prefetch
+        self.log = log
+        self.cursor = None
+        # rid -> CID last seen in the catalog
+        self.cids = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _loop(self):
+        while True:
+            self.poll()
+            if self._stop.wait(self.interval):
+                return
+
+    def _changed(self, item):
+        """Whether the cached representations of the item's post predate it."""
+        rid, cid = item["rid"], item.get("cid", "")
+        known = self.cids.get(rid)
+        self.cids[rid] = cid
+        modified = _iso_time(item.get("modified"))
+        for key in self.proxy.store.keys_for_rid(rid):
+            entry = self.proxy.store.get(key)
+            if entry is None:
+                continue
+            if entry.etag and entry.etag != cid and MR_PATH.search(urlsplit(key[1]).path):
+                return True
+            # Same clock on both sides: the entry's Last-Modified vs the catalog's modified
+            last_modified = _http_time(entry.headers.get("last-modified"))
+            if last_modified is not None and modified is not None:
+                if last_modified < modified:
+                    return True
+            elif known is not None and known != cid:
+                return True
+        return False
+
+    def poll(self):
+        """One catalog round; returns the rids found changed (None if the poll failed)."""
+        params = {"status": self.status}
+        if self.cursor:
+            params["cursor"] = delta_since(self.cursor, self.overlap)
+        url = f"{self.proxy.upstream}{API_PREFIX}/catalog?{urlencode(params)}"
+        self.proxy.count(polls=1)
+        st, stream = open_catalog(self.proxy.pool, url, self.headers)
+        if st != 200:
+            self.proxy.count(poll_errors=1)
+            self.log(f"WARN: catalog poll failed with HTTP {st}")
+            return None
+        changed = []
+        try:
+            for it in stream:
+                rid = it.get("rid")
+                if rid and self._changed(it):
+                    changed.append(rid)
+        except (CatalogStreamError, OSError) as e:
+            stream.close()
+            self.proxy.count(poll_errors=1)
+            self.log(f"WARN: catalog poll read failed: {e}")
+            return None
+        for rid in changed:
+            for key, entry in self.proxy.invalidate_rid(rid):
+                if not self.prefetch or key[0] not in (self.scope, "anon"):
+                    continue
+                request = dict(entry.request)
+                if key[0] == self.scope:
+                    request["authorization"] = self.headers["Authorization"]
+                self.proxy.prefetch(key, request)
+        self.proxy.count(catalog_changes=len(changed))
+        if changed:
+            self.log(f"Catalog: {len(changed)} cached post(s) changed: {', '.join(map(str, changed[:10]))}"
+                     f"{' ...' if len(changed) > 10 else ''}")
+        new_cursor = stream.meta.get("cursor")
+        if new_cursor and (not self.cursor or new_cursor > self.cursor):
+            self.cursor = new_cursor
+        return changed
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "DNI-CacheProxy/1.0"
+    disable_nagle_algorithm = True
+    proxy = None
+    quiet = True
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_HEAD(self):
+        self._dispatch("HEAD")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        request = {}
+        for k, v in self.headers.items():
+            k = k.lower()
+            request[k] = f"{request[k]}, {v}" if k in request else v
+        if method == "GET" and urlsplit(self.path).path == METRICS_PATH:
+            payload = json.dumps(self.proxy.stats(), indent=2).encode("utf-8")
+            return self._send(200, {"content-type": "application/json; charset=UTF-8", "cache-control": "no-store"},
+                              payload, method)
+        if method in ("GET", "HEAD"):
+            status, headers, payload = self.proxy.get(self.path, request)
+        else:
+            status, headers, payload = self.proxy.forward(method, self.path, request, body)
+        self._send(status, headers, payload, method)
+
+    def _send(self, status, headers, body, method):
+        # The upstream's Date and Server are replayed; add ours only when there are none
+        self.log_request(status)
+        self.send_response_only(status)
+        if "date" not in headers:
+            self.send_header("Date", self.date_time_string())
+        if "server" not in headers:
+            self.send_header("Server", self.version_string())
+        for k, v in headers.items():
+            self.send_header(k, v)
+        if status not in (204, 304):
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and method != "HEAD" and status not in (204, 304):
+            self.wfile.write(body)
+
+
+def make_proxy_server(proxy, host="127.0.0.1", port=0, quiet=True):
+    """Bind a ThreadingHTTPServer in front of proxy; port=0 picks a free port."""
+    handler = type("BoundProxyHandler", (ProxyHandler,), {"proxy": proxy, "quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--upstream", required=True, help="WordPress base URL the proxy forwards to")
+    ap.add_argument("--host", default="127.0.0.1", help="Bind address")
+    ap.add_argument("--port", type=int, default=8090, help="Port (0 = any free port)")
+    ap.add_argument("--max-mb", dest="max_mb", type=float, default=256, help="Memory budget for cached bodies (MB)")
+    ap.add_argument("--db", help="Also keep entries in this SQLite file (survives restarts)")
+    ap.add_argument("--no-collapse", dest="collapse", action="store_false", help="Send every miss/revalidation upstream (for comparison)")
+    ap.add_argument("--user", help="WordPress username for the catalog watcher")
+    ap.add_argument("--app-pass", dest="app_pass", help="WordPress Application Password for the catalog watcher")
+    ap.add_argument("--poll", type=float, default=10.0, help="Catalog poll interval in seconds (needs --user; 0 = off)")
+    ap.add_argument("--status", default="any", help="Catalog status filter for the watcher (publish, draft, any)")
+    ap.add_argument("--overlap", type=int, default=2, help="Seconds re-read before the catalog cursor")
+    ap.add_argument("--prefetch", action="store_true", help="Refetch changed posts under the watcher's scope and for /public routes")
+    ap.add_argument("--timeout", type=float, default=20, help="Upstream request timeout (s)")
+    ap.add_argument("--json", help="Write the final metrics JSON here on exit")
+    ap.add_argument("--verbose", action="store_true", help="Log every request")
+    args = ap.parse_args()
+
+    pool = HttpPool(timeout=args.timeout)
+    store = CacheStore(args.max_mb * 1024 * 1024, args.db)
+    proxy = CacheProxy(args.upstream, store, pool, collapse=args.collapse)
+    server = make_proxy_server(proxy, args.host, args.port, quiet=not args.verbose)
+    watcher = None
+    if args.user and args.poll > 0:
+        watcher = CatalogWatcher(proxy, f"Basic {b64_basic(args.user, args.app_pass or '')}", args.poll, args.status,
+                                 args.overlap, args.prefetch)
+        watcher.start()
+    print(f"DNI cache proxy for {proxy.upstream} at http://{args.host}:{server.server_address[1]} "
+          f"(memory {args.max_mb:g} MB{', db ' + args.db if args.db else ''}, "
+          f"catalog watcher {'every ' + format(args.poll, 'g') + 's' if watcher else 'off'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        server.server_close()
+        stats = proxy.stats()
+        print(format_proxy_stats(stats))
+        print(format_pool_stats(stats["http_pool"]))
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as jf:
+                json.dump(stats, jf, ensure_ascii=False, indent=2)
+        store.close()
+        pool.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Content Identity (CID) helpers mirroring DNI_CID::compute in the plugin.
+
+The plugin hashes wp_json_encode(..., JSON_UNESCAPED_SLASHES | JSON_UNESCAPED_UNICODE)
+of the MR with excluded keys removed at every level and associative keys
+sorted at every level. The differences from Python's json.dumps that matter:
+
+  - empty objects are PHP empty arrays and encode as [] rather than {}
+  - U+2028 / U+2029 are still escaped by PHP without JSON_UNESCAPED_LINE_TERMINATORS
+
+canonical_json() first tries a fast path that lets the C encoder sort keys
+(json.dumps(sort_keys=True)) after dropping top-level excluded keys. It only
+keeps that result when the text proves nothing else needed rewriting (no
+nested excluded key, no empty object); otherwise it falls back to the full
+recursive rebuild. Both paths produce identical bytes.
+"""
+
+import hashlib
+import json
+from typing import Any, Iterable
+
+DEFAULT_EXCLUDE = ("cid", "links")
+
+
+def deep_exclude(data: Any, exclude: Iterable[str]) -> Any:
+    """Drop excluded keys from every object; empty objects become [] like in PHP."""
+    if isinstance(data, dict):
+        out = {k: deep_exclude(v, exclude) for k, v in data.items() if k not in exclude}
+        return out or []
+    if isinstance(data, list):
+        return [deep_exclude(v, exclude) for v in data]
+    return data
+
+
+def canonicalize(data: Any) -> Any:
+    """Sort object keys lexicographically at all levels."""
+    if isinstance(data, dict):
+        return {k: canonicalize(data[k]) for k in sorted(data.keys())}
+    if isinstance(data, list):
+        return [canonicalize(v) for v in data]
+    return data
+
+
+def php_json(data: Any, sort_keys: bool = False) -> str:
+    """JSON text as wp_json_encode(JSON_UNESCAPED_SLASHES | JSON_UNESCAPED_UNICODE) writes it."""
+    out = json.dumps(data, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys)
+    return out.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+
+def _fast_json(mr: Any, exclude: set):
+    """Canonical JSON via the C encoder, or None when the slow path is needed."""
+    if not isinstance(mr, dict):
+        return None
+    out = php_json({k: v for k, v in mr.items() if k not in exclude}, sort_keys=True)
+    # Substring tests may also hit string contents; that only costs a fallback
+    if "{}" in out or any(f'"{k}":' in out for k in exclude):
+        return None
+    return out
+
+
+def canonical_json(mr: Any, exclude: Iterable[str] = DEFAULT_EXCLUDE) -> str:
+    exclude = set(exclude)
+    out = _fast_json(mr, exclude)
+    if out is None:
+        out = php_json(canonicalize(deep_exclude(mr, exclude)))
+    return out
+
+
+def compute_cid(mr: Any, exclude: Iterable[str] = DEFAULT_EXCLUDE) -> str:
+    """sha256-<hex> over the canonical JSON of mr, as DNI_CID::compute."""
+    h = hashlib.sha256(canonical_json(mr, exclude).encode("utf-8")).hexdigest()
+    return f"sha256-{h}"
+
+
+def recompute_from_json(body: bytes, exclude: Iterable[str] = DEFAULT_EXCLUDE):
+    """(declared cid, recomputed cid) for a raw MR response body.
+
+    Takes bytes so it can run in a worker process: decoding and hashing both
+    happen off the caller's interpreter.
+    """
+    mr = json.loads(body.decode("utf-8"))
+    return mr.get("cid", ""), compute_cid(mr, exclude)
@@ -0,0 +1,381 @@
+"""
+DualNativeClient: a small Python client for the dual-native/v1 routes.
+
+One HttpPool and one set of credentials. Every MR/MD read goes through an
+in-process LRU cache keyed by (kind, rid), which stores each body with its
+ETag (the CID for MRs). Reads send If-None-Match with the cached tag
+automatically, and a 304 is answered from the cache, so re-reading an
+unchanged post costs one round trip and no body. The cache is bounded by
+body bytes, and the least recently used entries are evicted first.
+
+insert_blocks() sends If-Match with the cached CID by default, so a write
+based on a stale read fails with PreconditionFailed instead of landing on
+content the caller never saw. A successful write replaces the cached MR with
+the one the server returns.
+
+Usage:
+  from dni_client import DualNativeClient, PreconditionFailed
+  client = DualNativeClient("https://example.com", "USERNAME", "APP PASS", cache_bytes=32 << 20)
+  mr = client.get_mr(123)                   # 200: fetched and cached
+  mr = client.get_mr(123)                   # 304: served from the cache
+  md = client.get_md(123)
+  for item in client.catalog(since="2025-11-20T00:00:00+00:00"):
+      ...
+  try:
+      mr = client.insert_blocks(123, [{"type": "core/paragraph", "content": "Hi"}])
+  except PreconditionFailed as e:
+      ...                                   # e.current_cid; re-read and retry
+  client.suggest(123)
+  client.stats()                            # hits, misses, not_modified, evictions, ...
+  client.close()
+
+Thread-safe: engine worker threads may share one client.
+"""
+
+import base64
+import json
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from dni_http import HttpPool
+from dni_jsonstream import CatalogStreamError, open_catalog
+
+API_PREFIX = "/wp-json/dual-native/v1"
+# Cached representations: kind -> (path suffix, Accept)
+KINDS = {
+    "mr": ("", "application/json"),
+    "md": ("/md", "text/markdown"),
+}
+
+
+def b64_basic(user, pw):
+    raw = f"{user}:{pw}".encode("utf-8")
+    return base64.b64encode(raw).decode("ascii")
+
+
+def bare_etag(value):
+    """ETag header value without quotes; weak tags keep their W/ prefix."""
+    return (value or "").strip().strip('"')
+
+
+class DualNativeError(Exception):
+    """A route answered with an unexpected status (0 for network errors).
+
+    headers are the response headers (e.g. Retry-After on a 429/503).
+    """
+
+    def __init__(self, status, message, payload=None, headers=None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.payload = payload
+        self.headers = headers or {}
+
+
+class PreconditionFailed(DualNativeError):
+    """412 from insert_blocks: the post changed since the CID sent in If-Match."""
+
+    def __init__(self, payload, current_cid):
+        super().__init__(412, "If-Match did not match current CID", payload)
+        self.current_cid = current_cid
+
+
+class CachedResource:
+    """One representation as served: status, etag, body bytes, and whether the body came from the cache."""
+
+    __slots__ = ("status", "etag", "body", "from_cache", "elapsed_ms")
+
+    def __init__(self, status, etag, body, from_cache, elapsed_ms):
+        self.status = status
+        self.etag = etag
+        self.body = body
+        self.from_cache = from_cache
+        self.elapsed_ms = elapsed_ms
+
+
+class WriteResult:
+    """A successful block insert: the new MR, its CID and the insertion headers."""
+
+    __slots__ = ("mr", "cid", "headers", "inserted_at", "count_before", "count_after", "elapsed_ms")
+
+    def __init__(self, mr, cid, headers, elapsed_ms):
+        self.mr = mr
+        self.cid = cid
+        self.headers = headers
+        self.inserted_at = _int_header(headers, "x-dni-inserted-at")
+        self.count_before = _int_header(headers, "x-dni-top-level-count-before")
+        self.count_after = _int_header(headers, "x-dni-top-level-count")
+        self.elapsed_ms = elapsed_ms
+
+
+class LRUCache:
+    """Thread-safe LRU of key -> (etag, body), bounded by total body bytes.
+
+    A body larger than the whole budget is not cached at all.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max(0, int(max_bytes))
+        self.bytes = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+            return entry
+
+    def put(self, key, etag, body):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old[1])
+            if len(body) > self.max_bytes:
+                return
+            self._items[key] = (etag, body)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old[1])
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DualNativeClient:
+    """Client for the dual-native/v1 routes with a CID-keyed LRU cache.
+
+    cache_bytes=0 disables the cache; conditional requests then only happen
+    when the caller passes etag= explicitly (e.g. from its own store).
+    public=True reads the unauthenticated /public routes (published posts only).
+    """
+
+    def __init__(self, base, user=None, app_pass=None, pool=None, cache_bytes=32 << 20, timeout=20, public=False):
+        self.base = base.rstrip("/")
+        self.api = self.base + API_PREFIX
+        self.headers = {}
+        if user:
+            self.headers["Authorization"] = f"Basic {b64_basic(user, app_pass or '')}"
+        self.public = public
+        self.timeout = timeout
+        self._own_pool = pool is None
+        self.pool = pool or HttpPool(timeout=timeout)
+        self.cache = LRUCache(cache_bytes)
+        self.catalog_meta = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "hits": 0, "misses": 0, "not_modified": 0, "errors": 0, "bytes_fetched": 0, "bytes_saved": 0}
+
+    # -- reads -------------------------------------------------------------
+
+    def url(self, kind, rid):
+        suffix, _ = KINDS[kind]
+        return f"{self.api}/{'public/' if self.public else ''}posts/{int(rid)}{suffix}"
+
+    def fetch(self, kind, rid, etag=None, revalidate=True):
+        """GET one representation through the cache; returns a CachedResource.
+
+        With a cached entry, If-None-Match carries its tag and a 304 is served
+        from it. etag= adds a tag the caller already holds (a 304 for it
+        returns body None unless the cache has that tag too).
+        revalidate=False returns a cached body without any request.
+        Raises DualNativeError on anything but 200/304.
+        """
+        key = (kind, int(rid))
+        cached = self.cache.get(key)
+        if cached is not None and not revalidate:
+            self._count(hits=1, bytes_saved=len(cached[1]))
+            return CachedResource(200, cached[0], cached[1], True, 0.0)
+
+        h = dict(self.headers)
+        h["Accept"] = KINDS[kind][1]
+        tags = [t for t in (cached[0] if cached else None, etag) if t]
+        if tags:
+            h["If-None-Match"] = ", ".join(f'"{t}"' for t in dict.fromkeys(tags))
+        st, headers, body, elapsed = self.pool.request("GET", self.url(kind, rid), h, None, self.timeout)
+        new_etag = bare_etag(headers.get("etag"))
+
+        if st == 304:
+            tag = new_etag or (cached[0] if cached else etag)
+            if cached is not None and cached[0] == tag:
+                self._count(requests=1, not_modified=1, hits=1, bytes_saved=len(cached[1]))
+                return CachedResource(304, tag, cached[1], True, elapsed)
+            self._count(requests=1, not_modified=1)
+            return CachedResource(304, tag, None, False, elapsed)
+        if st == 200:
+            self._count(requests=1, misses=1, bytes_fetched=len(body))
+            if new_etag and not new_etag.startswith("W/"):
+                self.cache.put(key, new_etag, body)
+            else:
+                self.cache.discard(key)
+            return CachedResource(200, new_etag, body, False, elapsed)
+        self._count(requests=1, errors=1)
+        if st == 404:
+            self.cache.discard(key)
+        raise DualNativeError(st, f"GET {kind} {rid} failed", _json_or_none(body), headers)
+
+    def _read(self, kind, rid, revalidate):
+        """fetch() that always has a body: a 304 the cache cannot answer is fetched again unconditionally."""
+        res = self.fetch(kind, rid, revalidate=revalidate)
+        if res.body is None:
+            # The 304's tag is not the cached one (entry evicted, or the validator changed)
+            self.cache.discard((kind, int(rid)))
+            res = self.fetch(kind, rid)
+            if res.body is None:
+                raise DualNativeError(304, f"GET {kind} {rid} answered 304 without a cached body")
+        return res
+
+    def get_mr(self, rid, revalidate=True):
+        """Machine Representation of a post as a dict (includes "cid")."""
+        res = self._read("mr", rid, revalidate)
+        mr = json.loads(res.body.decode("utf-8"))
+        if res.etag and not mr.get("cid"):
+            mr["cid"] = res.etag
+        return mr
+
+    def get_md(self, rid, revalidate=True):
+        """Markdown rendering of a post."""
+        return self._read("md", rid, revalidate).body.decode("utf-8")
+
+    def cached_cid(self, rid):
+        """CID of the cached MR, or None."""
+        entry = self.cache.get(("mr", int(rid)))
+        return entry[0] if entry else None
+
+    def catalog(self, since=None, status=None, types=None):
+        """Yield catalog items as they stream in; .catalog_meta has count/cursor afterwards."""
+        params = {}
+        if since:
+            params["since"] = since
+        if status:
+            params["status"] = status
+        if types:
+            params["types"] = types if isinstance(types, str) else ",".join(types)
+        url = f"{self.api}/catalog" + (f"?{urlencode(params)}" if params else "")
+        h = dict(self.headers)
+        h["Accept"] = "application/json"
+        self._count(requests=1)
+        st, stream = open_catalog(self.pool, url, h, max(60, self.timeout))
+        if st != 200:
+            self._count(errors=1)
+            raise DualNativeError(st, "catalog fetch failed")
+        try:
+            yield from stream
+        except (CatalogStreamError, OSError) as e:
+            self._count(errors=1)
+            raise DualNativeError(200, f"catalog read failed: {e}")
+        finally:
+            stream.close()
+            self.catalog_meta = dict(stream.meta)
+
+    # -- writes and AI -----------------------------------------------------
+
+    def insert_blocks(self, rid, blocks, insert="append", index=None, if_match=None):
+        """POST blocks into a post and return the updated MR.
+
+        if_match defaults to the cached CID (no If-Match when nothing is
+        cached); pass "*" to write unconditionally. Raises PreconditionFailed
+        on 412 (the stale cache entry is dropped) and DualNativeError otherwise.
+        """
+        return self.write_blocks(rid, blocks, insert, index, if_match).mr
+
+    def write_blocks(self, rid, blocks, insert="append", index=None, if_match=None):
+        """insert_blocks() returning a WriteResult, for callers that chain writes on its cid."""
+        rid = int(rid)
+        payload = {"insert": insert, "blocks": list(blocks)}
+        if index is not None:
+            payload["index"] = int(index)
+        h = dict(self.headers)
+        h["Accept"] = "application/json"
+        h["Content-Type"] = "application/json"
+        tag = if_match or self.cached_cid(rid)
+        if tag:
+            h["If-Match"] = tag if tag == "*" else f'"{bare_etag(tag)}"'
+        st, headers, body, elapsed = self.pool.request("POST", f"{self.api}/posts/{rid}/blocks", h,
+                                                       json.dumps(payload).encode("utf-8"), self.timeout)
+        self._count(requests=1)
+        data = _json_or_none(body)
+        if st == 200 and isinstance(data, dict):
+            cid = bare_etag(headers.get("etag")) or data.get("cid")
+            if cid:
+                self.cache.put(("mr", rid), cid, body)
+            # The Markdown changed with the blocks
+            self.cache.discard(("md", rid))
+            return WriteResult(data, cid, headers, elapsed)
+        self._count(errors=1)
+        if st == 412:
+            self.cache.discard(("mr", rid))
+            current = (data or {}).get("currentCid") or bare_etag(headers.get("etag")) or None
+            raise PreconditionFailed(data, current)
+        raise DualNativeError(st, f"insert blocks into {rid} failed", data, headers)
+
+    def suggest(self, rid):
+        """Summary and tag suggestions for a post (never cached)."""
+        h = dict(self.headers)
+        h["Accept"] = "application/json"
+        st, headers, body, _ = self.pool.request("GET", f"{self.api}/posts/{int(rid)}/ai/suggest", h, None, self.timeout)
+        self._count(requests=1)
+        data = _json_or_none(body)
+        if st != 200 or not isinstance(data, dict):
+            self._count(errors=1)
+            raise DualNativeError(st, f"suggest for {rid} failed", data, headers)
+        return data
+
+    # -- bookkeeping -------------------------------------------------------
+
+    def _count(self, **deltas):
+        with self._lock:
+            for k, v in deltas.items():
+                self._stats[k] += v
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+        reads = s["hits"] + s["misses"]
+        s["hit_rate_pct"] = round(s["hits"] / reads * 100.0, 2) if reads else 0.0
+        s["cache_entries"] = len(self.cache)
+        s["cache_bytes"] = self.cache.bytes
+        s["cache_max_bytes"] = self.cache.max_bytes
+        s["evictions"] = self.cache.evictions
+        return s
+
+    def close(self):
+        if self._own_pool:
+            self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _int_header(headers, name):
+    try:
+        return int(headers.get(name, ""))
+    except ValueError:
+        return None
+
+
+def _json_or_none(body):
+    try:
+        return json.loads(body.decode("utf-8")) if body else None
+    except ValueError:
+        return None
+
+
+def format_client_stats(stats):
+    """One-line human summary of DualNativeClient.stats()."""
+    return (f"Client cache: {stats['hits']} hits ({stats['not_modified']} via 304), {stats['misses']} misses, "
+            f"{stats['hit_rate_pct']:.1f}% hit rate, {stats['cache_entries']} entries / "
+            f"{stats['cache_bytes'] / 1024:.0f} KB, {stats['evictions']} evictions, "
+            f"{stats['bytes_saved'] / 1024:.0f} KB not re-downloaded")
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+DNI Compare: performance regression check between benchmark runs
+
+Compares the per-post CSVs written by benchmark_api_vs_dni.py,
+measure_dni_savings.py or benchmark_conditional.py (--out). The first file is the baseline; every further file
+is a candidate checked against it. Posts are matched by rid, so both runs
+must cover the same catalog slice, e.g. the same --limit.
+
+For each metric present in both files:
+  - change     ratio of medians over matched posts, candidate / baseline
+  - 95% CI     paired bootstrap of that ratio (posts resampled with both runs)
+  - p          one-sided Wilcoxon signed-rank test that the candidate is higher
+  - posts      matched posts that got worse by more than the threshold
+
+Latency metrics are noisy, so they regress only when the change exceeds
+--latency-threshold AND p < --alpha. Size, token and query metrics are
+deterministic for an unchanged post. They regress when the change exceeds
+their threshold, or when more than --max-worse-pct of the matched posts got
+worse by more than it. The per-post check catches a filter that bloats only
+some posts while the median stays put. Exit status is 1 on any regression,
+2 on unusable input.
+
+Usage:
+  python tools/validator/dni_compare.py baseline.csv candidate.csv [more.csv ...] \
+    [--latency-threshold 5] [--size-threshold 1] [--token-threshold 1] \
+    [--query-threshold 0] [--max-worse-pct 5] [--alpha 0.05] [--metrics time_mr_ms,mr_kb] \
+    [--json compare.json]
+
+  # Typical gate before deploying a plugin upgrade
+  python tools/validator/benchmark_api_vs_dni.py ... --out before.csv --json before.json
+  # upgrade
+  python tools/validator/benchmark_api_vs_dni.py ... --out after.csv --json after.json
+  python tools/validator/dni_compare.py before.csv after.csv || echo "regression"
+"""
+
+import argparse
+import csv
+import json
+import sys
+
+from dni_stats import bootstrap_ci, median, wilcoxon_greater
+
+# Column -> kind for both tools' CSVs; only columns present in both files are compared
+METRICS = {
+    # benchmark_api_vs_dni.py
+    "time_dni_ms": "latency",
+    "time_standard_ms": "latency",
+    "dni_ttfb_ms": "latency",
+    "dni_srv_time_route_ms": "latency",
+    "dni_kb": "size",
+    "dni_wire_kb": "size",
+    "dni_tokens": "tokens",
+    "dni_srv_queries_delta": "queries",
+    # measure_dni_savings.py
+    "time_mr_ms": "latency",
+    "time_md_ms": "latency",
+    "mr_ttfb_ms": "latency",
+    "md_ttfb_ms": "latency",
+    "mr_srv_time_route_ms": "latency",
+    "mr_kb": "size",
+    "md_kb": "size",
+    "mr_wire_kb": "size",
+    "md_wire_kb": "size",
+    "mr_tokens": "tokens",
+    "md_tokens": "tokens",
+    "mr_srv_queries_delta": "queries",
+}
+# benchmark_conditional.py: <route>_<case>_<metric>, e.g. mr_304_ttfb_ms
+METRICS.update({
+    f"{route}_{case}_{metric}": kind
+    for route in ("mr", "md", "public_mr", "public_md")
+    for case in ("200", "304", "stale", "cold")
+    for metric, kind in (("ms", "latency"), ("ttfb_ms", "latency"), ("srv_time_route_ms", "latency"),
+                         ("srv_queries_delta", "queries"))
+})
+NOISY_KINDS = ("latency",)
+
+
+class CompareError(Exception):
+    pass
+
+
+def load_run(path):
+    """rid -> {column: float} for every numeric cell of a per-post CSV."""
+    rows = {}
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            if not reader.fieldnames or "rid" not in reader.fieldnames:
+                raise CompareError(f"{path}: not a per-post benchmark CSV (no rid column)")
+            for rec in reader:
+                try:
+                    rid = int(rec["rid"])
+                except (TypeError, ValueError):
+                    continue
+                values = {}
+                for k, v in rec.items():
+                    if k in METRICS and v not in ("", None):
+                        try:
+                            values[k] = float(v)
+                        except ValueError:
+                            pass
+                rows[rid] = values
+    except OSError as e:
+        raise CompareError(f"{path}: {e}")
+    return rows
+
+
+def compare_metric(pairs, kind, threshold_pct, alpha, n_boot, seed, max_worse_pct=5.0):
+    """Verdict for one metric over matched (baseline, candidate) pairs."""
+    base_med = median([b for b, _ in pairs])
+    cand_med = median([c for _, c in pairs])
+
+    def ratio_of(ps):
+        b = median([p[0] for p in ps])
+        c = median([p[1] for p in ps])
+        if b > 0:
+            return c / b
+        return 1.0 if c == 0 else float("inf")
+
+    ratio = ratio_of(pairs)
+    lo, hi = bootstrap_ci(pairs, ratio_of, n_boot, 0.95, seed)
+    n_nonzero, _, p = wilcoxon_greater([c - b for b, c in pairs])
+    _, _, p_lower = wilcoxon_greater([b - c for b, c in pairs])
+    limit = 1.0 + threshold_pct / 100.0
+    worse = sum(1 for b, c in pairs if (c > b * limit if b > 0 else c > 0))
+    noisy = kind in NOISY_KINDS
+    if noisy:
+        regression = ratio > limit and p < alpha
+    else:
+        regression = ratio > limit or worse > len(pairs) * max_worse_pct / 100.0
+    improved = ratio < 1.0 / limit and (p_lower < alpha or not noisy)
+    return {
+        "kind": kind,
+        "matched": len(pairs),
+        "baseline_median": round(base_med, 3),
+        "candidate_median": round(cand_med, 3),
+        "change_pct": round((ratio - 1.0) * 100.0, 2),
+        "ci95_pct": [round((lo - 1.0) * 100.0, 2), round((hi - 1.0) * 100.0, 2)],
+        "p_value": round(p, 5),
+        "changed_posts": n_nonzero,
+        "posts_worse": worse,
+        "threshold_pct": threshold_pct,
+        "verdict": "REGRESSION" if regression else ("improved" if improved else "ok"),
+    }
+
+
+def compare_runs(baseline, candidate, metrics, thresholds, alpha, n_boot, seed, max_worse_pct=5.0, top=5):
+    matched = sorted(set(baseline) & set(candidate))
+    report = {
+        "baseline_posts": len(baseline),
+        "candidate_posts": len(candidate),
+        "matched_posts": len(matched),
+        "missing_in_candidate": sorted(set(baseline) - set(candidate))[:50],
+        "metrics": {},
+        "worst_posts": {},
+    }
+    for name in metrics:
+        pairs, rids = [], []
+        for rid in matched:
+            b = baseline[rid].get(name)
+            c = candidate[rid].get(name)
+            if b is not None and c is not None:
+                pairs.append((b, c))
+                rids.append(rid)
+        if not pairs:
+            continue
+        kind = METRICS[name]
+        report["metrics"][name] = compare_metric(pairs, kind, thresholds[kind], alpha, n_boot, seed, max_worse_pct)
+        # Largest per-post relative increases, for finding the post that bloated
+        deltas = sorted(((c - b) / b * 100.0 if b > 0 else 0.0, rid, b, c) for rid, (b, c) in zip(rids, pairs))
+        report["worst_posts"][name] = [
+            {"rid": rid, "baseline": b, "candidate": c, "change_pct": round(pct, 2)}
+            for pct, rid, b, c in reversed(deltas[-top:]) if pct > 0
+        ]
+    report["regressions"] = [n for n, m in report["metrics"].items() if m["verdict"] == "REGRESSION"]
+    return report
+
+
+def print_report(base_path, cand_path, report):
+    print(f"\nBaseline:  {base_path} ({report['baseline_posts']} posts)")
+    print(f"Candidate: {cand_path} ({report['candidate_posts']} posts, {report['matched_posts']} matched)")
+    if report["missing_in_candidate"]:
+        print(f"  WARN: {len(report['missing_in_candidate'])}+ baseline posts missing from candidate, "
+              f"e.g. {report['missing_in_candidate'][:5]}")
+    print(f"{'Metric':<24} {'Base p50':>10} {'Cand p50':>10} {'Change':>8} {'95% CI':>18} {'p':>8} {'Worse':>6}  Verdict")
+    print("-" * 100)
+    for name, m in report["metrics"].items():
+        lo, hi = m["ci95_pct"]
+        print(f"{name:<24} {m['baseline_median']:>10.2f} {m['candidate_median']:>10.2f} {m['change_pct']:>+7.1f}% "
+              f"{f'{lo:+.1f}% .. {hi:+.1f}%':>18} {m['p_value']:>8.4f} {m['posts_worse']:>6}  {m['verdict']}")
+    for name in report["regressions"]:
+        worst = ", ".join(f"{w['rid']} ({w['change_pct']:+.1f}%)" for w in report["worst_posts"].get(name, []))
+        if worst:
+            print(f"  {name}: worst posts {worst}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare benchmark CSVs and fail on performance regressions")
+    ap.add_argument("runs", nargs="+", help="Per-post CSVs: baseline first, then one or more candidates")
+    ap.add_argument("--metrics", default="", help="Comma list of columns to compare (default: every known metric in both files)")
+    ap.add_argument("--latency-threshold", dest="latency_threshold", type=float, default=5.0, help="Allowed latency increase (%%)")
+    ap.add_argument("--size-threshold", dest="size_threshold", type=float, default=1.0, help="Allowed payload size increase (%%)")
+    ap.add_argument("--token-threshold", dest="token_threshold", type=float, default=1.0, help="Allowed token count increase (%%)")
+    ap.add_argument("--query-threshold", dest="query_threshold", type=float, default=0.0, help="Allowed DB query count increase (%%)")
+    ap.add_argument("--max-worse-pct", dest="max_worse_pct", type=float, default=5.0,
+                    help="Size/token/query metrics: max %% of posts allowed to grow past the threshold")
+    ap.add_argument("--alpha", type=float, default=0.05, help="Significance level for latency regressions")
+    ap.add_argument("--bootstrap", type=int, default=2000, help="Bootstrap resamples for confidence intervals")
+    ap.add_argument("--seed", type=int, default=0, help="Bootstrap seed")
+    ap.add_argument("--json", help="Write the comparison report JSON here")
+    args = ap.parse_args()
+
+    if len(args.runs) < 2:
+        print("ERROR: Need a baseline and at least one candidate CSV")
+        return 2
+    thresholds = {
+        "latency": args.latency_threshold,
+        "size": args.size_threshold,
+        "tokens": args.token_threshold,
+        "queries": args.query_threshold,
+    }
+    wanted = [m.strip() for m in args.metrics.split(",") if m.strip()]
+    unknown = [m for m in wanted if m not in METRICS]
+    if unknown:
+        print(f"ERROR: Unknown metric(s): {', '.join(unknown)} (known: {', '.join(METRICS)})")
+        return 2
+
+    try:
+        runs = [load_run(p) for p in args.runs]
+    except CompareError as e:
+        print(f"ERROR: {e}")
+        return 2
+    baseline = runs[0]
+    out = {"baseline": args.runs[0], "alpha": args.alpha, "thresholds_pct": thresholds,
+           "max_worse_pct": args.max_worse_pct, "candidates": []}
+    regressed = False
+    for path, candidate in zip(args.runs[1:], runs[1:]):
+        present = {k for rec in baseline.values() for k in rec} & {k for rec in candidate.values() for k in rec}
+        metrics = [m for m in (wanted or METRICS) if m in present]
+        if not metrics:
+            print(f"ERROR: {args.runs[0]} and {path} have no metric columns in common")
+            return 2
+        report = compare_runs(baseline, candidate, metrics, thresholds, args.alpha, args.bootstrap, args.seed, args.max_worse_pct)
+        report["candidate"] = path
+        print_report(args.runs[0], path, report)
+        out["candidates"].append(report)
+        regressed = regressed or bool(report["regressions"])
+
+    print("\nRESULT: " + ("REGRESSION" if regressed else "OK"))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as jf:
+            json.dump(out, jf, ensure_ascii=False, indent=2)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
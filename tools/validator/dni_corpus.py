@@ -0,0 +1,131 @@
+"""
+Synthetic post corpus for offline runs of the validator tools.
+
+Generates deterministic (seeded) posts shaped like what DNI_MR::build sees:
+title, status, type, author, dates, categories/tags, featured image and a
+flat list of top-level blocks drawn from a configurable block-type mix.
+
+Usage (as a library):
+  from dni_corpus import generate_corpus, parse_mix
+  posts = generate_corpus(posts=500, seed=7, mix=parse_mix("paragraph=6,heading=2,code=1"))
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_MIX = {
+    "core/paragraph": 55,
+    "core/heading": 15,
+    "core/list": 10,
+    "core/image": 8,
+    "core/code": 7,
+    "core/quote": 5,
+}
+
+# A few non-ASCII words so CID/escaping paths see real Unicode
+WORDS = (
+    "agent api block cache content context data digest dual edit editor fetch field "
+    "graph identity index json layer markdown model native network payload post "
+    "protocol query render request response route schema server signal site token "
+    "update version write zero café naïve Übersicht résumé señal データ 内容"
+).split()
+
+CODE_LINES = (
+    'curl -i -H "If-None-Match: \\"$CID\\"" https://example.com/wp-json/dual-native/v1/posts/1',
+    "if (a < b && b > c) { return a / b; }",
+    "const mr = await fetch(url).then(r => r.json());",
+    "SELECT ID FROM wp_posts WHERE post_status = 'publish';",
+)
+
+CATEGORIES = [(1, "Uncategorized"), (2, "Engineering"), (3, "Guides"), (4, "News"), (5, "Research")]
+TAGS = [(10, "api"), (11, "agents"), (12, "performance"), (13, "wordpress"), (14, "mcp"), (15, "caching")]
+AUTHORS = [(1, "admin"), (2, "Ana Editor"), (3, "Ivo Writer")]
+
+
+def parse_mix(spec):
+    """Parse "paragraph=5,heading=1,code=2" into a block-type weight dict."""
+    if not spec:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if "/" not in name:
+            name = f"core/{name}"
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unsupported block type in mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_range(spec, default):
+    """Parse "4-40" (or "12") into an inclusive (lo, hi) tuple."""
+    if not spec:
+        return default
+    lo, _, hi = str(spec).partition("-")
+    lo = int(lo)
+    hi = int(hi) if hi else lo
+    return (min(lo, hi), max(lo, hi))
+
+
+def _sentence(rng, words):
+    n = rng.randint(words[0], words[1])
+    text = " ".join(rng.choice(WORDS) for _ in range(n))
+    return text[:1].upper() + text[1:] + "."
+
+
+def _block(rng, btype, words, rid, n):
+    if btype == "core/heading":
+        return {"type": btype, "level": rng.choice((2, 2, 3, 3, 4)), "content": _sentence(rng, (3, 8)).rstrip(".")}
+    if btype == "core/list":
+        ordered = rng.random() < 0.3
+        items = [_sentence(rng, (3, 12)) for _ in range(rng.randint(2, 7))]
+        return {"type": btype, "ordered": ordered, "items": items}
+    if btype == "core/image":
+        image_id = 1000 + rid * 10 + n
+        return {"type": btype, "imageId": image_id, "altText": _sentence(rng, (2, 6)).rstrip("."),
+                "url": f"/wp-content/uploads/2025/11/image-{image_id}.jpg"}
+    if btype == "core/code":
+        return {"type": btype, "content": "\n".join(rng.choice(CODE_LINES) for _ in range(rng.randint(1, 6)))}
+    if btype == "core/quote":
+        return {"type": btype, "content": _sentence(rng, words)}
+    return {"type": "core/paragraph", "content": " ".join(_sentence(rng, words) for _ in range(rng.randint(1, 3)))}
+
+
+def generate_corpus(posts=100, seed=1, blocks=(4, 40), words=(8, 30), mix=None,
+                    draft_ratio=0.1, page_ratio=0.1, start=None):
+    """Return a list of post dicts (ids 1..posts), deterministic for a given seed."""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    types = list(mix.keys())
+    weights = [mix[t] for t in types]
+    start = start or datetime(2025, 1, 1, tzinfo=timezone.utc)
+    out = []
+    for rid in range(1, posts + 1):
+        published = start + timedelta(minutes=rng.randint(0, 60 * 24 * 300))
+        modified = published + timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+        author_id, author_name = rng.choice(AUTHORS)
+        cats = sorted(rng.sample(CATEGORIES, rng.randint(1, 2)))
+        tags = sorted(rng.sample(TAGS, rng.randint(0, 3)))
+        n_blocks = rng.randint(blocks[0], blocks[1])
+        post_blocks = [_block(rng, rng.choices(types, weights)[0], words, rid, n) for n in range(n_blocks)]
+        title = _sentence(rng, (3, 9)).rstrip(".")
+        slug = f"post-{rid}"
+        out.append({
+            "id": rid,
+            "type": "page" if rng.random() < page_ratio else "post",
+            "status": "draft" if rng.random() < draft_ratio else "publish",
+            "title": title,
+            "slug": slug,
+            "author": {"id": author_id, "name": author_name},
+            "published": published,
+            "modified": modified,
+            "categories": [{"id": cid, "name": name, "slug": name.lower()} for cid, name in cats],
+            "tags": [{"id": tid, "name": name, "slug": name} for tid, name in tags],
+            "featured_image": (2000 + rid) if rng.random() < 0.6 else None,
+            "blocks": post_blocks,
+        })
+    return out
@@ -0,0 +1,396 @@
+"""
+Concurrent fetch engine shared by the measurement tools.
+
+Blocking fetch() calls run on a thread pool behind per-host and per-endpoint
+semaphores, so several posts (and several requests for one post) can be in
+flight while every request is still timed individually by fetch() itself.
+
+With concurrency=1 each host sees exactly one request at a time, which keeps
+latency figures comparable with the original serial loop.
+
+Each host also has a RateController. A 429 or 503 pauses the whole host for
+Retry-After (or a jittered exponential backoff) and the request is retried.
+With adaptive=True the controller also moves the host's concurrency between
+1 and `concurrency` (AIMD): it grows while responses stay fast and is cut when
+latency climbs above its baseline or the server throttles.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+THROTTLE_STATUSES = (429, 503)
+# How long a throttled limit stays an upper bound before the controller probes past it again
+PROBE_AFTER_S = 30.0
+# A Retry-After longer than this is treated as this (seconds)
+MAX_PAUSE_S = 300.0
+
+
+def parse_retry_after(value):
+    """Retry-After as seconds from now (delta-seconds or HTTP-date), or None."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return min(float(value), MAX_PAUSE_S)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return min(max(0.0, when.timestamp() - time.time()), MAX_PAUSE_S)
+
+
+class RateController:
+    """Concurrency limit for one host, adjusted from response status and latency.
+
+    Starts at 1 and adds one slot per fast response (slow start) until the
+    first congestion signal; after that it adds one slot per `limit` fast
+    responses (additive increase). Congestion is:
+      - 429/503: the limit is halved and the host pauses for Retry-After, or
+        for backoff_base * 2^n with jitter when the server sends none. The
+        limit it was throttled at is not reached again for PROBE_AFTER_S;
+      - latency: when an endpoint's smoothed latency exceeds `tolerance` times
+        its baseline (about its 10th percentile), the limit is cut by
+        `decrease`;
+      - network errors and other 5xx: cut by `decrease`.
+    Cuts happen at most once per smoothed round trip, so one burst of slow
+    responses counts once. With adaptive=False the limit stays at `ceiling`
+    and only the pauses apply.
+    """
+
+    def __init__(self, ceiling, adaptive=True, tolerance=2.0, decrease=0.8, backoff_base=0.5, backoff_cap=30.0,
+                 min_delta_ms=5.0, seed=None):
+        self.ceiling = max(1, int(ceiling))
+        self.adaptive = adaptive
+        self.tolerance = tolerance
+        self.decrease = decrease
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        # Latency must also rise by this much, so loopback jitter (1 ms -> 3 ms) is not congestion
+        self.min_delta_ms = min_delta_ms
+        self.limit = 1.0 if adaptive else float(self.ceiling)
+        self.in_flight = 0
+        self.pause_until = 0.0
+        self.slow_start = adaptive
+        self._baseline = {}
+        self._ewma = {}
+        self._last_cut = 0.0
+        self._cap = None
+        self._cap_at = 0.0
+        self._consecutive = 0
+        self._rng = random.Random(seed)
+        self._cond = None
+        self.started = self._last_t = time.monotonic()
+        self._area = 0.0
+        self.stats_counters = {"requests": 0, "throttled": 0, "retries": 0, "latency_cuts": 0, "error_cuts": 0,
+                               "backoff_s": 0.0}
+        self.limit_min = self.limit_max = self.limit
+
+    def _condition(self):
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _tick(self):
+        now = time.monotonic()
+        self._area += self.in_flight * (now - self._last_t)
+        self._last_t = now
+        return now
+
+    async def acquire(self):
+        """Wait for a free slot (and for any pause to end)."""
+        cond = self._condition()
+        async with cond:
+            while True:
+                wait = self.pause_until - time.monotonic()
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(cond.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                elif self.in_flight < int(self.limit):
+                    break
+                else:
+                    await cond.wait()
+            self._tick()
+            self.in_flight += 1
+
+    async def release(self):
+        cond = self._condition()
+        async with cond:
+            self._tick()
+            self.in_flight -= 1
+            cond.notify_all()
+
+    def _set_limit(self, value):
+        self.limit = min(float(self.ceiling), max(1.0, value))
+        self.limit_min = min(self.limit_min, self.limit)
+        self.limit_max = max(self.limit_max, self.limit)
+
+    def _window_s(self):
+        ewma = max(self._ewma.values(), default=100.0)
+        return max(0.05, ewma / 1000.0)
+
+    def _cut(self, now, factor, counter=None, throttled=False):
+        if not self.adaptive or now - self._last_cut < self._window_s():
+            return
+        self._last_cut = now
+        if throttled:
+            self._cap, self._cap_at = max(1.0, float(int(self.limit) - 1)), now
+        self.slow_start = False
+        if counter:
+            self.stats_counters[counter] += 1
+        self._set_limit(self.limit * factor)
+
+    def observe(self, endpoint, status, elapsed_ms, retry_after=None):
+        """Record one response; returns the pause in seconds when it was throttled, else 0."""
+        now = time.monotonic()
+        self.stats_counters["requests"] += 1
+        if status in THROTTLE_STATUSES:
+            self.stats_counters["throttled"] += 1
+            self._consecutive += 1
+            if retry_after is not None:
+                # Small positive jitter so paused lanes do not return in lockstep
+                pause = retry_after + self._rng.uniform(0.0, 0.1 * retry_after + 0.05)
+            else:
+                step = min(self.backoff_cap, self.backoff_base * 2 ** (self._consecutive - 1))
+                pause = step / 2 + self._rng.uniform(0.0, step / 2)
+            if now + pause > self.pause_until:
+                self.stats_counters["backoff_s"] += pause - max(0.0, self.pause_until - now)
+                self.pause_until = now + pause
+            self._cut(now, 0.5, throttled=True)
+            return pause
+        self._consecutive = 0
+        if status == 0 or status >= 500:
+            self._cut(now, self.decrease, "error_cuts")
+            return 0.0
+
+        base = self._baseline.get(endpoint)
+        # Baseline: steps down 10x faster than up, so it sits near the 10th
+        # percentile of latency; robust to jitter, and a changed path is relearned
+        if base is None:
+            base = elapsed_ms
+        else:
+            base += (elapsed_ms - base) * (0.1 if elapsed_ms < base else 0.01)
+        self._baseline[endpoint] = base
+        ewma = self._ewma.get(endpoint)
+        ewma = elapsed_ms if ewma is None else ewma * 0.9 + elapsed_ms * 0.1
+        self._ewma[endpoint] = ewma
+        if ewma > base * self.tolerance and ewma - base > self.min_delta_ms:
+            self._cut(now, self.decrease, "latency_cuts")
+        elif self.adaptive and self.in_flight >= int(self.limit):
+            # Only grow while the limit is what holds requests back
+            grown = self.limit + (1.0 if self.slow_start else 1.0 / self.limit)
+            if self._cap is not None and now - self._cap_at < PROBE_AFTER_S:
+                grown = min(grown, max(self._cap, self.limit))
+            self._set_limit(grown)
+        return 0.0
+
+    def stats(self):
+        self._tick()
+        span = self._last_t - self.started
+        out = dict(self.stats_counters)
+        out.update({
+            "mode": "adaptive" if self.adaptive else "fixed",
+            "ceiling": self.ceiling,
+            "settled_concurrency": int(self.limit),
+            "limit_min": int(self.limit_min),
+            "limit_max": int(self.limit_max),
+            "avg_in_flight": round(self._area / span, 2) if span > 0 else 0.0,
+            "backoff_s": round(out["backoff_s"], 2),
+            "baseline_ms": {k: round(v, 2) for k, v in sorted(self._baseline.items())},
+        })
+        return out
+
+
+class Engine:
+    """Runs fetch(url, headers, timeout) calls concurrently under limits.
+
+    concurrency           max in-flight requests per host (the ceiling when adaptive)
+    endpoint_concurrency  max in-flight requests per endpoint label
+                          (e.g. "mr", "md", "html"); defaults to concurrency
+    adaptive              let each host's RateController find its concurrency
+    max_retries           retries of an idempotent request answered 429/503, after the pause
+    """
+
+    def __init__(self, fetch, concurrency=1, endpoint_concurrency=None, timeout=20, adaptive=False, max_retries=3):
+        self.fetch_fn = fetch
+        self.concurrency = max(1, int(concurrency))
+        self.endpoint_concurrency = max(1, int(endpoint_concurrency or self.concurrency))
+        self.timeout = timeout
+        self.adaptive = adaptive
+        self.max_retries = max(0, int(max_retries))
+        self._rates = {}
+        self._endpoint_sems = {}
+        # Enough threads for a few hosts (API + permalink host) at full concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max(4, self.concurrency * 4))
+
+    def _sem(self, table, key, size):
+        sem = table.get(key)
+        if sem is None:
+            sem = asyncio.Semaphore(size)
+            table[key] = sem
+        return sem
+
+    def rate(self, host):
+        rc = self._rates.get(host)
+        if rc is None:
+            rc = self._rates[host] = RateController(self.concurrency, self.adaptive)
+        return rc
+
+    async def fetch(self, url, headers=None, endpoint="default"):
+        """Fetch URL on the pool; returns fetch()'s (status, headers, body, elapsed_ms)."""
+        return await self.run(url, lambda: self.fetch_fn(url, headers, self.timeout), endpoint)
+
+    async def run(self, url, fn, endpoint="default", idempotent=True):
+        """Run a blocking fn() that requests url under the same limits as fetch(); returns its result.
+
+        fn's result (a (status, headers, ...) tuple) or exception (with .status
+        and .headers, like DualNativeError) feeds the host's RateController. A
+        429/503 is retried up to max_retries times once the host's pause ends;
+        the last throttled result is returned, or its exception raised.
+
+        Pass idempotent=False for writes: a 503 from a proxy can arrive after
+        the origin applied the write, so they are never retried (the host
+        still pauses).
+        """
+        rc = self.rate(urlsplit(url).netloc)
+        loop = asyncio.get_running_loop()
+        retries = self.max_retries if idempotent else 0
+        for attempt in range(retries + 1):
+            # Always host first, then endpoint, so lock order is consistent
+            await rc.acquire()
+            try:
+                async with self._sem(self._endpoint_sems, endpoint, self.endpoint_concurrency):
+                    t0 = time.perf_counter()
+                    try:
+                        result, error = await loop.run_in_executor(self._executor, fn), None
+                    except Exception as e:
+                        result, error = None, e
+                    elapsed_ms = (time.perf_counter() - t0) * 1000
+                if error is not None:
+                    status, headers = getattr(error, "status", 0) or 0, getattr(error, "headers", None) or {}
+                elif isinstance(result, tuple) and result and isinstance(result[0], int):
+                    status, headers = result[0], result[1] if len(result) > 1 else {}
+                else:
+                    status, headers = 200, {}
+                pause = rc.observe(endpoint, status, elapsed_ms, parse_retry_after(headers.get("retry-after")))
+            finally:
+                await rc.release()
+            if not pause or attempt == retries:
+                break
+            rc.stats_counters["retries"] += 1
+        if error is not None:
+            raise error
+        return result
+
+    def rate_stats(self):
+        """{host: RateController.stats()} for the hosts this engine talked to."""
+        return {host: rc.stats() for host, rc in sorted(self._rates.items())}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def format_rate_stats(stats):
+    """One line per host: the concurrency the controller settled on and what pushed it there."""
+    lines = []
+    for host, s in stats.items():
+        line = (f"Rate control ({host}, {s['mode']}): settled at {s['settled_concurrency']} of {s['ceiling']} "
+                f"(range {s['limit_min']}-{s['limit_max']}, avg in flight {s['avg_in_flight']:.1f}); "
+                f"{s['throttled']} throttled (429/503), {s['retries']} retries, {s['backoff_s']:.1f}s paused, "
+                f"{s['latency_cuts']} latency cuts, {s['error_cuts']} error cuts")
+        lines.append(line)
+    return "\n".join(lines)
+
+
+async def iterate_in_thread(iterable, maxsize=256):
+    """Async-iterate a blocking iterable (e.g. a streamed catalog) from a worker thread.
+
+    The bounded queue applies backpressure, so a fast producer never buffers
+    more than `maxsize` items ahead of the pipeline.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                put(item)
+            put(done)
+        except BaseException as e:
+            if not stop.is_set():
+                put(e)
+
+    fut = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+        await fut
+    finally:
+        # Consumer stopped early: release a producer blocked on a full queue
+        stop.set()
+        while not queue.empty():
+            queue.get_nowait()
+
+
+async def run_pipeline(items, worker, concurrency=1):
+    """Run `await worker(idx, item)` over items with up to `concurrency` posts in flight.
+
+    items may be a plain or an async iterable (see iterate_in_thread), so posts
+    start while the catalog is still arriving. Pacing is left to the Engine's
+    rate control. Results are returned in input order; None results are
+    dropped.
+    """
+    lanes = max(1, int(concurrency))
+    results = []
+    queue = asyncio.Queue(lanes * 2)
+
+    async def feed():
+        idx = 0
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                idx += 1
+                await queue.put((idx, item))
+        else:
+            for item in items:
+                idx += 1
+                await queue.put((idx, item))
+        for _ in range(lanes):
+            await queue.put(None)
+
+    async def lane():
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            idx, item = job
+            res = await worker(idx, item)
+            if res is not None:
+                results.append((idx, res))
+
+    feeder = asyncio.ensure_future(feed())
+    try:
+        await asyncio.gather(feeder, *(lane() for _ in range(lanes)))
+    finally:
+        feeder.cancel()
+    results.sort(key=lambda r: r[0])
+    return [r for _, r in results]
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+DNI Fleet: run a validator tool across many sites in parallel
+
+Runs one of the single-site tools against every site in a sites file. Each
+site is a separate subprocess with its own output files, so a slow or stuck
+site only holds its own slot. Then it merges the per-site summary JSONs into
+one report with per-site rows and a fleet aggregate.
+
+Sites file (JSON array, JSON Lines or CSV with a header):
+  {"name": "blog", "base": "https://blog.example.com", "user": "agent",
+   "app_pass_env": "BLOG_APP_PASS"}
+  {"name": "docs", "base": "https://docs.example.com", "user": "agent",
+   "app_pass_file": "~/.secrets/docs.pass", "args": ["--status", "any"]}
+Credentials are referenced, not stored: app_pass_env names an environment
+variable and app_pass_file a file holding the Application Password (a
+literal app_pass is accepted but discouraged). "args" are extra tool
+arguments for that site only.
+
+Usage:
+  python tools/validator/dni_fleet.py --sites sites.json --tool measure \
+    [--jobs 8] [--per-host 1] [--timeout 1800] [--out-dir fleet] [--json fleet.json] \
+    [-- --limit 50 --concurrency 4]
+
+  Tools: validate (dual_native_validate.py --all), measure
+  (measure_dni_savings.py), benchmark (benchmark_api_vs_dni.py) and sync
+  (dni_sync.py). Arguments after "--" go to every site's run.
+
+Notes:
+  - --jobs caps sites running at once. --per-host caps runs against one
+    hostname (multisite networks, shared servers); a site waiting for its
+    host does not hold a --jobs slot. Per-site request concurrency is the
+    tool's own --concurrency, passed after "--".
+  - measure and benchmark get a per-site token cache, <name>.tokens.sqlite
+    in --out-dir, unless --token-cache is given explicitly.
+  - The password reaches each tool as --app-pass on its command line, like
+    a manual run; use a host where other users cannot list processes.
+  - Exit status is 1 if any site failed, timed out or was skipped for
+    missing credentials.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# script, fixed args, output flags, the summary field counting posts (aggregate
+# weight), fields averaged over the fleet (weighted) and fields summed
+TOOLS = {
+    "validate": {
+        "script": "dual_native_validate.py",
+        "args": ["--all"],
+        "csv": False,
+        "json": True,
+        "weight": "posts",
+        "mean": ["pass_rate_pct", "posts_per_s"],
+        "sum": ["posts", "passed", "warned", "failed", "http_pool.requests", "http_pool.errors"],
+    },
+    "measure": {
+        "script": "measure_dni_savings.py",
+        "args": [],
+        "csv": True,
+        "token_cache": True,
+        "json": True,
+        "weight": "count",
+        "mean": ["avg_html_kb", "avg_mr_kb", "avg_bandwidth_savings_pct", "avg_token_savings_pct",
+                 "avg_time_html_ms", "avg_time_mr_ms", "zero_fetch_rate_pct"],
+        "sum": ["count", "digest_mismatches", "http_pool.requests", "http_pool.errors"],
+    },
+    "benchmark": {
+        "script": "benchmark_api_vs_dni.py",
+        "args": [],
+        "csv": True,
+        "token_cache": True,
+        "json": True,
+        "weight": "posts_tested",
+        "mean": ["improvements.avg_size_savings_pct", "improvements.avg_token_savings_pct",
+                 "improvements.avg_speedup_factor", "standard_api.avg_time_ms", "dual_native_api.avg_time_ms"],
+        "sum": ["posts_tested", "dual_native_api.digest_mismatches", "http_pool.requests", "http_pool.errors"],
+    },
+    "sync": {
+        "script": "dni_sync.py",
+        "args": [],
+        "csv": False,
+        "json": True,
+        "weight": "catalog_items",
+        "mean": [],
+        "sum": ["catalog_items", "new", "changed", "pruned", "mr_fetched_200", "mr_not_modified_304",
+                "mr_errors", "mr_bytes", "requests"],
+    },
+}
+
+
+class SitesError(ValueError):
+    pass
+
+
+def load_sites(path):
+    """Site dicts from a JSON array, JSON Lines or CSV file; raises SitesError."""
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            text = f.read()
+    except OSError as e:
+        raise SitesError(str(e))
+    stripped = text.lstrip()
+    try:
+        if stripped.startswith("["):
+            sites = json.loads(stripped)
+        elif stripped.startswith("{"):
+            sites = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            sites = list(csv.DictReader(text.splitlines()))
+    except ValueError as e:
+        raise SitesError(f"{path}: {e}")
+    names = set()
+    for i, s in enumerate(sites, 1):
+        if not isinstance(s, dict) or not s.get("base"):
+            raise SitesError(f"{path}: site {i} has no base URL")
+        s.setdefault("name", urlsplit(s["base"]).hostname or f"site{i}")
+        if s["name"] in names:
+            raise SitesError(f"{path}: duplicate site name {s['name']}")
+        names.add(s["name"])
+        if isinstance(s.get("args"), str):
+            s["args"] = s["args"].split()
+    return sites
+
+
+def resolve_password(site):
+    """The site's Application Password from its reference; raises SitesError."""
+    if site.get("app_pass_env"):
+        value = os.environ.get(site["app_pass_env"])
+        if value is None:
+            raise SitesError(f"environment variable {site['app_pass_env']} is not set")
+        return value
+    if site.get("app_pass_file"):
+        try:
+            with open(os.path.expanduser(site["app_pass_file"]), encoding="utf-8") as f:
+                return f.read().strip()
+        except OSError as e:
+            raise SitesError(str(e))
+    if site.get("app_pass"):
+        return site["app_pass"]
+    raise SitesError("no app_pass_env, app_pass_file or app_pass")
+
+
+def pick(data, path):
+    """data["a"]["b"] for "a.b", or None."""
+    for part in path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data if isinstance(data, (int, float)) and not isinstance(data, bool) else None
+
+
+def aggregate(tool, results):
+    """Fleet totals (sum fields) and post-weighted means (mean fields) over sites with a summary."""
+    spec = TOOLS[tool]
+    ok = [r for r in results if r.get("summary")]
+    out = {"sites_with_summary": len(ok)}
+    for field in spec["sum"]:
+        vals = [pick(r["summary"], field) for r in ok]
+        out[field] = sum(v for v in vals if v is not None)
+    for field in spec["mean"]:
+        num = den = 0.0
+        for r in ok:
+            v = pick(r["summary"], field)
+            w = pick(r["summary"], spec["weight"]) if spec["weight"] else 1
+            if v is not None and w:
+                num += v * w
+                den += w
+        out[field] = round(num / den, 2) if den else None
+    return out
+
+
+async def run_site(site, args, extra, jobs, host_sems):
+    spec = TOOLS[args.tool]
+    name = site["name"]
+    res = {"name": name, "base": site["base"], "status": "ok", "exit_code": None, "elapsed_s": 0.0,
+           "queued_s": 0.0, "summary": None, "error": None}
+    try:
+        password = resolve_password(site)
+    except SitesError as e:
+        res.update(status="skipped", error=str(e))
+        print(f"  SKIP {name}: {e}")
+        return res
+
+    prefix = os.path.join(args.out_dir, name)
+    cmd = [sys.executable, os.path.join(HERE, spec["script"]), "--base", site["base"],
+           "--user", site.get("user") or "", "--app-pass", password] + spec["args"]
+    if spec["csv"]:
+        cmd += ["--out", prefix + ".csv"]
+    if spec["json"]:
+        cmd += ["--json", prefix + ".json"]
+    if args.tool == "sync":
+        cmd += ["--db", prefix + ".sqlite"]
+    site_args = list(site.get("args") or [])
+    if spec.get("token_cache") and "--token-cache" not in extra + site_args:
+        # Its own cache per site: concurrent sites never wait on one shared file
+        cmd += ["--token-cache", prefix + ".tokens.sqlite"]
+    cmd += extra + site_args
+
+    host = urlsplit(site["base"]).hostname or name
+    sem = host_sems.setdefault(host, asyncio.Semaphore(max(1, args.per_host)))
+    queued = time.perf_counter()
+    # Host slot first: sites queued behind a busy host must not hold global slots
+    async with sem, jobs:
+        res["queued_s"] = round(time.perf_counter() - queued, 2)
+        # A failed or killed run must not leave the previous run's summary
+        # behind; --resume continues the existing CSV, so that one stays
+        stale = [prefix + ".json"] + ([prefix + ".csv"] if "--resume" not in cmd else [])
+        for path in stale:
+            if os.path.exists(path):
+                os.remove(path)
+        started = time.perf_counter()
+        with open(prefix + ".log", "wb") as log:
+            # Tools import their dni_* siblings, so they run from this directory
+            proc = await asyncio.create_subprocess_exec(*cmd, cwd=HERE, stdout=log, stderr=asyncio.subprocess.STDOUT)
+            try:
+                res["exit_code"] = await asyncio.wait_for(proc.wait(), args.timeout if args.timeout > 0 else None)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                res.update(status="timeout", error=f"killed after {args.timeout}s")
+        res["elapsed_s"] = round(time.perf_counter() - started, 2)
+
+    if res["status"] == "ok" and res["exit_code"] != 0:
+        res.update(status="failed", error=f"exit status {res['exit_code']} (see {prefix}.log)")
+    if spec["json"] and os.path.exists(prefix + ".json"):
+        try:
+            with open(prefix + ".json", encoding="utf-8") as f:
+                res["summary"] = json.load(f)
+        except ValueError as e:
+            res["error"] = res["error"] or f"unreadable summary: {e}"
+    print(f"  {res['status'].upper():<7} {name} in {res['elapsed_s']:.1f}s"
+          + (f" (queued {res['queued_s']:.1f}s)" if res["queued_s"] >= 0.1 else "") + (f": {res['error']}" if res["error"] else ""))
+    return res
+
+
+async def run_fleet(sites, args, extra):
+    jobs = asyncio.Semaphore(max(1, args.jobs))
+    host_sems = {}
+    return await asyncio.gather(*(run_site(s, args, extra, jobs, host_sems) for s in sites))
+
+
+def main():
+    argv = sys.argv[1:]
+    extra = []
+    if "--" in argv:
+        cut = argv.index("--")
+        argv, extra = argv[:cut], argv[cut + 1:]
+    ap = argparse.ArgumentParser(description="Run a validator tool across many sites and merge the results")
+    ap.add_argument("--sites", required=True, help="Sites file (JSON, JSON Lines or CSV)")
+    ap.add_argument("--tool", required=True, choices=sorted(TOOLS), help="Tool to run on every site")
+    ap.add_argument("--jobs", type=int, default=8, help="Sites running at once")
+    ap.add_argument("--per-host", dest="per_host", type=int, default=1, help="Runs at once against one hostname")
+    ap.add_argument("--timeout", type=float, default=1800, help="Per-site time limit in seconds (0 = none)")
+    ap.add_argument("--only", default="", help="Comma list of site names to run (default: all)")
+    ap.add_argument("--out-dir", dest="out_dir", default="fleet", help="Per-site logs, CSVs and JSONs go here")
+    ap.add_argument("--json", help="Write the merged fleet report here")
+    args = ap.parse_args(argv)
+
+    try:
+        sites = load_sites(args.sites)
+    except SitesError as e:
+        print(f"ERROR: {e}")
+        return 2
+    if args.only:
+        wanted = {n.strip() for n in args.only.split(",") if n.strip()}
+        sites = [s for s in sites if s["name"] in wanted]
+    if not sites:
+        print("ERROR: No sites to run")
+        return 2
+    # Tools run with cwd=HERE, so their output paths must not be relative
+    args.out_dir = os.path.abspath(args.out_dir)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    print(f"Fleet: {args.tool} on {len(sites)} sites, {args.jobs} at a time, {args.per_host} per host")
+    started = time.perf_counter()
+    results = asyncio.run(run_fleet(sites, args, extra))
+    elapsed = time.perf_counter() - started
+
+    spec = TOOLS[args.tool]
+    cols = spec["mean"][:4]
+    print(f"\n{'Site':<24} {'Status':<8} {'Time s':>8} " + " ".join(f"{c.split('.')[-1][:22]:>22}" for c in cols))
+    print("-" * (42 + 23 * len(cols)))
+    for r in results:
+        vals = [pick(r["summary"], c) if r["summary"] else None for c in cols]
+        print(f"{r['name'][:24]:<24} {r['status']:<8} {r['elapsed_s']:>8.1f} "
+              + " ".join(f"{'-' if v is None else f'{v:.2f}':>22}" for v in vals))
+    totals = aggregate(args.tool, results)
+    counts = {s: sum(1 for r in results if r["status"] == s) for s in ("ok", "failed", "timeout", "skipped")}
+    slowest = max(results, key=lambda r: r["elapsed_s"])
+    summed = sum(r["elapsed_s"] for r in results)
+    print(f"\nFleet: {counts['ok']} ok, {counts['failed']} failed, {counts['timeout']} timed out, "
+          f"{counts['skipped']} skipped in {elapsed:.1f}s "
+          f"(sites total {summed:.1f}s, slowest {slowest['name']} {slowest['elapsed_s']:.1f}s)")
+    print(json.dumps(totals, ensure_ascii=False, indent=2))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as jf:
+            json.dump({"tool": args.tool, "sites": len(results), "status": counts, "elapsed_s": round(elapsed, 3),
+                       "aggregate": totals, "per_site": results}, jf, ensure_ascii=False, indent=2)
+    return 0 if counts["ok"] == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
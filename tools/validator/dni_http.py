@@ -0,0 +1,578 @@
+"""
+Pooled HTTP client shared by the validator tools.
+
+Keeps HTTP/1.1 keep-alive connections per (scheme, host, port) so that the
+TCP connect and TLS handshake are paid once per connection instead of once
+per request, and exposes pool statistics (connections opened / reused,
+handshake time) so reports can show what connection setup cost.
+
+Stdlib only: HTTP/2 multiplexing is not available in http.client, so
+concurrency comes from several pooled HTTP/1.1 connections per host.
+
+Bodies that carry a Content-Digest (RFC 9530) header are hashed chunk by
+chunk as they are read, so integrity is checked without a second pass over
+the buffered body. The verdict is on FetchResult.digest_ok /
+StreamResponse.digest_ok, and the totals are in stats().
+
+Responses are requested compressed (Accept-Encoding: gzip, deflate, plus br
+when the optional brotli package is installed) and decoded on the fly, so
+callers still get the decoded body while .transfer records what crossed the
+wire: encoding, wire_bytes, body_bytes and decode_ms. Pass
+accept_encoding="identity" to HttpPool to turn compression off.
+"""
+
+import base64
+import hashlib
+import http.client
+import socket
+import ssl
+import threading
+import time
+import zlib
+from urllib.parse import urljoin, urlsplit
+
+try:
+    import brotli  # optional: br content-coding
+except ImportError:
+    brotli = None
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+# Errors that mean a reused keep-alive connection was closed by the server
+STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, BrokenPipeError, ConnectionResetError)
+# Per-request timing phases recorded on StreamResponse/FetchResult.phases
+PHASES = ("dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "download_ms")
+# RFC 9530 algorithm names -> hashlib names
+DIGEST_ALGORITHMS = {"sha-256": "sha256", "sha-512": "sha512"}
+# Content-codings the pool can decode, in the Accept-Encoding it sends by default
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+
+class ContentDecodingError(ValueError):
+    pass
+
+
+class _ZlibDecoder:
+    """gzip, or deflate as zlib-wrapped (RFC 9110) with a raw-deflate fallback."""
+
+    def __init__(self, encoding):
+        self._gzip = encoding in ("gzip", "x-gzip")
+        self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS if self._gzip else zlib.MAX_WBITS)
+        self._started = False
+
+    def decompress(self, data):
+        try:
+            out = self._obj.decompress(data)
+        except zlib.error as e:
+            if self._gzip or self._started:
+                raise ContentDecodingError(f"Invalid {'gzip' if self._gzip else 'deflate'} body: {e}") from None
+            # Some servers send raw deflate without the zlib header
+            self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+            out = self._obj.decompress(data)
+        self._started = True
+        return out
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class _BrotliDecoder:
+    def __init__(self):
+        self._obj = brotli.Decompressor()
+
+    def decompress(self, data):
+        try:
+            return self._obj.process(data)
+        except brotli.error as e:
+            raise ContentDecodingError(f"Invalid br body: {e}") from None
+
+    def flush(self):
+        return b""
+
+
+def content_decoder(encoding):
+    """Incremental decoder for a Content-Encoding value; None for identity or unsupported codings."""
+    encoding = (encoding or "").strip().lower()
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        return _ZlibDecoder(encoding)
+    if encoding == "br" and brotli is not None:
+        return _BrotliDecoder()
+    return None
+
+
+def parse_content_digest(value):
+    """{algorithm: digest bytes} from a Content-Digest header; unknown algorithms are skipped."""
+    out = {}
+    for member in (value or "").split(","):
+        algo, _, rest = member.strip().partition("=")
+        algo = algo.strip().lower()
+        rest = rest.strip()
+        if algo not in DIGEST_ALGORITHMS or len(rest) < 2 or rest[0] != ":" or rest[-1] != ":":
+            continue
+        try:
+            out[algo] = base64.b64decode(rest[1:-1], validate=True)
+        except ValueError:
+            out[algo] = b""
+    return out
+
+
+def parse_server_timing(value):
+    """{metric: dur_ms} from a Server-Timing header; metrics without dur are skipped."""
+    out = {}
+    for entry in (value or "").split(","):
+        name, *params = [p.strip() for p in entry.split(";")]
+        for param in params:
+            key, _, val = param.partition("=")
+            if name and key.strip().lower() == "dur":
+                try:
+                    out[name] = float(val.strip().strip('"'))
+                except ValueError:
+                    pass
+    return out
+
+
+def server_metrics(headers):
+    """Numeric server-side profiler values from a response's headers.
+
+    X-Bench-Time-Route-Ms: 8 -> time_route_ms, X-Bench-Queries-Delta -> queries_delta,
+    ...; Server-Timing db;dur=1.2 -> st_db_ms. Non-numeric values (x-bench-route)
+    are dropped.
+    """
+    out = {}
+    for k, v in headers.items():
+        if k.startswith("x-bench-"):
+            try:
+                out[k[len("x-bench-"):].replace("-", "_")] = float(v)
+            except ValueError:
+                pass
+    for name, dur in parse_server_timing(headers.get("server-timing")).items():
+        out[f"st_{name}_ms"] = dur
+    return out
+
+
+def phase_values(result):
+    """{phase: ms} for the PHASES a response recorded (empty for network errors)."""
+    return {p: result.phases[p] for p in PHASES if p in result.phases}
+
+
+def fmt_metric(value):
+    """CSV cell for a server metric: '' when absent, integers without '.0'."""
+    if value is None:
+        return ""
+    return str(int(value)) if float(value).is_integer() else str(round(value, 3))
+
+
+def digest_label(ok):
+    """Report label for a digest verdict: ok / mismatch / none (no header)."""
+    return "none" if ok is None else ("ok" if ok else "mismatch")
+
+
+class FetchResult(tuple):
+    """(status, headers, body, elapsed_ms) plus .digest_ok (True / False / None),
+    .phases (dns/connect/tls/ttfb/download ms) and .transfer (encoding,
+    wire_bytes, body_bytes, decode_ms); both are empty on network errors."""
+
+    def __new__(cls, status, headers, body, elapsed_ms, digest_ok=None, phases=None, transfer=None):
+        self = super().__new__(cls, (status, headers, body, elapsed_ms))
+        self.digest_ok = digest_ok
+        self.phases = phases or {}
+        self.transfer = transfer or {}
+        return self
+
+
+class HttpPool:
+    """Thread-safe keep-alive connection pool.
+
+    request()/fetch() return (status, headers_dict, body_bytes, elapsed_ms)
+    with lower-cased header names, like the tools' original fetch().
+    Network errors are reported as status 0.
+    """
+
+    def __init__(self, timeout=20, max_idle_per_host=32, max_redirects=5, user_agent="dni-tools/1.0", verify_digest=True,
+                 accept_encoding=ACCEPT_ENCODING):
+        self.timeout = timeout
+        self.verify_digest = verify_digest
+        # Sent unless the caller sets its own Accept-Encoding; "identity" disables compression
+        self.accept_encoding = accept_encoding
+        self.max_idle_per_host = max_idle_per_host
+        self.max_redirects = max_redirects
+        self.user_agent = user_agent
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._ssl_ctx = ssl.create_default_context()
+        self._stats = {
+            "requests": 0,
+            "errors": 0,
+            "connections_opened": 0,
+            "connections_reused": 0,
+            "connections_dropped": 0,
+            "handshake_ms_total": 0.0,
+            "dns_ms_total": 0.0,
+            "connect_ms_total": 0.0,
+            "tls_ms_total": 0.0,
+            "digest_verified": 0,
+            "digest_mismatches": 0,
+            "digest_bytes": 0,
+            "digest_ms_total": 0.0,
+            "compressed_responses": 0,
+            "wire_bytes": 0,
+            "body_bytes": 0,
+            "decode_ms_total": 0.0,
+        }
+
+    # -- connection management -------------------------------------------
+
+    def _key(self, parts):
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        return (parts.scheme, parts.hostname, port)
+
+    def _checkout(self, key, timeout):
+        """Return (conn, reused, phases). New connections are connected (and timed) here."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self._stats["connections_reused"] += 1
+                return idle.pop(), True, {"dns_ms": 0.0, "connect_ms": 0.0, "tls_ms": 0.0}
+        conn, phases = self._connect(key, timeout)
+        with self._lock:
+            self._stats["connections_opened"] += 1
+            self._stats["handshake_ms_total"] += sum(phases.values())
+            for phase, ms in phases.items():
+                self._stats[f"{phase[:-3]}_ms_total"] += ms
+        return conn, False, phases
+
+    def _connect(self, key, timeout):
+        """Open a connection with DNS, TCP connect and TLS timed separately.
+
+        Does what HTTP(S)Connection.connect() does, one step at a time, and
+        hands the ready socket to the connection object.
+        """
+        scheme, host, port = key
+        t0 = time.perf_counter_ns()
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        t1 = time.perf_counter_ns()
+        sock, err = None, None
+        for family, socktype, proto, _, addr in infos:
+            sock = socket.socket(family, socktype, proto)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(addr)
+                break
+            except OSError as e:
+                err = e
+                sock.close()
+                sock = None
+        if sock is None:
+            raise err or OSError(f"getaddrinfo returned no addresses for {host}")
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        t2 = t3 = time.perf_counter_ns()
+        if scheme == "https":
+            try:
+                sock = self._ssl_ctx.wrap_socket(sock, server_hostname=host)
+            except Exception:
+                sock.close()
+                raise
+            t3 = time.perf_counter_ns()
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=self._ssl_ctx)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        conn.sock = sock
+        return conn, {"dns_ms": (t1 - t0) / 1e6, "connect_ms": (t2 - t1) / 1e6, "tls_ms": (t3 - t2) / 1e6}
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _drop(self, conn):
+        with self._lock:
+            self._stats["connections_dropped"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # -- requests ----------------------------------------------------------
+
+    def _send_once(self, method, url, headers, body, timeout):
+        """Send one request on a pooled connection (no redirects); returns an unread StreamResponse."""
+        parts = urlsplit(url)
+        key = self._key(parts)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        hdrs = {"User-Agent": self.user_agent}
+        if self.accept_encoding and not any(k.lower() == "accept-encoding" for k in headers or ()):
+            hdrs["Accept-Encoding"] = self.accept_encoding
+        if headers:
+            hdrs.update(headers)
+        conn, resp, phases = self._exchange(key, method, path, hdrs, body, timeout)
+        return StreamResponse(self, key, conn, resp, method, phases)
+
+    def _exchange(self, key, method, path, hdrs, body, timeout):
+        """Send the request and read the status line and headers: (conn, http.client response, phases).
+
+        The only step that touches the network; dni_replay's pools override it.
+        """
+        for attempt in (1, 2):
+            conn, reused, phases = self._checkout(key, timeout)
+            try:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                sent_ns = time.perf_counter_ns()
+                conn.request(method, path, body=body, headers=hdrs)
+                resp = conn.getresponse()
+                # Status line and headers are in: time to first byte, request included
+                phases["ttfb_ms"] = (time.perf_counter_ns() - sent_ns) / 1e6
+                phases["reused"] = reused
+            except STALE_ERRORS:
+                self._drop(conn)
+                # The server closed an idle keep-alive connection: retry once on a fresh one
+                if reused and attempt == 1 and method in IDEMPOTENT_METHODS:
+                    continue
+                raise
+            except Exception:
+                self._drop(conn)
+                raise
+            return conn, resp, phases
+        raise ConnectionError("unreachable")
+
+    def open(self, method, url, headers=None, body=None, timeout=None):
+        """Send a request and return a StreamResponse positioned at the body.
+
+        Redirects are followed for GET/HEAD. Network errors raise (OSError /
+        http.client.HTTPException); the caller must read or close() the response.
+        """
+        timeout = timeout or self.timeout
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        with self._lock:
+            self._stats["requests"] += 1
+        start_ns = time.perf_counter_ns()
+        try:
+            resp = self._send_once(method, url, headers, body, timeout)
+            hops = 0
+            while resp.status in REDIRECT_CODES and method in ("GET", "HEAD") and hops < self.max_redirects and resp.headers.get("location"):
+                hops += 1
+                resp.read()
+                url = urljoin(url, resp.headers["location"])
+                resp = self._send_once(method, url, headers, None, timeout)
+        except (OSError, http.client.HTTPException, ValueError):
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        resp.start_ns = start_ns
+        resp.url = url
+        return resp
+
+    def stream(self, url, headers=None, timeout=None):
+        """GET url for incremental reading (see StreamResponse.iter_chunks)."""
+        return self.open("GET", url, headers, None, timeout)
+
+    def request(self, method, url, headers=None, body=None, timeout=None):
+        """Send a request and read the whole body.
+
+        Returns a FetchResult: (status, headers_dict, body_bytes, elapsed_ms)
+        with .digest_ok set when the response carried a Content-Digest.
+        """
+        start_ns = time.perf_counter_ns()
+        try:
+            resp = self.open(method, url, headers, body, timeout)
+            data = resp.read()
+            return FetchResult(resp.status, resp.headers, data, resp.elapsed_ms, resp.digest_ok, resp.phases, resp.transfer)
+        except (OSError, http.client.HTTPException, ValueError):
+            elapsed = (time.perf_counter_ns() - start_ns) / 1e6
+            return FetchResult(0, {}, b"", elapsed)
+
+    def fetch(self, url, headers=None, timeout=None):
+        """GET url; drop-in replacement for the tools' old fetch()."""
+        return self.request("GET", url, headers, None, timeout)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+        opened = s["connections_opened"]
+        for k in ("handshake_ms_total", "dns_ms_total", "connect_ms_total", "tls_ms_total"):
+            s[k] = round(s[k], 2)
+        s["avg_handshake_ms"] = round(s["handshake_ms_total"] / opened, 2) if opened else 0.0
+        checkouts = opened + s["connections_reused"]
+        s["reuse_rate_pct"] = round(s["connections_reused"] / checkouts * 100.0, 2) if checkouts else 0.0
+        # Hashing throughput: bytes digested per second of hashing time
+        s["digest_ms_total"] = round(s["digest_ms_total"], 2)
+        s["digest_mb_per_s"] = round(s["digest_bytes"] / 1e6 / (s["digest_ms_total"] / 1000.0), 1) if s["digest_ms_total"] > 0 else 0.0
+        s["accept_encoding"] = self.accept_encoding or "identity"
+        s["decode_ms_total"] = round(s["decode_ms_total"], 2)
+        s["wire_ratio_pct"] = round(s["wire_bytes"] / s["body_bytes"] * 100.0, 2) if s["body_bytes"] else 0.0
+        return s
+
+    def _record_digest(self, ok, nbytes, hash_ms):
+        with self._lock:
+            self._stats["digest_verified"] += 1
+            self._stats["digest_mismatches"] += 0 if ok else 1
+            self._stats["digest_bytes"] += nbytes
+            self._stats["digest_ms_total"] += hash_ms
+
+    def _record_transfer(self, transfer):
+        with self._lock:
+            self._stats["compressed_responses"] += transfer["encoding"] != "identity"
+            self._stats["wire_bytes"] += transfer["wire_bytes"]
+            self._stats["body_bytes"] += transfer["body_bytes"]
+            self._stats["decode_ms_total"] += transfer["decode_ms"]
+
+    def close(self):
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for c in conns:
+            try:
+                c.close()
+            except Exception:
+                pass
+
+
+class StreamResponse:
+    """A response whose body is read incrementally.
+
+    The connection goes back to the pool once the body has been read to the
+    end; close() before that discards the connection instead. A gzip, deflate
+    or br body is decoded chunk by chunk; .transfer has the wire and decoded
+    sizes once it is complete. If the pool verifies digests and the response
+    has a Content-Digest, every chunk is hashed as it is read and digest_ok
+    is set once the body is complete.
+    """
+
+    def __init__(self, pool, key, conn, resp, method="GET", phases=None):
+        self.status = resp.status
+        self.headers = {}
+        for k, v in resp.getheaders():
+            k = k.lower()
+            # Repeated list headers (Server-Timing, Vary, ...) are folded per RFC 9110
+            self.headers[k] = f"{self.headers[k]}, {v}" if k in self.headers else v
+        self.url = None
+        # Monotonic integer clock; open() resets it to when the request was sent
+        self.start_ns = time.perf_counter_ns()
+        self.elapsed_ms = None
+        self.digest_ok = None
+        # dns/connect/tls (0 on a reused connection), ttfb, and download once the body is read
+        self.phases = dict(phases or {})
+        encoding = self.headers.get("content-encoding", "").strip().lower() or "identity"
+        self._decoder = content_decoder(encoding) if method != "HEAD" else None
+        # encoding, wire_bytes (as received, before decoding), body_bytes (decoded), decode_ms
+        self.transfer = {"encoding": encoding, "wire_bytes": 0, "body_bytes": 0, "decode_ms": 0.0}
+        self._decode_ns = 0
+        self._headers_ns = time.perf_counter_ns()
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._resp = resp
+        self._done = False
+        self._hashers = []
+        self._body_hashers = []
+        self._hashed = 0
+        self._hash_ns = 0
+        if pool.verify_digest and method != "HEAD" and self.status not in (204, 304) and "content-digest" in self.headers:
+            for algo, expected in parse_content_digest(self.headers["content-digest"]).items():
+                self._hashers.append((hashlib.new(DIGEST_ALGORITHMS[algo]), expected))
+                if self._decoder is not None:
+                    # RFC 9530 digests the encoded bytes, but a web server compressing
+                    # after PHP computed the header leaves it over the decoded ones
+                    self._body_hashers.append((hashlib.new(DIGEST_ALGORITHMS[algo]), expected))
+
+    def _hash(self, hashers, data):
+        t0 = time.perf_counter_ns()
+        for h, _ in hashers:
+            h.update(data)
+        self._hash_ns += time.perf_counter_ns() - t0
+
+    def _decode(self, data, final=False):
+        t0 = time.perf_counter_ns()
+        out = self._decoder.decompress(data)
+        if final:
+            out += self._decoder.flush()
+        self._decode_ns += time.perf_counter_ns() - t0
+        if self._body_hashers and out:
+            self._hash(self._body_hashers, out)
+        self.transfer["body_bytes"] += len(out)
+        return out
+
+    def iter_chunks(self, size=65536):
+        """Yield (decoded) body chunks as they arrive off the socket."""
+        if self._done:
+            return
+        try:
+            while True:
+                chunk = self._resp.read1(size)
+                if not chunk:
+                    break
+                self.transfer["wire_bytes"] += len(chunk)
+                if self._hashers:
+                    self._hash(self._hashers, chunk)
+                    self._hashed += len(chunk)
+                if self._decoder is None:
+                    self.transfer["body_bytes"] += len(chunk)
+                    yield chunk
+                    continue
+                out = self._decode(chunk)
+                if out:
+                    yield out
+            if self._decoder is not None:
+                tail = self._decode(b"", final=True)
+                if tail:
+                    yield tail
+        except BaseException:
+            self._release(False)
+            raise
+        self._release(True)
+
+    def read(self):
+        return b"".join(self.iter_chunks())
+
+    def _release(self, complete):
+        if self._done:
+            return
+        self._done = True
+        now = time.perf_counter_ns()
+        self.elapsed_ms = (now - self.start_ns) / 1e6
+        self.phases["download_ms"] = (now - self._headers_ns) / 1e6
+        self.transfer["decode_ms"] = self._decode_ns / 1e6
+        if complete:
+            self._pool._record_transfer(self.transfer)
+        if complete and self._hashers:
+            self.digest_ok = all(h.digest() == expected for h, expected in self._hashers)
+            if not self.digest_ok and self._body_hashers:
+                self.digest_ok = all(h.digest() == expected for h, expected in self._body_hashers)
+            self._pool._record_digest(self.digest_ok, self._hashed, self._hash_ns / 1e6)
+        if complete and not self._resp.will_close:
+            # read1() does not mark the response closed at end of body; do it so the
+            # connection accepts the next request
+            self._resp.close()
+            self._pool._checkin(self._key, self._conn)
+        else:
+            self._pool._drop(self._conn)
+
+    def close(self):
+        self._release(False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def format_pool_stats(stats):
+    """One-line human summary of HttpPool.stats()."""
+    line = (f"HTTP pool: {stats['requests']} requests, {stats['connections_opened']} connections opened, "
+            f"{stats['connections_reused']} reused ({stats['reuse_rate_pct']:.0f}%), "
+            f"avg handshake {stats['avg_handshake_ms']:.1f} ms, {stats['errors']} errors")
+    if stats.get("compressed_responses"):
+        line += (f"; compression ({stats['accept_encoding']}): {stats['compressed_responses']} responses, "
+                 f"wire {stats['wire_ratio_pct']:.0f}% of decoded, decode {stats['decode_ms_total']:.0f} ms")
+    if stats.get("digest_verified"):
+        line += (f"; Content-Digest: {stats['digest_verified']} verified, "
+                 f"{stats['digest_mismatches']} mismatches, {stats['digest_mb_per_s']:.0f} MB/s")
+    return line
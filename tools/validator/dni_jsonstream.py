@@ -0,0 +1,182 @@
+"""
+Incremental parser for the /catalog response.
+
+The catalog is one JSON object, {"count": N, "cursor": "...", "items": [...]},
+that grows with the site. CatalogStream parses it from a stream of byte
+chunks and yields each entry of "items" as soon as it is complete. Memory
+stays bounded by the largest single item, not by the catalog size. Top-level
+scalars (count, cursor) land in .meta as they are seen.
+
+Usage:
+  status, stream = open_catalog(pool, catalog_url, headers)
+  # or: stream = CatalogStream(resp.iter_chunks())
+  meta = stream.read_header()      # everything before "items" (count, cursor)
+  for item in stream:              # items, one at a time
+      ...
+  stream.meta                      # complete once iteration is done
+"""
+
+import codecs
+import json
+import time
+
+WS = " \t\r\n"
+
+
+class CatalogStreamError(ValueError):
+    pass
+
+
+class CatalogStream:
+    def __init__(self, chunks, items_key="items"):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._state = "start"
+        self.items_key = items_key
+        self.meta = {}
+        self.items_seen = 0
+        self.response = None
+        self.started = time.perf_counter()
+        self.first_item_ms = None
+
+    # -- buffer ------------------------------------------------------------
+
+    def _more(self):
+        """Append the next chunk; False at end of stream."""
+        if self._eof:
+            return False
+        # Drop consumed text so the buffer only holds the unparsed tail
+        if self._pos > 65536:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self._buf += text
+                return True
+        self._buf += self._decoder.decode(b"", final=True)
+        self._eof = True
+        return False
+
+    def _peek(self):
+        """Next non-whitespace char (not consumed), or '' at end of stream."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in WS:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._more():
+                return ""
+
+    def _expect(self, chars):
+        c = self._peek()
+        if not c or c not in chars:
+            raise CatalogStreamError(f"Expected one of {chars!r} at offset {self._pos}, got {c!r}")
+        self._pos += 1
+        return c
+
+    def _value(self):
+        """Decode one complete JSON value at the cursor."""
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._more():
+                    continue
+                raise CatalogStreamError(f"Truncated or invalid JSON at offset {self._pos}")
+            # A value ending exactly at the buffer edge may be a cut-off number or literal
+            if end == len(self._buf) and self._more():
+                continue
+            self._pos = end
+            return value
+
+    # -- structure -----------------------------------------------------------
+
+    def _next_key(self):
+        """Next top-level key, or None at the closing brace."""
+        if self._state == "start":
+            self._expect("{")
+            self._state = "object"
+            if self._peek() == "}":
+                self._pos += 1
+                self._state = "done"
+                return None
+        elif self._state == "after_value":
+            if self._expect(",}") == "}":
+                self._state = "done"
+                return None
+        key = self._value()
+        if not isinstance(key, str):
+            raise CatalogStreamError("Object key is not a string")
+        self._expect(":")
+        return key
+
+    def read_header(self):
+        """Parse top-level members up to the start of the items array; returns .meta."""
+        while self._state in ("start", "object", "after_value"):
+            key = self._next_key()
+            if key is None:
+                break
+            if key == self.items_key and self._peek() == "[":
+                self._pos += 1
+                self._state = "items_first"
+                break
+            self.meta[key] = self._value()
+            self._state = "after_value"
+        return self.meta
+
+    def _finish(self):
+        """Read to end of stream so the response (and its connection) is released."""
+        if self._peek():
+            raise CatalogStreamError(f"Trailing data at offset {self._pos}")
+
+    def close(self):
+        """Release the response; a partly read body discards its connection."""
+        if self.response is not None:
+            self.response.close()
+
+    def __iter__(self):
+        self.read_header()
+        while self._state in ("items_first", "items"):
+            c = self._peek()
+            if c == "]":
+                self._pos += 1
+                self._state = "after_value"
+                # Members after "items" (e.g. cursor) still go into meta
+                self.read_header()
+                self._finish()
+                break
+            if self._state == "items":
+                self._expect(",")
+            self._state = "items"
+            item = self._value()
+            self.items_seen += 1
+            if self.first_item_ms is None:
+                self.first_item_ms = (time.perf_counter() - self.started) * 1000
+            yield item
+
+
+def open_catalog(pool, url, headers=None, timeout=60):
+    """Start streaming a catalog from an HttpPool.
+
+    Returns (status, stream); stream is None unless status is 200 (status 0 on
+    a network error). stream.response is the underlying StreamResponse and
+    stream.first_item_ms / stream.started time the transfer.
+    """
+    started = time.perf_counter()
+    try:
+        resp = pool.stream(url, headers, timeout)
+    except Exception:
+        return 0, None
+    if resp.status != 200:
+        resp.read()
+        return resp.status, None
+    stream = CatalogStream(resp.iter_chunks())
+    stream.response = resp
+    stream.started = started
+    return 200, stream
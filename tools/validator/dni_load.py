@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+DNI Load Test
+
+Sustained load against the Dual-Native and Standard REST routes with
+latency histograms (p50/p90/p99/p99.9) and throughput.
+
+Two drivers:
+  --rps R   open-loop: requests start on a fixed schedule (R per second)
+            whether or not earlier ones finished. Latency is measured from
+            the *intended* start time, so queueing behind slow responses is
+            counted instead of hidden (coordinated-omission safe).
+  --vus N   closed-loop: N virtual users each send a request, wait for it,
+            then pace to --pace-ms. Samples are corrected for coordinated
+            omission against the pacing interval.
+
+Usage:
+  python tools/validator/dni_load.py \
+    --base https://example.com \
+    --user USERNAME \
+    --app-pass "APPLICATION PASSWORD" \
+    --rps 50 --duration 60 \
+    --mix mr=60,md=20,catalog=5,wp=15 \
+    --conditional-pct 80 \
+    --json load.json
+
+  # Merge histograms from several load generators
+  python tools/validator/dni_load.py --merge gen1.json gen2.json --json merged.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dni_http import HttpPool, format_pool_stats
+from dni_jsonstream import CatalogStreamError, open_catalog
+from dni_stats import Histogram
+
+ENDPOINTS = ("mr", "md", "catalog", "wp")
+
+
+def b64_basic(user, pw):
+    raw = f"{user}:{pw}".encode("utf-8")
+    return base64.b64encode(raw).decode("ascii")
+
+
+def parse_weights(spec):
+    """Parse "mr=60,md=20,catalog=5,wp=15" into an endpoint weight dict."""
+    out = {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, w = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name} (expected one of {', '.join(ENDPOINTS)})")
+        out[name] = float(w or 1)
+    if not out or sum(out.values()) <= 0:
+        raise ValueError("Empty endpoint mix")
+    return out
+
+
+def endpoint_url(base, endpoint, rid, catalog_status):
+    if endpoint == "mr":
+        return f"{base}/wp-json/dual-native/v1/posts/{rid}"
+    if endpoint == "md":
+        return f"{base}/wp-json/dual-native/v1/posts/{rid}/md"
+    if endpoint == "wp":
+        return f"{base}/wp-json/wp/v2/posts/{rid}"
+    return f"{base}/wp-json/dual-native/v1/catalog?status={catalog_status}"
+
+
+class LoadRecorder:
+    """Histograms per endpoint and status, plus counters. Only touched from the event loop."""
+
+    def __init__(self):
+        self.hists = {}
+        self.service = {}
+        self.errors = 0
+        self.completed = 0
+        self.status_counts = {}
+
+    def _h(self, table, key):
+        h = table.get(key)
+        if h is None:
+            h = table[key] = Histogram()
+        return h
+
+    def record(self, endpoint, status, latency_ms, service_ms, expected_interval_ms=0.0):
+        key = f"{endpoint}:{status}"
+        self.completed += 1
+        self.status_counts[key] = self.status_counts.get(key, 0) + 1
+        if status == 0:
+            self.errors += 1
+        for k in (key, "all"):
+            if expected_interval_ms > 0:
+                self._h(self.hists, k).record_corrected(latency_ms, expected_interval_ms)
+            else:
+                self._h(self.hists, k).record(latency_ms)
+            self._h(self.service, k).record(service_ms)
+
+    def report(self, elapsed_s):
+        return {
+            "completed": self.completed,
+            "errors": self.errors,
+            "throughput_rps": round(self.completed / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+            "status_counts": dict(sorted(self.status_counts.items())),
+            "latency": {k: h.summary() for k, h in sorted(self.hists.items())},
+            "service_time": {k: h.summary() for k, h in sorted(self.service.items())},
+        }
+
+
+async def run_load(args, pool, headers, rids, weights):
+    base = args.base.rstrip("/")
+    rng = random.Random(args.seed)
+    names = list(weights.keys())
+    wts = [weights[n] for n in names]
+    etags = {}
+    rec = LoadRecorder()
+    executor = ThreadPoolExecutor(max_workers=args.max_inflight)
+    loop = asyncio.get_running_loop()
+    pending = set()
+
+    def pick():
+        endpoint = rng.choices(names, wts)[0]
+        rid = rng.choice(rids)
+        h = dict(headers)
+        # Conditional share: revalidate with a known validator (expect 304)
+        if endpoint != "catalog" and rng.random() * 100.0 < args.conditional_pct:
+            tag = etags.get((endpoint, rid))
+            if tag:
+                h["If-None-Match"] = f'"{tag}"'
+        return endpoint, rid, h
+
+    async def one(endpoint, rid, h, intended, expected_interval_ms, measuring):
+        url = endpoint_url(base, endpoint, rid, args.status)
+        st, rh, _, service_ms = await loop.run_in_executor(executor, lambda: pool.fetch(url, h, args.timeout))
+        latency_ms = (time.perf_counter() - intended) * 1000.0
+        tag = rh.get("etag", "").strip().strip('"')
+        if tag:
+            etags[(endpoint, rid)] = tag
+        if measuring:
+            rec.record(endpoint, st, latency_ms, service_ms, expected_interval_ms)
+
+    t_start = time.perf_counter()
+    warm_end = t_start + args.warmup
+    t_end = warm_end + args.duration
+
+    if args.rps:
+        interval = 1.0 / args.rps
+        i = 0
+        intended = t_start
+        while intended < t_end:
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            endpoint, rid, h = pick()
+            task = asyncio.ensure_future(one(endpoint, rid, h, intended, 0.0, intended >= warm_end))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            i += 1
+            # Schedule is fixed up front; a slow response never delays the next start
+            intended = intended + rng.expovariate(args.rps) if args.arrival == "poisson" else t_start + i * interval
+    else:
+        pace = args.pace_ms / 1000.0
+
+        async def vu(n):
+            # Stagger VU start across one pacing interval
+            intended = t_start + (pace * n / args.vus if pace else 0.0)
+            while intended < t_end:
+                delay = intended - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                endpoint, rid, h = pick()
+                sent = time.perf_counter()
+                await one(endpoint, rid, h, sent, args.pace_ms, sent >= warm_end)
+                # Overran the pacing slot: skip missed slots, record_corrected back-fills them
+                intended = max(intended + pace, time.perf_counter()) if pace else time.perf_counter()
+
+        await asyncio.gather(*(vu(n) for n in range(args.vus)))
+
+    if pending:
+        await asyncio.gather(*pending)
+    elapsed = time.perf_counter() - warm_end
+    executor.shutdown(wait=True)
+    return rec, elapsed
+
+
+def load_rids(pool, base, headers, status, limit):
+    st, stream = open_catalog(pool, f"{base}/wp-json/dual-native/v1/catalog?status={status}", headers)
+    if st != 200:
+        print(f"ERROR: Catalog fetch failed with HTTP {st}")
+        return None
+    rids = []
+    try:
+        for it in stream:
+            if it.get("rid"):
+                rids.append(it["rid"])
+                if 0 < limit <= len(rids):
+                    break
+    except (CatalogStreamError, OSError) as e:
+        print(f"ERROR: Invalid catalog JSON: {e}")
+        return None
+    finally:
+        stream.close()
+    return rids
+
+
+def merge_reports(paths):
+    """Merge the raw histograms of several dni_load JSON outputs."""
+    hists = {}
+    completed = errors = 0
+    elapsed = 0.0
+    status_counts = {}
+    for p in paths:
+        with open(p, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        completed += data.get("completed", 0)
+        errors += data.get("errors", 0)
+        elapsed = max(elapsed, data.get("duration_s", 0.0))
+        for k, v in data.get("status_counts", {}).items():
+            status_counts[k] = status_counts.get(k, 0) + v
+        for k, raw in data.get("histograms", {}).items():
+            h = Histogram.from_dict(raw)
+            if k in hists:
+                hists[k].merge(h)
+            else:
+                hists[k] = h
+    return {
+        "merged_from": list(paths),
+        "completed": completed,
+        "errors": errors,
+        "duration_s": elapsed,
+        "throughput_rps": round(completed / elapsed, 2) if elapsed > 0 else 0.0,
+        "status_counts": dict(sorted(status_counts.items())),
+        "latency": {k: h.summary() for k, h in sorted(hists.items())},
+        "histograms": {k: h.to_dict() for k, h in sorted(hists.items())},
+    }
+
+
+def print_table(report):
+    print(f"\n{'Endpoint:status':<18} {'count':>8} {'p50':>9} {'p90':>9} {'p99':>9} {'p99.9':>9} {'max':>9}  (ms)")
+    print("-" * 78)
+    for k, s in report["latency"].items():
+        print(f"{k:<18} {s['count']:>8} {s['p50_ms']:>9.2f} {s['p90_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['p99_9_ms']:>9.2f} {s['max_ms']:>9.2f}")
+    print(f"\nThroughput: {report['throughput_rps']} req/s, {report['completed']} completed, {report['errors']} errors")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base", help="WordPress base URL")
+    ap.add_argument("--user", help="WordPress username")
+    ap.add_argument("--app-pass", dest="app_pass", help="WordPress Application Password")
+    drv = ap.add_mutually_exclusive_group()
+    drv.add_argument("--rps", type=float, help="Open-loop target requests per second")
+    drv.add_argument("--vus", type=int, help="Closed-loop virtual users")
+    ap.add_argument("--pace-ms", dest="pace_ms", type=float, default=0.0, help="Closed-loop pacing per VU (ms); enables CO correction")
+    ap.add_argument("--arrival", choices=("constant", "poisson"), default="constant", help="Open-loop arrival process")
+    ap.add_argument("--duration", type=float, default=30.0, help="Measured duration (seconds)")
+    ap.add_argument("--warmup", type=float, default=5.0, help="Unmeasured warmup before --duration (seconds)")
+    ap.add_argument("--mix", default="mr=60,md=20,catalog=5,wp=15", help="Endpoint weights: mr, md, catalog, wp")
+    ap.add_argument("--conditional-pct", dest="conditional_pct", type=float, default=80.0, help="Percent of requests sent with If-None-Match (expect 304)")
+    ap.add_argument("--status", default="publish", help="Catalog status filter for the rid pool")
+    ap.add_argument("--limit", type=int, default=0, help="Max rids to draw from (0 = whole catalog)")
+    ap.add_argument("--max-inflight", dest="max_inflight", type=int, default=256, help="Max concurrent requests")
+    ap.add_argument("--timeout", type=float, default=20.0, help="Per-request timeout (seconds)")
+    ap.add_argument("--seed", type=int, default=1, help="RNG seed for the request mix")
+    ap.add_argument("--json", help="Report JSON output path (includes raw histograms for --merge)")
+    ap.add_argument("--merge", nargs="+", help="Merge existing report JSON files instead of running")
+    args = ap.parse_args()
+
+    if args.merge:
+        report = merge_reports(args.merge)
+        print_table(report)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as jf:
+                json.dump(report, jf, ensure_ascii=False, indent=2)
+        return 0
+
+    if not args.base or not (args.rps or args.vus):
+        ap.error("--base and one of --rps/--vus are required (or use --merge)")
+    try:
+        weights = parse_weights(args.mix)
+    except ValueError as e:
+        ap.error(str(e))
+
+    base = args.base.rstrip("/")
+    headers = {"Accept": "application/json"}
+    if args.user and args.app_pass:
+        headers["Authorization"] = f"Basic {b64_basic(args.user, args.app_pass)}"
+    pool = HttpPool(timeout=args.timeout, max_idle_per_host=args.max_inflight)
+
+    rids = load_rids(pool, base, headers, args.status, args.limit)
+    if not rids:
+        print("ERROR: No posts to load-test")
+        return 1
+    driver = f"open-loop {args.rps} rps ({args.arrival})" if args.rps else f"closed-loop {args.vus} VUs (pace {args.pace_ms} ms)"
+    print(f"Load: {driver}, {len(rids)} posts, mix {args.mix}, {args.conditional_pct:.0f}% conditional, "
+          f"{args.warmup:.0f}s warmup + {args.duration:.0f}s")
+
+    rec, elapsed = asyncio.run(run_load(args, pool, headers, rids, weights))
+    report = {
+        "site": args.base,
+        "driver": "open" if args.rps else "closed",
+        "target_rps": args.rps,
+        "vus": args.vus,
+        "pace_ms": args.pace_ms,
+        "mix": weights,
+        "conditional_pct": args.conditional_pct,
+        "duration_s": round(elapsed, 3),
+    }
+    report.update(rec.report(elapsed))
+    report["http_pool"] = pool.stats()
+    report["histograms"] = {k: h.to_dict() for k, h in sorted(rec.hists.items())}
+    pool.close()
+
+    print_table(report)
+    print(format_pool_stats(report["http_pool"]))
+    if args.json:
+        print(f"Writing report to {args.json}...")
+        with open(args.json, "w", encoding="utf-8") as jf:
+            json.dump(report, jf, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,406 @@
+"""
+Record and replay HTTP exchanges so client-side work can be benchmarked offline.
+
+RecordingPool is an HttpPool that also writes every exchange to an archive:
+- the request line and headers (credentials removed)
+- the response status and headers
+- the body bytes as they came off the wire, before content decoding
+- the timing phases
+
+ReplayPool is an HttpPool that never opens a socket. It answers each
+request from an archive. Replayed wire bytes go through the same
+StreamResponse as live ones, so decoding, Content-Digest checks and
+everything the tools do after that run unchanged, without network noise.
+
+Archive: one SQLite file.
+  exchanges  one row per request, in send order, indexed by match key
+             (method, URL, Accept, Accept-Encoding, If-None-Match, If-Match
+             and the request body's digest)
+  bodies     request and response bodies by SHA-256, zlib-compressed unless
+             that does not shrink them (already gzip/br); each distinct body
+             is stored once
+  meta       tool, created_at
+
+Replay timing:
+  fast      no waits. Bodies are loaded when the archive is opened and
+            served at memory speed.
+  original  each response waits for its recorded DNS + connect + TLS + TTFB,
+            and its body is released over the recorded download time.
+            Request start times still come from the tool, so concurrency
+            settings apply as usual.
+
+Usage (through the measurement tools' flags):
+  python measure_dni_savings.py ... --record run.dnirec
+  python measure_dni_savings.py ... --replay run.dnirec [--replay-timing original]
+
+  from dni_replay import make_pool
+  pool = make_pool(record="run.dnirec")   # or replay="run.dnirec"; neither = plain HttpPool
+
+Notes:
+  - Identical requests get their recorded responses in order. When a key
+    runs out, the responses cycle (counted as "repeated"), so a replay may
+    ask for more samples than were recorded.
+  - A request missing from the archive fails like a network error (status
+    0) and is counted as "missing". Replay with the flags used to record.
+  - Authorization, Cookie and Proxy-Authorization are never written.
+  - A response the tool stopped reading early (a --limit catalog stream) is
+    recorded at close() with the part that was read, marked partial. Its
+    replay serves that prefix, which is all the same run reads again.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+from dni_http import HttpPool, PHASES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS bodies (
+    digest TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS exchanges (
+    seq INTEGER PRIMARY KEY,
+    match_key TEXT NOT NULL,
+    method TEXT NOT NULL,
+    url TEXT NOT NULL,
+    request_headers TEXT NOT NULL,
+    request_body TEXT,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body TEXT,
+    error TEXT,
+    sent_ms REAL NOT NULL,
+    phases TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS exchanges_match ON exchanges (match_key, seq);
+"""
+
+TIMINGS = ("fast", "original")
+# Request headers that select a response; anything else (User-Agent, ...) is ignored
+MATCH_HEADERS = ("accept", "accept-encoding", "if-none-match", "if-match")
+SECRET_HEADERS = ("authorization", "cookie", "proxy-authorization")
+
+
+def body_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def match_key(method, url, headers, request_body=None):
+    """Index key of a request: what must be equal for a recorded response to answer it."""
+    h = {k.lower(): v for k, v in headers.items()}
+    parts = [method, url] + [h.get(name, "") for name in MATCH_HEADERS]
+    parts.append(body_digest(request_body) if request_body else "")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+def origin_url(key, path):
+    scheme, host, port = key
+    return f"{scheme}://{host}:{port}{path}"
+
+
+class Archive:
+    """The SQLite archive: exchanges plus digest-deduplicated bodies. Thread-safe."""
+
+    def __init__(self, path, create=False):
+        if not create and not os.path.exists(path):
+            raise FileNotFoundError(f"replay archive {path} does not exist")
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        try:
+            self.db.executescript(SCHEMA)
+        except sqlite3.DatabaseError as e:
+            self.db.close()
+            raise ValueError(f"{path} is not a replay archive: {e}") from None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def reset(self, tool):
+        """Empty the archive for a new recording."""
+        with self._lock:
+            self.db.executescript("DELETE FROM exchanges; DELETE FROM bodies; DELETE FROM meta;")
+            self.db.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+                ("tool", tool),
+                ("created_at", datetime.now(timezone.utc).isoformat()),
+            ])
+            self.db.commit()
+
+    def _put_body(self, data):
+        digest = body_digest(data)
+        packed = zlib.compress(data, 6)
+        codec = "zlib" if len(packed) < len(data) else "raw"
+        self.db.execute("INSERT OR IGNORE INTO bodies (digest, codec, size, data) VALUES (?, ?, ?, ?)",
+                        (digest, codec, len(data), packed if codec == "zlib" else data))
+        return digest
+
+    def add(self, seq, method, url, request_headers, request_body, status, headers, body, error, sent_ms, phases):
+        with self._lock:
+            req_digest = self._put_body(request_body) if request_body else None
+            res_digest = self._put_body(body) if body is not None else None
+            self.db.execute(
+                "INSERT INTO exchanges (seq, match_key, method, url, request_headers, request_body, status, headers, "
+                "body, error, sent_ms, phases) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (seq, match_key(method, url, request_headers, request_body), method, url,
+                 json.dumps({k: v for k, v in request_headers.items() if k.lower() not in SECRET_HEADERS}),
+                 req_digest, status, json.dumps(headers), res_digest, error, round(sent_ms, 3), json.dumps(phases)),
+            )
+            self._pending += 1
+            if self._pending >= 200:
+                self.db.commit()
+                self._pending = 0
+
+    def load(self):
+        """(exchanges in send order, {digest: body bytes})."""
+        with self._lock:
+            rows = self.db.execute("SELECT match_key, status, headers, body, error, phases FROM exchanges ORDER BY seq")
+            exchanges = [{"match_key": mk, "status": st, "headers": [tuple(h) for h in json.loads(hdrs)],
+                          "body": body, "error": error, "phases": json.loads(phases)}
+                         for mk, st, hdrs, body, error, phases in rows]
+            bodies = {d: zlib.decompress(data) if codec == "zlib" else bytes(data)
+                      for d, codec, data in self.db.execute("SELECT digest, codec, data FROM bodies")}
+        return exchanges, bodies
+
+    def stats(self):
+        with self._lock:
+            n, errors, partial = self.db.execute(
+                "SELECT COUNT(*), COUNT(error), COUNT(json_extract(phases, '$.partial')) FROM exchanges").fetchone()
+            refs = self.db.execute("SELECT COUNT(body) + COUNT(request_body) FROM exchanges").fetchone()[0]
+            bodies, size, stored = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM bodies").fetchone()
+            meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        return {
+            "path": self.path,
+            "tool": meta.get("tool"),
+            "created_at": meta.get("created_at"),
+            "exchanges": n,
+            "network_errors": errors,
+            "partial": partial,
+            "body_refs": refs,
+            "unique_bodies": bodies,
+            "body_bytes": size,
+            "stored_bytes": stored,
+            "stored_pct": round(stored / size * 100.0, 2) if size else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self.db.commit()
+            self.db.close()
+
+
+class _TeeResponse:
+    """An http.client response that hands its wire bytes to on_complete once read to the end.
+
+    finish() hands over what was read so far, for responses abandoned early.
+    """
+
+    def __init__(self, resp, on_complete):
+        self._resp = resp
+        self._on_complete = on_complete
+        self._chunks = []
+        self._headers_ns = self._last_ns = time.perf_counter_ns()
+        self.status = resp.status
+
+    @property
+    def will_close(self):
+        return self._resp.will_close
+
+    def getheaders(self):
+        return self._resp.getheaders()
+
+    def read1(self, size=-1):
+        data = self._resp.read1(size)
+        self._last_ns = time.perf_counter_ns()
+        if data:
+            self._chunks.append(data)
+        else:
+            self.finish(partial=False)
+        return data
+
+    def finish(self, partial=True):
+        if self._on_complete is not None:
+            done, self._on_complete = self._on_complete, None
+            # Download time up to the last read, not until the response was abandoned
+            done(b"".join(self._chunks), (self._last_ns - self._headers_ns) / 1e6, partial)
+
+    def close(self):
+        self._resp.close()
+
+
+class RecordingPool(HttpPool):
+    """HttpPool that writes every exchange to an archive (emptied first)."""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.archive = Archive(path, create=True)
+        self.archive.reset(os.path.basename(sys.argv[0]) or "python")
+        self._t0_ns = time.perf_counter_ns()
+        self._seq = 0
+        self._seq_lock = threading.Lock()
+        # seq -> response whose body has not been read to the end yet
+        self._unfinished = {}
+
+    def _exchange(self, key, method, path, hdrs, body, timeout):
+        url = origin_url(key, path)
+        with self._seq_lock:
+            seq = self._seq
+            self._seq += 1
+        sent_ms = (time.perf_counter_ns() - self._t0_ns) / 1e6
+        try:
+            conn, resp, phases = super()._exchange(key, method, path, hdrs, body, timeout)
+        except Exception as e:
+            self.archive.add(seq, method, url, hdrs, body, 0, [], None, f"{type(e).__name__}: {e}", sent_ms, {})
+            raise
+
+        def complete(data, download_ms, partial):
+            with self._seq_lock:
+                self._unfinished.pop(seq, None)
+            recorded = {p: round(phases[p], 3) for p in PHASES if p in phases}
+            recorded["download_ms"] = round(download_ms, 3)
+            recorded["reused"] = bool(phases.get("reused"))
+            if partial:
+                recorded["partial"] = True
+            self.archive.add(seq, method, url, hdrs, body, resp.status, resp.getheaders(), data, None, sent_ms, recorded)
+
+        tee = _TeeResponse(resp, complete)
+        with self._seq_lock:
+            self._unfinished[seq] = tee
+        return conn, tee, phases
+
+    def _finish_all(self):
+        with self._seq_lock:
+            unfinished = list(self._unfinished.values())
+        for tee in unfinished:
+            tee.finish()
+
+    def archive_stats(self):
+        self._finish_all()
+        return self.archive.stats()
+
+    def close(self):
+        self._finish_all()
+        super().close()
+        self.archive.close()
+
+
+class _ReplayResponse:
+    """Stands in for an http.client response, serving a recorded body."""
+
+    will_close = False
+
+    def __init__(self, status, headers, body, download_ms=0.0):
+        self.status = status
+        self._headers = headers
+        self._body = body
+        self._pos = 0
+        self._download_s = download_ms / 1000.0
+
+    def getheaders(self):
+        return self._headers
+
+    def read1(self, size=-1):
+        if self._pos >= len(self._body):
+            return b""
+        end = len(self._body) if size is None or size < 0 else self._pos + size
+        chunk = self._body[self._pos:end]
+        self._pos += len(chunk)
+        if self._download_s:
+            # Release the body at the recorded rate
+            time.sleep(self._download_s * len(chunk) / len(self._body))
+        return chunk
+
+    def close(self):
+        pass
+
+
+class ReplayPool(HttpPool):
+    """HttpPool that answers every request from an archive, without any network I/O."""
+
+    def __init__(self, path, timing="fast", **kwargs):
+        if timing not in TIMINGS:
+            raise ValueError(f"replay timing must be one of {', '.join(TIMINGS)}")
+        super().__init__(**kwargs)
+        archive = Archive(path)
+        try:
+            self.recorded = archive.stats()
+            exchanges, self._bodies = archive.load()
+        finally:
+            archive.close()
+        self.timing = timing
+        self._by_key = {}
+        for ex in exchanges:
+            self._by_key.setdefault(ex["match_key"], []).append(ex)
+        self._served = {}
+        self._replay_lock = threading.Lock()
+        self._counts = {"replayed": 0, "repeated": 0, "missing": 0}
+
+    def _exchange(self, key, method, path, hdrs, body, timeout):
+        url = origin_url(key, path)
+        mk = match_key(method, url, hdrs, body)
+        with self._replay_lock:
+            recorded = self._by_key.get(mk)
+            if not recorded:
+                self._counts["missing"] += 1
+                raise ConnectionError(f"not in the replay archive: {method} {url}")
+            n = self._served.get(mk, 0)
+            self._served[mk] = n + 1
+            self._counts["replayed"] += 1
+            self._counts["repeated"] += n >= len(recorded)
+            ex = recorded[n % len(recorded)]
+        if ex["error"]:
+            raise ConnectionError(ex["error"])
+        rec = ex["phases"]
+        original = self.timing == "original"
+        phases = {p: rec.get(p, 0.0) if original else 0.0 for p in ("dns_ms", "connect_ms", "tls_ms")}
+        sent_ns = time.perf_counter_ns()
+        if original:
+            time.sleep((sum(phases.values()) + rec.get("ttfb_ms", 0.0)) / 1000.0)
+        phases["ttfb_ms"] = (time.perf_counter_ns() - sent_ns) / 1e6
+        phases["reused"] = rec.get("reused", True)
+        body = self._bodies.get(ex["body"], b"") if ex["body"] else b""
+        return None, _ReplayResponse(ex["status"], ex["headers"], body, rec.get("download_ms", 0.0) if original else 0.0), phases
+
+    def _checkin(self, key, conn):
+        pass
+
+    def _drop(self, conn):
+        pass
+
+    def archive_stats(self):
+        with self._replay_lock:
+            counts = dict(self._counts)
+        return dict(self.recorded, timing=self.timing, **counts)
+
+
+def make_pool(record=None, replay=None, timing="fast", **kwargs):
+    """The HttpPool for a tool's --record / --replay flags (a plain HttpPool when neither is set)."""
+    if record and replay:
+        raise ValueError("--record and --replay are mutually exclusive")
+    if record:
+        return RecordingPool(record, **kwargs)
+    if replay:
+        return ReplayPool(replay, timing, **kwargs)
+    return HttpPool(**kwargs)
+
+
+def format_archive_stats(stats):
+    """One-line human summary of RecordingPool/ReplayPool.archive_stats()."""
+    line = (f"Archive {stats['path']}: {stats['exchanges']} exchanges, {stats['unique_bodies']} unique bodies "
+            f"for {stats['body_refs']} references, {stats['body_bytes']} B stored as {stats['stored_bytes']} B "
+            f"({stats['stored_pct']}%)")
+    if "replayed" in stats:
+        line += (f"; replayed {stats['replayed']} ({stats['timing']} timing), {stats['repeated']} repeated, "
+                 f"{stats['missing']} missing")
+    return line
@@ -0,0 +1,234 @@
+"""
+Streaming, checkpointed report output for the benchmark tools.
+
+Each post's CSV row is written as soon as the post completes, and the row
+plus its exact numbers go to a JSONL journal next to the CSV (<out>.jsonl).
+The CSV header comes from the first row; when a later row brings new columns
+(the dynamic *_srv_* profiler metrics), close() rebuilds the CSV from the
+journal with the union of all columns. Every
+`checkpoint_every` posts both files are flushed and fsynced, and <out>.ckpt
+records their lengths. After a crash or Ctrl-C, --resume truncates both files
+back to the last checkpoint and replays the journal into the accumulators.
+It then skips the rids already done, so the resumed run finishes with the same
+CSV and summary an uninterrupted run would have produced.
+
+Summaries come from RunningStats, fed as rows complete. Mean-only fields
+keep count/sum/min/max. Fields that need percentiles or a bootstrap keep
+their float samples, and nothing keeps the formatted rows.
+
+Usage:
+  stats = RunningStats(keep=("time.", "phase."))
+  report = StreamingReport(args.out, stats, fingerprint={...}, resume=args.resume)
+  resumed = report.open()                      # raises ReportError on a mismatch
+  todo = (it for it in items if it["rid"] not in report.done)
+  ...
+  report.write(rid, row_dict, {"time.standard_ms": 12.3, ...})
+  report.close()
+"""
+
+import csv
+import json
+import os
+from array import array
+
+from dni_stats import describe
+
+CHECKPOINT_VERSION = 2
+
+
+class ReportError(Exception):
+    pass
+
+
+class RunningStats:
+    """Per-field count/sum/min/max, plus float samples for fields starting with a `keep` prefix."""
+
+    def __init__(self, keep=()):
+        self.keep = tuple(keep)
+        self._agg = {}
+        self._samples = {}
+
+    def add(self, name, value):
+        if value is None:
+            return
+        value = float(value)
+        agg = self._agg.get(name)
+        if agg is None:
+            self._agg[name] = [1, value, value, value]
+        else:
+            agg[0] += 1
+            agg[1] += value
+            agg[2] = min(agg[2], value)
+            agg[3] = max(agg[3], value)
+        if self.keep and name.startswith(self.keep):
+            self._samples.setdefault(name, array("d")).append(value)
+
+    def add_many(self, values):
+        for name, value in values.items():
+            self.add(name, value)
+
+    def count(self, name):
+        agg = self._agg.get(name)
+        return agg[0] if agg else 0
+
+    def total(self, name):
+        agg = self._agg.get(name)
+        return agg[1] if agg else 0.0
+
+    def mean(self, name, ndigits=2):
+        agg = self._agg.get(name)
+        return round(agg[1] / agg[0], ndigits) if agg else 0.0
+
+    def values(self, name):
+        """Samples of a kept field, in the order they were added."""
+        return list(self._samples.get(name, ()))
+
+    def names(self, prefix):
+        """Field suffixes under prefix, e.g. names("srv.dni.") -> ["queries_delta", ...]."""
+        return sorted(n[len(prefix):] for n in self._agg if n.startswith(prefix))
+
+    def describe_prefix(self, prefix, percentiles=(50, 90, 99), n_boot=500, seed=0):
+        """describe() for every kept field under prefix, keyed by suffix (like describe_fields)."""
+        return {n: describe(self.values(prefix + n), percentiles, n_boot=n_boot, seed=seed)
+                for n in self.names(prefix)}
+
+
+class StreamingReport:
+    """CSV rows plus a JSONL journal of per-post values, checkpointed for --resume."""
+
+    def __init__(self, csv_path, stats, fingerprint=None, resume=False, checkpoint_every=50):
+        self.csv_path = csv_path
+        self.journal_path = csv_path + ".jsonl"
+        self.checkpoint_path = csv_path + ".ckpt"
+        self.stats = stats
+        self.fingerprint = fingerprint or {}
+        self.resume = resume
+        self.checkpoint_every = max(1, int(checkpoint_every))
+        self.done = set()
+        self.rows = 0
+        self.resumed = 0
+        self._csv = None
+        self._journal = None
+        self._writer = None
+        self._header = None
+        self._columns = {}
+        self._widened = False
+        self._since_checkpoint = 0
+
+    # -- setup -------------------------------------------------------------
+
+    def open(self):
+        """Start fresh, or restore the last checkpoint when resuming; returns the number of resumed rows."""
+        ckpt = None
+        if self.resume and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                ckpt = json.load(f)
+            if ckpt.get("version") != CHECKPOINT_VERSION:
+                raise ReportError(f"{self.checkpoint_path}: unsupported checkpoint version {ckpt.get('version')}")
+            if ckpt.get("fingerprint") != self.fingerprint:
+                raise ReportError(f"{self.checkpoint_path} is from a different run "
+                                  f"({ckpt.get('fingerprint')}); remove it or drop --resume")
+        if ckpt is None:
+            self._csv = open(self.csv_path, "w", newline="", encoding="utf-8")
+            self._journal = open(self.journal_path, "w", encoding="utf-8")
+            self._checkpoint()
+            return 0
+
+        # Anything after the checkpoint belongs to posts that will be measured again
+        for path, size in ((self.csv_path, ckpt["csv_bytes"]), (self.journal_path, ckpt["journal_bytes"])):
+            if not os.path.exists(path) or os.path.getsize(path) < size:
+                raise ReportError(f"{path} is shorter than its checkpoint; cannot resume")
+            with open(path, "r+b") as f:
+                f.truncate(size)
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                self.done.add(rec["rid"])
+                self.stats.add_many(rec["values"])
+                self._columns.update(dict.fromkeys(rec["row"]))
+        self._header = ckpt.get("header")
+        self._widened = bool(self._header) and len(self._columns) > len(self._header)
+        self._csv = open(self.csv_path, "a", newline="", encoding="utf-8")
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        if self._header:
+            self._writer = csv.DictWriter(self._csv, self._header, restval="", extrasaction="ignore")
+        self.rows = self.resumed = ckpt["rows"]
+        return self.resumed
+
+    # -- rows --------------------------------------------------------------
+
+    def write(self, rid, row, values):
+        """Record one completed post: CSV row (dict), journal line and accumulator update.
+
+        The CSV header is set by the first row; later rows fill missing
+        columns with "". Columns the header does not have are kept in the
+        journal and added to the CSV by close().
+        """
+        if self._writer is None:
+            self._header = list(row)
+            self._columns.update(dict.fromkeys(self._header))
+            self._writer = csv.DictWriter(self._csv, self._header, restval="", extrasaction="ignore")
+            self._writer.writeheader()
+        if any(k not in self._columns for k in row):
+            self._columns.update(dict.fromkeys(row))
+            self._widened = True
+        self._writer.writerow(row)
+        self._journal.write(json.dumps({"rid": rid, "row": row, "values": values}, separators=(",", ":")) + "\n")
+        self.stats.add_many(values)
+        self.done.add(rid)
+        self.rows += 1
+        self._since_checkpoint += 1
+        if self._since_checkpoint >= self.checkpoint_every:
+            self._checkpoint()
+
+    def _checkpoint(self):
+        # Data first, then the checkpoint that points at it, so a crash never
+        # leaves a checkpoint claiming rows that are not on disk
+        for f in (self._csv, self._journal):
+            f.flush()
+            os.fsync(f.fileno())
+        ckpt = {
+            "version": CHECKPOINT_VERSION,
+            "fingerprint": self.fingerprint,
+            "rows": self.rows,
+            # Both files are only appended to, so their size is the write position
+            "csv_bytes": os.fstat(self._csv.fileno()).st_size,
+            "journal_bytes": os.fstat(self._journal.fileno()).st_size,
+            "header": self._header,
+        }
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(ckpt, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint_path)
+        self._since_checkpoint = 0
+
+    def _rebuild_csv(self):
+        """Rewrite the CSV from the journal with the union of all row columns."""
+        self._journal.flush()
+        self._csv.close()
+        self._header = list(self._columns)
+        tmp = self.csv_path + ".tmp"
+        with open(self.journal_path, encoding="utf-8") as src, open(tmp, "w", newline="", encoding="utf-8") as dst:
+            writer = csv.DictWriter(dst, self._header, restval="")
+            writer.writeheader()
+            for line in src:
+                writer.writerow(json.loads(line)["row"])
+        os.replace(tmp, self.csv_path)
+        self._csv = open(self.csv_path, "a", newline="", encoding="utf-8")
+        self._widened = False
+
+    def close(self):
+        """Final checkpoint (also on an interrupted run) and close the files.
+
+        Rebuilds the CSV first if rows brought columns the header lacked.
+        """
+        if self._csv is None:
+            return
+        if self._widened:
+            self._rebuild_csv()
+        self._checkpoint()
+        self._csv.close()
+        self._journal.close()
+        self._csv = self._journal = None
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+DNI Simulate: offline zero-fetch cache simulator
+
+Replays an agent access trace, a list of (rid, timestamp) reads, against a
+post edit history. It reports what three client strategies would cost:
+
+  refetch     every read downloads the MR (no cache)
+  etag        reads go through a bounded cache and revalidate with
+              If-None-Match: 304 when the post did not change, 200 otherwise
+  catalog     the client polls /catalog?cursor= every --poll seconds and
+              refreshes (or invalidates) cached posts that changed; reads
+              are served from the cache with no request, so a post edited
+              since the last poll is served stale until the next one
+
+For every cache size x eviction policy (x poll interval for catalog) it
+reports requests, bytes on the wire (bodies plus --overhead-bytes per
+exchange, plus catalog entries), MR tokens downloaded, cache hit rate,
+evictions and, for catalog, stale reads. No network is involved, so
+million-read traces take seconds per configuration. --workers runs
+configurations in parallel processes.
+
+Inputs (CSV with a header, or JSON Lines):
+  --trace FILE   rid,ts  one read per row; ts is epoch seconds or ISO 8601
+  --edits FILE   rid,ts  one edit per row (e.g. exported catalog history)
+  --sizes FILE   per-post CSV from measure_dni_savings.py (mr_kb, mr_tokens)
+                 or benchmark_api_vs_dni.py (dni_kb, dni_tokens)
+Without them a synthetic workload is generated: Zipf-popular reads
+(--zipf) over --posts posts, Poisson edits with per-post rates spread
+log-normally around --edit-rate per day, and log-normal MR sizes around
+--mean-kb with ~1 token per 4 bytes.
+
+Usage:
+  python tools/validator/dni_simulate.py \
+    [--trace reads.csv] [--edits edits.csv] [--sizes savings.csv] \
+    [--posts 5000 --reads 1000000 --days 7 --zipf 1.0 --edit-rate 0.2 --mean-kb 12] \
+    [--cache-mb 1,8,64] [--policy lru,lfu,fifo] [--poll 60,300,900,3600] \
+    [--prefetch refresh|invalidate] [--workers 4] [--json sim.json]
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import math
+import random
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+POLICIES = ("lru", "lfu", "fifo")
+# Size columns understood in --sizes, in order of preference: (kb column, tokens column)
+SIZE_COLUMNS = (("mr_kb", "mr_tokens"), ("dni_kb", "dni_tokens"))
+
+
+# -- workload ------------------------------------------------------------------
+
+def parse_ts(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.strip().replace("Z", "+00:00")).timestamp()
+
+
+def read_records(path):
+    """Rows of a CSV (with header) or JSON Lines file, as dicts."""
+    with open(path, newline="", encoding="utf-8") as f:
+        first = f.readline()
+        f.seek(0)
+        if first.lstrip().startswith("{"):
+            return [json.loads(line) for line in f if line.strip()]
+        return list(csv.DictReader(f))
+
+
+def load_events(path):
+    """(ts array, rid array) from a rid,ts file, sorted by time."""
+    events = sorted((parse_ts(str(r["ts"])), int(r["rid"])) for r in read_records(path))
+    return array("d", (t for t, _ in events)), array("q", (rid for _, rid in events))
+
+
+def load_sizes(path):
+    """rid -> (bytes, tokens) from a per-post benchmark CSV."""
+    rows = read_records(path)
+    if not rows:
+        return {}
+    for kb_col, tok_col in SIZE_COLUMNS:
+        if kb_col in rows[0]:
+            break
+    else:
+        raise ValueError(f"{path}: no {' / '.join(k for k, _ in SIZE_COLUMNS)} column")
+    sizes = {}
+    for r in rows:
+        nbytes = int(float(r[kb_col]) * 1024)
+        tokens = int(float(r[tok_col])) if r.get(tok_col) not in (None, "") else nbytes // 4
+        sizes[int(r["rid"])] = (nbytes, tokens)
+    return sizes
+
+
+def synthetic_reads(rng, posts, n, duration, zipf):
+    """Poisson arrivals over duration; rid popularity ~ 1 / rank^zipf."""
+    weights = [1.0 / (rank ** zipf) for rank in range(1, posts + 1)]
+    cum = []
+    acc = 0.0
+    for w in weights:
+        acc += w
+        cum.append(acc)
+    # Popularity rank is not rid order
+    rids = list(range(1, posts + 1))
+    rng.shuffle(rids)
+    picks = rng.choices(rids, cum_weights=cum, k=n)
+    ts = array("d")
+    t = 0.0
+    gap = duration / max(1, n)
+    for _ in range(n):
+        t += rng.expovariate(1.0 / gap)
+        ts.append(t)
+    return ts, array("q", picks)
+
+
+def synthetic_edits(rng, rids, duration, rate_per_day, sigma=1.0):
+    """Poisson edits per post; per-post rates log-normal with mean rate_per_day."""
+    events = []
+    mu = -sigma * sigma / 2.0  # keeps the mean multiplier at 1
+    for rid in rids:
+        rate = rate_per_day * math.exp(rng.gauss(mu, sigma)) / 86400.0
+        if rate <= 0:
+            continue
+        t = rng.expovariate(rate)
+        while t < duration:
+            events.append((t, rid))
+            t += rng.expovariate(rate)
+    events.sort()
+    return array("d", (t for t, _ in events)), array("q", (rid for _, rid in events))
+
+
+def synthetic_sizes(rng, rids, mean_kb, sigma=0.8):
+    mu = math.log(mean_kb * 1024) - sigma * sigma / 2.0
+    out = {}
+    for rid in rids:
+        nbytes = max(200, int(math.exp(rng.gauss(mu, sigma))))
+        out[rid] = (nbytes, nbytes // 4)
+    return out
+
+
+# -- cache model ---------------------------------------------------------------
+
+class SimCache:
+    """Byte-bounded cache of rid -> (version, size) with lru / lfu / fifo eviction."""
+
+    def __init__(self, capacity, policy):
+        self.capacity = capacity
+        self.policy = policy
+        self.used = 0
+        self.evictions = 0
+        self.items = OrderedDict()
+        self._freq = {}
+        self._heap = []
+        self._tick = 0
+
+    def get(self, rid):
+        entry = self.items.get(rid)
+        if entry is not None:
+            if self.policy == "lru":
+                self.items.move_to_end(rid)
+            elif self.policy == "lfu":
+                self._bump(rid)
+        return entry
+
+    def _bump(self, rid):
+        self._tick += 1
+        f = self._freq.get(rid, 0) + 1
+        self._freq[rid] = f
+        heapq.heappush(self._heap, (f, self._tick, rid))
+        if len(self._heap) > 4 * len(self.items) + 1024:
+            # Drop superseded entries so long traces keep the heap near the cache size
+            self._heap = [(self._freq[r], self._tick, r) for r in self.items if r in self._freq]
+            heapq.heapify(self._heap)
+
+    def put(self, rid, version, size):
+        old = self.items.pop(rid, None)
+        if old is not None:
+            self.used -= old[1]
+        if size > self.capacity:
+            self._freq.pop(rid, None)
+            return
+        self.items[rid] = (version, size)
+        self.used += size
+        if self.policy == "lfu":
+            self._bump(rid)
+        while self.used > self.capacity:
+            self._evict()
+
+    def _evict(self):
+        if self.policy == "lfu":
+            # Lazy heap: skip entries whose frequency moved on or that are gone
+            while True:
+                f, _, rid = heapq.heappop(self._heap)
+                if rid in self.items and self._freq.get(rid) == f:
+                    break
+            self._freq.pop(rid, None)
+            _, size = self.items.pop(rid)
+        else:
+            _, (_, size) = self.items.popitem(last=False)
+        self.used -= size
+        self.evictions += 1
+
+    def discard(self, rid):
+        old = self.items.pop(rid, None)
+        if old is not None:
+            self.used -= old[1]
+            self._freq.pop(rid, None)
+
+
+# -- simulation ----------------------------------------------------------------
+
+_DATA = {}
+
+
+def _init_worker(data):
+    _DATA.update(data)
+
+
+def simulate(config):
+    """Cost of one strategy/cache/poll configuration over the loaded workload."""
+    read_ts, read_rid = _DATA["reads"]
+    edit_ts, edit_rid = _DATA["edits"]
+    sizes = _DATA["sizes"]
+    default = _DATA["default_size"]
+    overhead = _DATA["overhead"]
+    item_bytes = _DATA["catalog_item_bytes"]
+    strategy = config["strategy"]
+    t0 = time.perf_counter()
+
+    c = {"reads": len(read_ts), "requests": 0, "bodies": 0, "not_modified": 0, "local_hits": 0,
+         "stale_reads": 0, "body_bytes": 0, "wire_bytes": 0, "tokens": 0, "catalog_polls": 0,
+         "catalog_items": 0, "prefetched": 0}
+    if strategy == "refetch":
+        for rid in read_rid:
+            nbytes, tokens = sizes.get(rid, default)
+            c["body_bytes"] += nbytes
+            c["tokens"] += tokens
+        c["requests"] = c["bodies"] = len(read_rid)
+        c["wire_bytes"] = c["body_bytes"] + overhead * c["requests"]
+        return _finish(config, c, None, t0)
+
+    cache = SimCache(int(config["cache_mb"] * 1024 * 1024), config["policy"])
+    version = {}
+    ei, n_edits = 0, len(edit_ts)
+    catalog = strategy == "catalog"
+    poll = config.get("poll_s") or 0
+    refresh = config.get("prefetch") == "refresh"
+    next_poll = (read_ts[0] + poll) if (catalog and len(read_ts)) else float("inf")
+    changed = set()
+
+    def fetch(rid, ver):
+        nbytes, tokens = sizes.get(rid, default)
+        c["requests"] += 1
+        c["bodies"] += 1
+        c["body_bytes"] += nbytes
+        c["tokens"] += tokens
+        cache.put(rid, ver, nbytes)
+
+    for ts, rid in zip(read_ts, read_rid):
+        while catalog and next_poll <= ts:
+            while ei < n_edits and edit_ts[ei] <= next_poll:
+                version[edit_rid[ei]] = version.get(edit_rid[ei], 0) + 1
+                changed.add(edit_rid[ei])
+                ei += 1
+            c["requests"] += 1
+            c["catalog_polls"] += 1
+            c["catalog_items"] += len(changed)
+            for crid in changed:
+                if crid in cache.items:
+                    if refresh:
+                        c["prefetched"] += 1
+                        fetch(crid, version[crid])
+                    else:
+                        cache.discard(crid)
+            changed.clear()
+            next_poll += poll
+        while ei < n_edits and edit_ts[ei] <= ts:
+            version[edit_rid[ei]] = version.get(edit_rid[ei], 0) + 1
+            if catalog:
+                changed.add(edit_rid[ei])
+            ei += 1
+
+        current = version.get(rid, 0)
+        entry = cache.get(rid)
+        if entry is None:
+            fetch(rid, current)
+        elif catalog:
+            c["local_hits"] += 1
+            if entry[0] != current:
+                c["stale_reads"] += 1
+        elif entry[0] == current:
+            c["requests"] += 1
+            c["not_modified"] += 1
+        else:
+            fetch(rid, current)
+
+    c["wire_bytes"] = c["body_bytes"] + overhead * c["requests"] + item_bytes * c["catalog_items"]
+    return _finish(config, c, cache, t0)
+
+
+def _finish(config, c, cache, t0):
+    reads = c["reads"] or 1
+    out = dict(config)
+    out.update(c)
+    out["hit_rate_pct"] = round((c["not_modified"] + c["local_hits"]) / reads * 100.0, 2)
+    out["stale_rate_pct"] = round(c["stale_reads"] / reads * 100.0, 3)
+    out["wire_mb"] = round(c["wire_bytes"] / 1e6, 3)
+    out["evictions"] = cache.evictions if cache else 0
+    out["sim_s"] = round(time.perf_counter() - t0, 3)
+    return out
+
+
+def build_configs(args):
+    sizes = [float(s) for s in args.cache_mb.split(",") if s.strip()]
+    policies = [p.strip() for p in args.policy.split(",") if p.strip()]
+    polls = [float(p) for p in args.poll.split(",") if p.strip()]
+    configs = [{"strategy": "refetch", "cache_mb": 0, "policy": "-", "poll_s": None, "prefetch": None}]
+    for mb in sizes:
+        for pol in policies:
+            configs.append({"strategy": "etag", "cache_mb": mb, "policy": pol, "poll_s": None, "prefetch": None})
+            for p in polls:
+                configs.append({"strategy": "catalog", "cache_mb": mb, "policy": pol, "poll_s": p,
+                                "prefetch": args.prefetch})
+    return configs
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulate agent cache strategies over an access trace and edit history")
+    ap.add_argument("--trace", help="Reads file (rid,ts); default: synthetic")
+    ap.add_argument("--edits", help="Edits file (rid,ts); default: synthetic")
+    ap.add_argument("--sizes", help="Per-post CSV with mr_kb/mr_tokens or dni_kb/dni_tokens; default: synthetic")
+    ap.add_argument("--posts", type=int, default=5000, help="Synthetic: number of posts")
+    ap.add_argument("--reads", type=int, default=1000000, help="Synthetic: number of reads")
+    ap.add_argument("--days", type=float, default=7.0, help="Synthetic: trace duration in days")
+    ap.add_argument("--zipf", type=float, default=1.0, help="Synthetic: popularity skew (0 = uniform)")
+    ap.add_argument("--edit-rate", dest="edit_rate", type=float, default=0.2, help="Synthetic: mean edits per post per day")
+    ap.add_argument("--mean-kb", dest="mean_kb", type=float, default=12.0, help="Synthetic: mean MR size (KB)")
+    ap.add_argument("--seed", type=int, default=1, help="Synthetic workload seed")
+    ap.add_argument("--cache-mb", dest="cache_mb", default="1,8,64", help="Client cache sizes (MB), comma list")
+    ap.add_argument("--policy", default="lru,lfu,fifo", help="Eviction policies, comma list (lru, lfu, fifo)")
+    ap.add_argument("--poll", default="60,300,900,3600", help="Catalog polling intervals (s), comma list")
+    ap.add_argument("--prefetch", choices=("refresh", "invalidate"), default="refresh",
+                    help="Catalog strategy: re-download changed cached posts, or just drop them")
+    ap.add_argument("--overhead-bytes", dest="overhead", type=int, default=400, help="Request+response header bytes per exchange")
+    ap.add_argument("--catalog-item-bytes", dest="catalog_item_bytes", type=int, default=220, help="Bytes per catalog delta entry")
+    ap.add_argument("--workers", type=int, default=1, help="Configurations simulated in parallel processes")
+    ap.add_argument("--json", help="Write all results here")
+    args = ap.parse_args()
+
+    bad = [p for p in args.policy.split(",") if p.strip() and p.strip() not in POLICIES]
+    if bad:
+        print(f"ERROR: Unknown policy: {', '.join(bad)} (known: {', '.join(POLICIES)})")
+        return 2
+
+    rng = random.Random(args.seed)
+    duration = args.days * 86400.0
+    try:
+        reads = load_events(args.trace) if args.trace else synthetic_reads(rng, args.posts, args.reads, duration, args.zipf)
+        if not len(reads[0]):
+            print("ERROR: Trace is empty")
+            return 2
+        if args.edits:
+            edits = load_events(args.edits)
+        else:
+            span = reads[0][-1] if args.trace else duration
+            rids = sorted(set(reads[1])) if args.trace else range(1, args.posts + 1)
+            edits = synthetic_edits(rng, rids, span, args.edit_rate)
+            if args.trace:
+                # Synthetic edit times start at 0; move them onto the trace's clock
+                edits = (array("d", (t + reads[0][0] for t in edits[0])), edits[1])
+        sizes = load_sizes(args.sizes) if args.sizes else synthetic_sizes(rng, set(reads[1]), args.mean_kb)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"ERROR: {e}")
+        return 2
+    default_size = (int(args.mean_kb * 1024), int(args.mean_kb * 1024) // 4)
+    distinct = len(set(reads[1]))
+    print(f"Workload: {len(reads[0])} reads of {distinct} posts over {(reads[0][-1] - reads[0][0]) / 86400:.2f} days, "
+          f"{len(edits[0])} edits, working set {sum(sizes.get(r, default_size)[0] for r in set(reads[1])) / 1e6:.1f} MB")
+
+    data = {"reads": reads, "edits": edits, "sizes": sizes, "default_size": default_size,
+            "overhead": args.overhead, "catalog_item_bytes": args.catalog_item_bytes}
+    configs = build_configs(args)
+    started = time.perf_counter()
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(data,)) as procs:
+            results = list(procs.map(simulate, configs))
+    else:
+        _init_worker(data)
+        results = [simulate(cfg) for cfg in configs]
+
+    base = results[0]
+    print(f"\n{'Strategy':<9} {'Cache':>7} {'Policy':<6} {'Poll':>6} {'Requests':>10} {'Wire MB':>10} {'Saved':>7} "
+          f"{'Tokens':>12} {'Hit %':>7} {'Stale %':>8} {'Evict':>8}")
+    print("-" * 102)
+    for r in results:
+        saved = (1 - r["wire_bytes"] / base["wire_bytes"]) * 100.0 if base["wire_bytes"] else 0.0
+        r["wire_saved_pct"] = round(saved, 2)
+        r["tokens_saved_pct"] = round((1 - r["tokens"] / base["tokens"]) * 100.0, 2) if base["tokens"] else 0.0
+        poll = f"{r['poll_s']:g}s" if r["poll_s"] else "-"
+        cache_mb = f"{r['cache_mb']:g}MB" if r["cache_mb"] else "-"
+        print(f"{r['strategy']:<9} {cache_mb:>7} {r['policy']:<6} {poll:>6} {r['requests']:>10} {r['wire_mb']:>10.1f} "
+              f"{saved:>6.1f}% {r['tokens']:>12} {r['hit_rate_pct']:>7.2f} {r['stale_rate_pct']:>8.3f} {r['evictions']:>8}")
+    print(f"\n{len(configs)} configurations in {time.perf_counter() - started:.1f}s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as jf:
+            json.dump({"workload": {"reads": len(reads[0]), "posts": distinct, "edits": len(edits[0]),
+                                    "synthetic": not args.trace, "seed": args.seed},
+                       "results": results}, jf, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
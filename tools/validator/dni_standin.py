@@ -0,0 +1,1008 @@
+#!/usr/bin/env python3
+"""
+Dual-Native Stand-in Server
+
+Pure-Python local server that emulates the plugin's dual-native/v1 routes
+(plus /wp/v2/posts/{id} and permalink HTML pages) over a synthetic corpus,
+so the validator and benchmark tools can run without a live WordPress.
+
+Emulated behavior:
+  - GET  /wp-json/dual-native/v1/posts/{id}         MR JSON, ETag = CID, 304 fast-path
+  - GET  /wp-json/dual-native/v1/posts/{id}/md      Markdown, ETag = sha256(md), 304
+  - GET  /wp-json/dual-native/v1/public/posts/{id}[/md]  published posts only, no auth
+  - GET  /wp-json/dual-native/v1/catalog            since/cursor, status, types
+  - POST /wp-json/dual-native/v1/posts/{id}/blocks  If-Match / 412 safe writes
+  - GET  /wp-json/dual-native/v1/posts/{id}/ai/suggest  heuristic suggestions
+  - GET  /wp-json/wp/v2/posts/{id}                  Standard REST API shape (?context=edit adds content.raw)
+  - POST /wp-json/wp/v2/posts/{id}                  core update: {"content": raw}, no If-Match
+  - GET  /{slug}/                                   themed permalink HTML
+  --capacity N serves N requests at once, queues --backlog more and refuses
+  the rest with 503 (or 429) and Retry-After, like a saturated PHP-FPM pool.
+  Content-Digest (RFC 9530) on 2xx dual-native responses, Last-Modified,
+  Cache-Control: max-age=0, must-revalidate. Stored CIDs start empty, as on a
+  fresh install, and are filled by the first MR or catalog request.
+  --compress negotiates gzip/deflate/br after the digest is computed, the way
+  a web server's compression module sits in front of PHP.
+
+Usage:
+  python tools/validator/dni_standin.py \
+    --port 8080 \
+    --posts 500 \
+    [--seed 1] [--blocks 4-40] [--words 8-30] [--mix paragraph=6,heading=2,code=1] \
+    [--latency wordpress] [--latency-ms 60] [--jitter-ms 20] \
+    [--capacity 4 --backlog 4 --busy-status 503 --retry-after 1] \
+    [--user admin --app-pass secret]
+
+  Then point any tool at --base http://127.0.0.1:8080
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import html
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from dni_cid import compute_cid
+from dni_corpus import generate_corpus, parse_mix, parse_range
+
+try:
+    import brotli  # optional: br for --compress
+except ImportError:
+    brotli = None
+
+DNI_PROFILE = "dual-native-core-1.0"
+NS = "/wp-json/dual-native/v1"
+
+# Server-side latency profiles: fixed cost, jitter (stddev), cost per KB of
+# body built, and extra fixed cost for /wp/v2 and themed HTML pages.
+LATENCY_PROFILES = {
+    "none": {"base_ms": 0.0, "jitter_ms": 0.0, "per_kb_ms": 0.0, "standard_extra_ms": 0.0},
+    "lan": {"base_ms": 2.0, "jitter_ms": 1.0, "per_kb_ms": 0.02, "standard_extra_ms": 1.0},
+    "wan": {"base_ms": 40.0, "jitter_ms": 10.0, "per_kb_ms": 0.1, "standard_extra_ms": 5.0},
+    "wordpress": {"base_ms": 60.0, "jitter_ms": 20.0, "per_kb_ms": 0.5, "standard_extra_ms": 35.0},
+}
+
+STOP_WORDS = set("about above after again being their there these those which where while with your from that "
+                 "this have will would could should because through between among into other than".split())
+
+
+def iso_c(dt):
+    """PHP date('c') in UTC."""
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def http_date(dt):
+    return format_datetime(dt.astimezone(timezone.utc), usegmt=True)
+
+
+def php_default_json(data):
+    """wp_json_encode($data, 0): ASCII-only with escaped slashes, as the REST server sends it."""
+    return json.dumps(data, separators=(",", ":")).replace("/", "\\/")
+
+
+def esc_html(s):
+    return html.escape(str(s), quote=True).replace("&#x27;", "&#039;")
+
+
+def parse_etag_list(value):
+    """Split an If-None-Match / If-Match header into bare tags ("*" kept)."""
+    out = []
+    for tok in (value or "").split(","):
+        t = tok.strip()
+        if t[:2].upper() == "W/":
+            t = t[2:].strip()
+        if len(t) >= 2 and t[0] == '"' and t[-1] == '"':
+            t = t[1:-1]
+        if t:
+            out.append(t)
+    return out
+
+
+class Latency:
+    """Deterministic (seeded) injected server latency."""
+
+    def __init__(self, profile="none", base_ms=None, jitter_ms=None, seed=1):
+        p = dict(LATENCY_PROFILES[profile])
+        if base_ms is not None:
+            p["base_ms"] = base_ms
+        if jitter_ms is not None:
+            p["jitter_ms"] = jitter_ms
+        self.p = p
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay_ms(self, nbytes=0, standard=False):
+        p = self.p
+        with self._lock:
+            jitter = self._rng.gauss(0.0, p["jitter_ms"]) if p["jitter_ms"] > 0 else 0.0
+        ms = p["base_ms"] + jitter + p["per_kb_ms"] * (nbytes / 1024.0)
+        if standard:
+            ms += p["standard_extra_ms"]
+        return max(0.0, ms)
+
+    def sleep(self, nbytes=0, standard=False):
+        ms = self.delay_ms(nbytes, standard)
+        if ms > 0:
+            time.sleep(ms / 1000.0)
+
+
+class Capacity:
+    """PHP-FPM-like worker pool: `workers` requests run at once and `backlog`
+    more queue for a worker (latency grows); beyond that requests are refused
+    with `status` and Retry-After, like a proxy in front of a saturated pool."""
+
+    def __init__(self, workers, backlog=None, status=503, retry_after=1):
+        self.workers = max(1, workers)
+        self.limit = self.workers + (self.workers if backlog is None else max(0, backlog))
+        self.status = status
+        self.retry_after = retry_after
+        self._sem = threading.Semaphore(self.workers)
+        self._lock = threading.Lock()
+        self.inside = 0
+        self.refused = 0
+
+    def enter(self):
+        """Take a worker (waiting in the backlog if needed); False when the backlog is full."""
+        with self._lock:
+            if self.inside >= self.limit:
+                self.refused += 1
+                return False
+            self.inside += 1
+        self._sem.acquire()
+        return True
+
+    def leave(self):
+        self._sem.release()
+        with self._lock:
+            self.inside -= 1
+
+
+class Site:
+    """In-memory WordPress stand-in: posts, stored CIDs (_dni_cid) and plugin logic."""
+
+    def __init__(self, posts, base_url="http://127.0.0.1:8080", user=None, app_pass=None, bad_digest_ratio=0.0):
+        self.posts = {p["id"]: p for p in posts}
+        self.cid_meta = {}
+        self.base_url = base_url.rstrip("/")
+        self.user = user
+        self.app_pass = app_pass
+        self.bad_digest_ratio = bad_digest_ratio
+        self.lock = threading.RLock()
+
+    # -- auth --------------------------------------------------------------
+
+    def authorized(self, auth_header):
+        if not self.user:
+            return True
+        expected = base64.b64encode(f"{self.user}:{self.app_pass or ''}".encode("utf-8")).decode("ascii")
+        return (auth_header or "").strip() == f"Basic {expected}"
+
+    def content_digest(self, body):
+        """Content-Digest for body; a bad_digest_ratio share of bodies (picked by hash) get a wrong one."""
+        digest = hashlib.sha256(body).digest()
+        if self.bad_digest_ratio and digest[0] < self.bad_digest_ratio * 256:
+            digest = hashlib.sha256(body + b"\0").digest()
+        return "sha-256=:" + base64.b64encode(digest).decode("ascii") + ":"
+
+    # -- MR / Markdown -----------------------------------------------------
+
+    def _rest_url(self, path):
+        return f"{self.base_url}/wp-json/{path}"
+
+    def permalink(self, post):
+        return f"{self.base_url}/{post['slug']}/"
+
+    def build_mr(self, rid):
+        """DNI_MR::build for a stand-in post."""
+        post = self.posts.get(rid)
+        if not post:
+            return None
+        blocks = []
+        for b in post["blocks"]:
+            b = dict(b)
+            if b["type"] == "core/image" and b.get("url", "").startswith("/"):
+                b["url"] = self.base_url + b["url"]
+            blocks.append(b)
+        core_text = flatten_text(blocks)
+        author = post["author"]
+        image = None
+        if post.get("featured_image"):
+            fid = post["featured_image"]
+            image = {"id": fid, "url": f"{self.base_url}/wp-content/uploads/2025/11/featured-{fid}.jpg",
+                     "alt": "", "width": 1200, "height": 630}
+        return {
+            "rid": rid,
+            "title": post["title"],
+            "status": post["status"],
+            "modified": iso_c(post["modified"]),
+            "published": iso_c(post["published"]),
+            "author": {"id": author["id"], "name": author["name"],
+                       "url": f"{self.base_url}/author/{author['name'].lower().replace(' ', '-')}/"},
+            "image": image,
+            "categories": [dict(c, url=f"{self.base_url}/category/{c['slug']}/") for c in post["categories"]],
+            "tags": [dict(t, url=f"{self.base_url}/tag/{t['slug']}/") for t in post["tags"]],
+            "word_count": word_count(core_text),
+            "core_content_text": core_text,
+            "blocks": blocks,
+            "links": {
+                "human_url": self.permalink(post),
+                "api_url": self._rest_url(f"dual-native/v1/posts/{rid}"),
+                "md_url": self._rest_url(f"dual-native/v1/posts/{rid}/md"),
+                "public_api_url": self._rest_url(f"dual-native/v1/public/posts/{rid}"),
+                "public_md_url": self._rest_url(f"dual-native/v1/public/posts/{rid}/md"),
+            },
+        }
+
+    def stored_cid(self, rid):
+        with self.lock:
+            return self.cid_meta.get(rid, "")
+
+    def ensure_cid(self, rid, mr=None):
+        """Stored CID, computing and storing it first if missing."""
+        with self.lock:
+            cid = self.cid_meta.get(rid, "")
+            if cid:
+                return cid
+        mr = mr or self.build_mr(rid)
+        if not mr:
+            return ""
+        cid = compute_cid(mr)
+        with self.lock:
+            self.cid_meta[rid] = cid
+        return cid
+
+    # -- catalog -----------------------------------------------------------
+
+    def catalog(self, since=None, status=None, types=None):
+        post_status = status if status in ("draft", "publish", "any") else "any"
+        post_types = [t.strip() for t in types.split(",")] if types and types.strip() else ["post", "page"]
+        since_dt = parse_since(since) if since else None
+        with self.lock:
+            posts = list(self.posts.values())
+        posts = [p for p in posts if p["type"] in post_types and (post_status == "any" or p["status"] == post_status)]
+        if since_dt:
+            posts = [p for p in posts if p["modified"] > since_dt]
+        posts.sort(key=lambda p: p["modified"], reverse=True)
+        items = []
+        max_modified = None
+        for p in posts:
+            modified = iso_c(p["modified"])
+            items.append({
+                "rid": p["id"],
+                "cid": self.ensure_cid(p["id"]),
+                "modified": modified,
+                "status": p["status"],
+                "title": p["title"],
+                "hr": self.permalink(p),
+                "mr": self._rest_url(f"dual-native/v1/posts/{p['id']}"),
+            })
+            if max_modified is None or modified > max_modified:
+                max_modified = modified
+        return {"count": len(items), "cursor": max_modified, "items": items}
+
+    # -- safe write --------------------------------------------------------
+
+    def insert_blocks(self, rid, body, if_match):
+        """POST /posts/{id}/blocks. Returns (status, payload, extra_headers)."""
+        if not isinstance(body, dict):
+            return 400, {"error": "invalid_json"}, {}
+        with self.lock:
+            if if_match:
+                current_mr = self.build_mr(rid)
+                if current_mr:
+                    cur = self.ensure_cid(rid, current_mr)
+                    tags = parse_etag_list(if_match)
+                    if "*" not in tags and cur not in tags:
+                        return 412, {
+                            "error": "precondition_failed",
+                            "message": "If-Match did not match current CID",
+                            "rid": rid,
+                            "currentCid": cur,
+                            "expectedCid": tags[0] if tags else None,
+                        }, {"ETag": f'"{cur}"'}
+
+            where = str(body.get("insert", "append"))
+            index = max(0, int(body["index"])) if body.get("index") is not None else None
+            specs = body.get("blocks") if isinstance(body.get("blocks"), list) else (
+                [body["block"]] if isinstance(body.get("block"), dict) else [])
+            if not specs:
+                return 400, {"error": "missing_block"}, {}
+            new_blocks = []
+            for spec in specs:
+                b = block_from_spec(spec if isinstance(spec, dict) else {})
+                if b is None:
+                    return 422, {"error": "unsupported_block"}, {}
+                new_blocks.append(b)
+
+            post = self.posts.get(rid)
+            if not post:
+                return 404, {"error": "not_found"}, {}
+            count_before = len(post["blocks"])
+            if where == "index":
+                at = count_before if index is None else min(index, count_before)
+            elif where == "prepend":
+                at = 0
+            else:
+                at = count_before
+            post["blocks"] = post["blocks"][:at] + new_blocks + post["blocks"][at:]
+            post["modified"] = datetime.now(timezone.utc).replace(microsecond=0)
+            self.cid_meta.pop(rid, None)
+            mr = self.build_mr(rid)
+            mr["cid"] = self.ensure_cid(rid, mr)
+            return 200, mr, {
+                "ETag": f'"{mr["cid"]}"',
+                "X-DNI-Top-Level-Count-Before": str(count_before),
+                "X-DNI-Inserted-At": str(at),
+                "X-DNI-Top-Level-Count": str(len(post["blocks"])),
+            }
+
+
+    def update_content(self, rid, raw):
+        """POST /wp/v2/posts/{id} with {"content": raw}: wp_update_post without any precondition."""
+        with self.lock:
+            post = self.posts.get(rid)
+            if not post:
+                return False
+            post["blocks"] = parse_content(raw)
+            post["modified"] = datetime.now(timezone.utc).replace(microsecond=0)
+            self.cid_meta.pop(rid, None)
+            return True
+
+def parse_since(value):
+    try:
+        dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00").replace(" ", "+"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def flatten_text(blocks):
+    parts = []
+    for b in blocks:
+        if isinstance(b.get("content"), str) and b["content"]:
+            parts.append(b["content"])
+        if isinstance(b.get("items"), list) and b["items"]:
+            parts.append(" ".join(str(i) for i in b["items"]))
+    txt = html.unescape(" ".join(parts).strip())
+    return re.sub(r"\s+", " ", txt)
+
+
+def word_count(text):
+    return len(re.findall(r"[^\W\d_]+", text)) if text else 0
+
+
+def block_from_spec(b):
+    """Mirror render_block_html() + map_block(): the MR block an insert produces, or None."""
+    btype = str(b.get("type", ""))
+    if btype == "core/paragraph" and b.get("content"):
+        return {"type": btype, "content": esc_html(b["content"])}
+    if btype == "core/heading" and b.get("content"):
+        level = max(1, min(6, int(b.get("level", 2))))
+        return {"type": btype, "level": level, "content": esc_html(b["content"])}
+    if btype == "core/list" and isinstance(b.get("items"), list) and b["items"]:
+        return {"type": btype, "ordered": bool(b.get("ordered")), "items": [esc_html(i) for i in b["items"]]}
+    if btype == "core/image" and b.get("url"):
+        return {"type": btype, "imageId": 0, "altText": esc_html(b.get("altText", "")), "url": str(b["url"])}
+    if btype in ("core/code", "core/quote") and b.get("content"):
+        return {"type": btype, "content": esc_html(b["content"])}
+    return None
+
+
+def to_markdown(mr):
+    """DNI_REST::to_markdown."""
+    out = ""
+    if mr.get("title"):
+        out += f"# {mr['title']}\n\n"
+    for blk in mr.get("blocks") or []:
+        btype = blk.get("type", "")
+        if btype == "core/heading":
+            lvl = max(1, min(6, int(blk.get("level", 2))))
+            txt = str(blk.get("content", "")).strip()
+            if txt:
+                out += "#" * lvl + " " + txt + "\n\n"
+        elif btype in ("core/paragraph", "unknown"):
+            txt = str(blk.get("content", "")).strip()
+            if txt:
+                out += txt + "\n\n"
+        elif btype == "core/list":
+            items = blk.get("items") or []
+            for i, it in enumerate(items):
+                out += (f"{i + 1}. " if blk.get("ordered") else "- ") + str(it) + "\n"
+            if items:
+                out += "\n"
+        elif btype == "core/image":
+            if blk.get("url"):
+                out += f"![{blk.get('altText', '')}]({blk['url']})\n\n"
+        elif btype == "core/code":
+            if blk.get("content"):
+                out += "```\n" + blk["content"] + "\n```\n\n"
+        elif btype == "core/quote":
+            if blk.get("content"):
+                for ln in re.split(r"\r\n|\r|\n", blk["content"]):
+                    out += "> " + ln + "\n"
+                out += "\n"
+    return out.rstrip() + "\n"
+
+
+def heuristic_suggest(mr):
+    words = (mr.get("core_content_text") or "").split()
+    freq = {}
+    for w in words:
+        w = re.sub(r"[^a-z0-9]", "", w.lower())
+        if len(w) < 5 or w in STOP_WORDS:
+            continue
+        freq[w] = freq.get(w, 0) + 1
+    tags = [w for w, _ in sorted(freq.items(), key=lambda kv: -kv[1])[:5]]
+    headings = [b["content"] for b in mr.get("blocks") or [] if b.get("type") == "core/heading" and b.get("content")]
+    return {"summary": " ".join(words[:120]), "tags": tags, "headings": headings}
+
+
+def render_block_html(b):
+    """Front-end HTML for a block, as the_content would roughly render it."""
+    t = b.get("type")
+    if t == "core/heading":
+        lvl = b.get("level", 2)
+        return f'<h{lvl} class="wp-block-heading">{b["content"]}</h{lvl}>'
+    if t == "core/list":
+        tag = "ol" if b.get("ordered") else "ul"
+        return f'<{tag} class="wp-block-list">' + "".join(f"<li>{i}</li>" for i in b["items"]) + f"</{tag}>"
+    if t == "core/image":
+        return (f'<figure class="wp-block-image size-large"><img decoding="async" src="{b["url"]}" '
+                f'alt="{b.get("altText", "")}" class="wp-image-{b.get("imageId", 0)}"/></figure>')
+    if t == "core/code":
+        return f'<pre class="wp-block-code"><code>{html.escape(b["content"], quote=False)}</code></pre>'
+    if t == "core/quote":
+        return f'<blockquote class="wp-block-quote is-layout-flow"><p>{b["content"]}</p></blockquote>'
+    return f"<p>{b.get('content', '')}</p>"
+
+
+def render_content(blocks):
+    return "\n\n".join(render_block_html(b) for b in blocks) + "\n"
+
+
+# render_block_html() output, one alternative per block type, for parse_content()
+CONTENT_BLOCK = re.compile(
+    r'<h([1-6]) class="wp-block-heading">(?P<heading>.*?)</h\1>'
+    r'|<(ul|ol) class="wp-block-list">(?P<list>.*?)</\3>'
+    r'|<figure class="wp-block-image[^"]*"><img decoding="async" src="(?P<src>[^"]*)" alt="(?P<alt>[^"]*)" '
+    r'class="wp-image-(?P<imgid>\d+)"/></figure>'
+    r'|<pre class="wp-block-code"><code>(?P<code>.*?)</code></pre>'
+    r'|<blockquote class="wp-block-quote[^"]*"><p>(?P<quote>.*?)</p></blockquote>'
+    r'|<p>(?P<para>.*?)</p>',
+    re.S,
+)
+
+
+def parse_content(raw):
+    """Blocks back from post_content HTML, the inverse of render_content() (what a /wp/v2 update stores)."""
+    blocks = []
+    for m in CONTENT_BLOCK.finditer(raw or ""):
+        if m.group("heading") is not None:
+            blocks.append({"type": "core/heading", "level": int(m.group(1)), "content": m.group("heading")})
+        elif m.group("list") is not None:
+            items = re.findall(r"<li>(.*?)</li>", m.group("list"), re.S)
+            blocks.append({"type": "core/list", "ordered": m.group(3) == "ol", "items": items})
+        elif m.group("src") is not None:
+            blocks.append({"type": "core/image", "imageId": int(m.group("imgid")), "altText": m.group("alt"),
+                           "url": m.group("src")})
+        elif m.group("code") is not None:
+            blocks.append({"type": "core/code", "content": html.unescape(m.group("code"))})
+        elif m.group("quote") is not None:
+            blocks.append({"type": "core/quote", "content": m.group("quote")})
+        else:
+            blocks.append({"type": "core/paragraph", "content": m.group("para")})
+    return blocks
+
+
+THEME_HEAD = ("<!DOCTYPE html><html lang=\"en-US\"><head><meta charset=\"UTF-8\">"
+              "<meta name=\"viewport\" content=\"width=device-width, initial-scale=1\">"
+              "<link rel=\"stylesheet\" id=\"wp-block-library-css\" href=\"/wp-includes/css/dist/block-library/style.min.css\" media=\"all\">"
+              "<style id=\"global-styles-inline-css\">" + ("body{--wp--preset--color--black:#000;--wp--preset--spacing--20:0.44rem}" * 600) + "</style>"
+              "<script src=\"/wp-includes/js/jquery/jquery.min.js\" id=\"jquery-core-js\"></script>")
+THEME_NAV = "<header class=\"wp-block-template-part\"><nav class=\"wp-block-navigation\"><ul>" + "".join(
+    f"<li class=\"wp-block-navigation-item\"><a href=\"/menu-{i}/\">Menu item {i}</a></li>" for i in range(12)) + "</ul></nav></header>"
+THEME_FOOT = ("<footer class=\"wp-block-template-part\"><p>Proudly powered by WordPress</p></footer>"
+              "<script id=\"wp-emoji-settings\" type=\"application/json\">" + ("{\"baseUrl\":\"https:\\/\\/s.w.org\\/images\\/core\\/emoji\\/15.0.3\\/72x72\\/\"}" * 20) + "</script>"
+              "</body></html>")
+
+
+def render_page(site, post):
+    mr = site.build_mr(post["id"])
+    return (THEME_HEAD + f"<title>{post['title']}</title></head><body class=\"post-template-default single single-post postid-{post['id']}\">"
+            + THEME_NAV + f"<main class=\"wp-block-group\"><h1 class=\"wp-block-post-title\">{post['title']}</h1>"
+            + f"<div class=\"entry-content wp-block-post-content is-layout-constrained\">{render_content(mr['blocks'])}</div></main>"
+            + THEME_FOOT)
+
+
+def seo_head(site, post, description):
+    """The SEO <head> markup an SEO plugin adds to every /wp/v2 response."""
+    url = site.permalink(post)
+    tags = [
+        f"<title>{post['title']} - Stand-in Site</title>",
+        f'<meta name="description" content="{esc_html(description)}" />',
+        '<meta name="robots" content="index, follow, max-snippet:-1, max-image-preview:large, max-video-preview:-1" />',
+        f'<link rel="canonical" href="{url}" />',
+        '<meta property="og:locale" content="en_US" />',
+        '<meta property="og:type" content="article" />',
+        f'<meta property="og:title" content="{post["title"]}" />',
+        f'<meta property="og:description" content="{esc_html(description)}" />',
+        f'<meta property="og:url" content="{url}" />',
+        f'<meta property="article:published_time" content="{iso_c(post["published"])}" />',
+        f'<meta property="article:modified_time" content="{iso_c(post["modified"])}" />',
+        '<meta name="twitter:card" content="summary_large_image" />',
+        '<script type="application/ld+json" class="yoast-schema-graph">'
+        + json.dumps({"@context": "https://schema.org", "@graph": [
+            {"@type": "Article", "@id": f"{url}#article", "headline": post["title"], "isPartOf": {"@id": url},
+             "datePublished": iso_c(post["published"]), "dateModified": iso_c(post["modified"]),
+             "author": {"name": post["author"]["name"]}},
+            {"@type": "WebPage", "@id": url, "url": url, "name": post["title"], "description": description},
+            {"@type": "BreadcrumbList", "@id": f"{url}#breadcrumb", "itemListElement": [
+                {"@type": "ListItem", "position": 1, "name": "Home", "item": site.base_url + "/"},
+                {"@type": "ListItem", "position": 2, "name": post["title"]}]},
+        ]}) + "</script>",
+    ]
+    return "<!-- This site is optimized with an SEO plugin -->\n" + "\n".join(tags) + "\n<!-- / SEO plugin. -->\n"
+
+
+def wp_v2_post(site, post, edit=False):
+    """Shape of GET /wp/v2/posts/{id} (view context; edit=True adds the raw fields)."""
+    rid = post["id"]
+    mr = site.build_mr(rid)
+    content = render_content(mr["blocks"])
+    excerpt = "<p>" + " ".join(mr["core_content_text"].split()[:55]) + " [&hellip;]</p>\n"
+    route = site._rest_url(f"wp/v2/posts/{rid}")
+    out = {
+        "id": rid,
+        "date": post["published"].strftime("%Y-%m-%dT%H:%M:%S"),
+        "date_gmt": post["published"].strftime("%Y-%m-%dT%H:%M:%S"),
+        "guid": {"rendered": f"{site.base_url}/?p={rid}"},
+        "modified": post["modified"].strftime("%Y-%m-%dT%H:%M:%S"),
+        "modified_gmt": post["modified"].strftime("%Y-%m-%dT%H:%M:%S"),
+        "slug": post["slug"],
+        "status": post["status"],
+        "type": "post",
+        "link": site.permalink(post),
+        "title": {"rendered": post["title"]},
+        "content": {"rendered": content, "protected": False},
+        "excerpt": {"rendered": excerpt, "protected": False},
+        "author": post["author"]["id"],
+        "featured_media": post.get("featured_image") or 0,
+        "comment_status": "open",
+        "ping_status": "open",
+        "sticky": False,
+        "template": "",
+        "format": "standard",
+        "meta": {"footnotes": ""},
+        "yoast_head": seo_head(site, post, excerpt),
+        "yoast_head_json": {
+            "title": f"{post['title']} - Stand-in Site",
+            "robots": {"index": "index", "follow": "follow", "max-snippet": "max-snippet:-1",
+                       "max-image-preview": "max-image-preview:large", "max-video-preview": "max-video-preview:-1"},
+            "canonical": site.permalink(post),
+            "og_locale": "en_US",
+            "og_type": "article",
+            "og_title": post["title"],
+            "og_description": excerpt,
+            "og_url": site.permalink(post),
+            "og_site_name": "Stand-in Site",
+            "article_published_time": iso_c(post["published"]),
+            "article_modified_time": iso_c(post["modified"]),
+            "author": post["author"]["name"],
+            "twitter_card": "summary_large_image",
+        },
+        "categories": [c["id"] for c in post["categories"]],
+        "tags": [t["id"] for t in post["tags"]],
+        "class_list": [f"post-{rid}", "post", "type-post", f"status-{post['status']}", "format-standard", "hentry"],
+        "_links": {
+            "self": [{"href": route, "targetHints": {"allow": ["GET"]}}],
+            "collection": [{"href": site._rest_url("wp/v2/posts")}],
+            "about": [{"href": site._rest_url("wp/v2/types/post")}],
+            "author": [{"embeddable": True, "href": site._rest_url(f"wp/v2/users/{post['author']['id']}")}],
+            "replies": [{"embeddable": True, "href": site._rest_url(f"wp/v2/comments?post={rid}")}],
+            "version-history": [{"count": 1, "href": f"{route}/revisions"}],
+            "wp:attachment": [{"href": site._rest_url(f"wp/v2/media?parent={rid}")}],
+            "wp:term": [
+                {"taxonomy": "category", "embeddable": True, "href": site._rest_url(f"wp/v2/categories?post={rid}")},
+                {"taxonomy": "post_tag", "embeddable": True, "href": site._rest_url(f"wp/v2/tags?post={rid}")},
+            ],
+            "curies": [{"name": "wp", "href": "https://api.w.org/{rel}", "templated": True}],
+        },
+    }
+    if edit:
+        # Stored post_content keeps site-relative image URLs; the MR made them absolute
+        out["content"]["raw"] = render_content(post["blocks"])
+        out["title"]["raw"] = post["title"]
+        out["excerpt"]["raw"] = ""
+        out["_links"]["self"][0]["targetHints"]["allow"] = ["GET", "POST", "PUT", "PATCH", "DELETE"]
+    return out
+
+
+def compress_body(body, accept_encoding):
+    """(encoding, body) for the best coding the client accepts: br, gzip, deflate, else (None, body)."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().lower().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                pass
+        if name:
+            accepted[name.strip()] = q
+    for encoding in ("br", "gzip", "deflate"):
+        if accepted.get(encoding, accepted.get("*", 0)) <= 0:
+            continue
+        if encoding == "br":
+            if brotli is not None:
+                return "br", brotli.compress(body, quality=5)
+        elif encoding == "gzip":
+            return "gzip", gzip.compress(body, compresslevel=6, mtime=0)
+        else:
+            return "deflate", zlib.compress(body, 6)
+    return None, body
+
+
+ROUTES = [
+    ("GET", re.compile(r"^/posts/(\d+)$"), "mr"),
+    ("GET", re.compile(r"^/posts/(\d+)/md$"), "md"),
+    ("GET", re.compile(r"^/public/posts/(\d+)$"), "public_mr"),
+    ("GET", re.compile(r"^/public/posts/(\d+)/md$"), "public_md"),
+    ("GET", re.compile(r"^/catalog$"), "catalog"),
+    ("POST", re.compile(r"^/posts/(\d+)/blocks$"), "blocks"),
+    ("GET", re.compile(r"^/posts/(\d+)/ai/suggest$"), "suggest"),
+]
+WP_V2_POST = re.compile(r"^/wp-json/wp/v2/posts/(\d+)$")
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "DNI-Standin/1.0"
+    # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+    site = None
+    latency = None
+    quiet = True
+    profiler = False
+    compress = False
+    capacity = None
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+    # -- response helpers ----------------------------------------------------
+
+    def _send(self, status, body=b"", headers=None, standard=False, built=True, cost_bytes=None):
+        # 304 fast path skips the per-KB "build" cost; everything else pays it
+        # (cost_bytes: a representation that was built but is not sent)
+        self.latency.sleep(cost_bytes if cost_bytes is not None else (len(body) if built else 0), standard)
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        if self.profiler:
+            for k, v in self._profiler_headers(body, standard, built).items():
+                self.send_header(k, v)
+        if self.compress and body and status != 304:
+            # After Content-Digest, like a web server's gzip module in front of PHP
+            encoding, body = compress_body(body, self.headers.get("Accept-Encoding", ""))
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _profiler_headers(self, body, standard, built):
+        """X-Bench-* and Server-Timing in the shape the Dual-Native profiler emits.
+
+        Query and memory figures are modelled on PERFORMANCE.md (post 130):
+        core routes cost ~18 queries and allocate, Dual-Native routes ~8 and
+        don't, a 304 fast path is one meta lookup.
+        """
+        route_ms = (time.perf_counter() - self.t0) * 1000
+        kb = len(body) / 1024.0
+        if not built:
+            queries, mem_delta = 1, 0
+        elif standard:
+            queries, mem_delta = 18 + int(kb / 8), 1048576 + int(len(body) * 40)
+        else:
+            queries, mem_delta = 8, 0
+        db_ms = queries * 0.15
+        return {
+            "x-bench-route": urlsplit(self.path).path.replace("/wp-json", "", 1),
+            "x-bench-time-route-ms": f"{route_ms:.0f}",
+            "x-bench-queries-delta": str(queries),
+            "x-bench-mem-peak-bytes": str(117440512 + mem_delta),
+            "x-bench-mem-delta-bytes": str(mem_delta),
+            "x-bench-body-bytes": str(len(body)),
+            "Server-Timing": f'db;dur={db_ms:.2f};desc="{queries} queries", app;dur={max(0.0, route_ms - db_ms):.2f}',
+        }
+
+    def _send_json(self, status, data, headers=None, dni=True, standard=False):
+        body = php_default_json(data).encode("utf-8")
+        h = {"Content-Type": "application/json; charset=UTF-8"}
+        h.update(headers or {})
+        if dni and 200 <= status < 300:
+            h["Content-Digest"] = self.site.content_digest(body)
+        self._send(status, body, h, standard=standard)
+
+    def _error(self, status, code, message):
+        self._send_json(status, {"code": code, "message": message, "data": {"status": status}}, dni=False)
+
+    def _forbidden(self):
+        self._error(401, "rest_forbidden", "Sorry, you are not allowed to do that.")
+
+    # -- dispatch ------------------------------------------------------------
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_HEAD(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        self.t0 = time.perf_counter()
+        parts = urlsplit(self.path)
+        path = parts.path.rstrip("/") or "/"
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        # Always drain the request body so the keep-alive connection stays in sync
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+        if self.capacity is None:
+            return self._route(method, path, params)
+        if not self.capacity.enter():
+            cap = self.capacity
+            code = "rest_too_many_requests" if cap.status == 429 else "service_unavailable"
+            return self._send_json(cap.status, {"code": code, "message": "Server is busy, retry later.",
+                                                "data": {"status": cap.status}},
+                                   {"Retry-After": str(cap.retry_after)}, dni=False)
+        try:
+            return self._route(method, path, params)
+        finally:
+            self.capacity.leave()
+
+    def _route(self, method, path, params):
+        if path.startswith(NS):
+            sub = path[len(NS):]
+            for m, rx, name in ROUTES:
+                mt = rx.match(sub)
+                if mt and m == method:
+                    rid = int(mt.group(1)) if mt.groups() else None
+                    return getattr(self, f"route_{name}")(rid, params)
+            return self._error(404, "rest_no_route", "No route was found matching the URL and request method.")
+        mt = WP_V2_POST.match(path)
+        if mt and method == "GET":
+            return self.route_wp_v2(int(mt.group(1)), params)
+        if mt and method == "POST":
+            return self.route_wp_v2_update(int(mt.group(1)))
+        if method == "GET":
+            return self.route_page(path.strip("/"))
+        return self._error(404, "rest_no_route", "No route was found matching the URL and request method.")
+
+    def _authed(self):
+        return self.site.authorized(self.headers.get("Authorization"))
+
+    # -- routes ----------------------------------------------------------------
+
+    def route_mr(self, rid, params, public=False):
+        site = self.site
+        post = site.posts.get(rid)
+        if public:
+            if not post or post["status"] != "publish":
+                return self._forbidden()
+        elif not self._authed():
+            return self._forbidden()
+        stored = site.stored_cid(rid)
+        inm = parse_etag_list(self.headers.get("If-None-Match"))
+        if stored and stored in inm:
+            h = {"ETag": f'"{stored}"', "Cache-Control": "max-age=0, must-revalidate"}
+            if post:
+                h["Last-Modified"] = http_date(post["modified"])
+            return self._send(304, b"", h, built=False)
+        mr = site.build_mr(rid)
+        if not mr:
+            return self._send_json(404, {"error": "not_found"})
+        cid = stored or site.ensure_cid(rid, mr)
+        mr["cid"] = cid
+        self._send_json(200, mr, {
+            "ETag": f'"{cid}"',
+            "Content-Type": f'application/json; profile="{DNI_PROFILE}"',
+            "Last-Modified": http_date(post["modified"]),
+            "Cache-Control": "max-age=0, must-revalidate",
+        })
+
+    def route_md(self, rid, params, public=False):
+        site = self.site
+        post = site.posts.get(rid)
+        if public:
+            if not post or post["status"] != "publish":
+                return self._forbidden()
+        elif not self._authed():
+            return self._forbidden()
+        mr = site.build_mr(rid)
+        if not mr:
+            return self._send_json(404, {"error": "not_found"})
+        md = to_markdown(mr).encode("utf-8")
+        etag = "sha256-" + hashlib.sha256(md).hexdigest()
+        match = etag in parse_etag_list(self.headers.get("If-None-Match"))
+        h = {
+            "Content-Type": "text/markdown; charset=UTF-8",
+            "ETag": f'"{etag}"',
+            "Last-Modified": http_date(post["modified"]),
+            "Cache-Control": "max-age=0, must-revalidate",
+        }
+        if match:
+            # Markdown has no fast path: the MR is built before comparing
+            return self._send(304, b"", h, cost_bytes=len(md))
+        h["Content-Digest"] = self.site.content_digest(md)
+        self._send(200, md, h)
+
+    def route_public_mr(self, rid, params):
+        self.route_mr(rid, params, public=True)
+
+    def route_public_md(self, rid, params):
+        self.route_md(rid, params, public=True)
+
+    def route_catalog(self, rid, params):
+        if not self._authed():
+            return self._forbidden()
+        since = params.get("since") or params.get("cursor")
+        self._send_json(200, self.site.catalog(since, params.get("status"), params.get("types")))
+
+    def route_blocks(self, rid, params):
+        if not self._authed():
+            return self._forbidden()
+        try:
+            body = json.loads(self.body.decode("utf-8")) if self.body else None
+        except ValueError:
+            body = None
+        status, payload, h = self.site.insert_blocks(rid, body, self.headers.get("If-Match", ""))
+        if status == 200:
+            h["Content-Type"] = f'application/json; profile="{DNI_PROFILE}"'
+        self._send_json(status, payload, h)
+
+    def route_suggest(self, rid, params):
+        if not self._authed():
+            return self._forbidden()
+        mr = self.site.build_mr(rid)
+        if not mr:
+            return self._send_json(404, {"error": "not_found"})
+        self._send_json(200, heuristic_suggest(mr))
+
+    def route_wp_v2(self, rid, params):
+        post = self.site.posts.get(rid)
+        if not post or post["type"] != "post":
+            return self._error(404, "rest_post_invalid_id", "Invalid post ID.")
+        edit = params.get("context") == "edit"
+        if (post["status"] != "publish" or edit) and not self._authed():
+            return self._forbidden()
+        self._send_json(200, wp_v2_post(self.site, post, edit), {
+            "Link": f'<{self.site.permalink(post)}>; rel="alternate"; type=text/html',
+            "Allow": "GET, POST, PUT, PATCH, DELETE" if edit else "GET",
+        }, dni=False, standard=True)
+
+    def route_wp_v2_update(self, rid):
+        post = self.site.posts.get(rid)
+        if not post or post["type"] != "post":
+            return self._error(404, "rest_post_invalid_id", "Invalid post ID.")
+        if not self._authed():
+            return self._forbidden()
+        try:
+            body = json.loads(self.body.decode("utf-8")) if self.body else {}
+        except ValueError:
+            return self._error(400, "rest_invalid_json", "Invalid JSON body passed.")
+        content = body.get("content") if isinstance(body, dict) else None
+        if isinstance(content, dict):
+            content = content.get("raw")
+        if isinstance(content, str):
+            self.site.update_content(rid, content)
+        # Core answers an update with the whole post in edit context
+        self._send_json(200, wp_v2_post(self.site, post, edit=True), {"Allow": "GET, POST, PUT, PATCH, DELETE"},
+                        dni=False, standard=True)
+
+    def route_page(self, slug):
+        post = next((p for p in self.site.posts.values() if p["slug"] == slug and p["status"] == "publish"), None)
+        if not post:
+            return self._send(404, b"<!DOCTYPE html><html><body><h1>Page not found</h1></body></html>",
+                              {"Content-Type": "text/html; charset=UTF-8"}, standard=True)
+        body = render_page(self.site, post).encode("utf-8")
+        self._send(200, body, {"Content-Type": "text/html; charset=UTF-8"}, standard=True)
+
+
+def make_server(site, latency=None, host="127.0.0.1", port=0, quiet=True, profiler=False, compress=False,
+                capacity=None):
+    """Bind a ThreadingHTTPServer for site; port=0 picks a free port and fixes site.base_url."""
+    handler = type("BoundStandinHandler", (StandinHandler,), {
+        "site": site, "latency": latency or Latency("none"), "quiet": quiet, "profiler": profiler,
+        "compress": compress, "capacity": capacity,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    if port == 0 or site.base_url.endswith(":0"):
+        site.base_url = f"http://{host}:{server.server_address[1]}"
+    return server
+
+
+def start_background(site, latency=None, host="127.0.0.1", port=0, profiler=False, compress=False):
+    """Start a server on a daemon thread; returns (server, base_url). Call server.shutdown() to stop."""
+    server = make_server(site, latency, host, port, profiler=profiler, compress=compress)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, site.base_url
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1", help="Bind address")
+    ap.add_argument("--port", type=int, default=8080, help="Port (0 = any free port)")
+    ap.add_argument("--public-url", dest="public_url", help="Base URL used in links (default: http://host:port)")
+    ap.add_argument("--posts", type=int, default=100, help="Number of synthetic posts")
+    ap.add_argument("--seed", type=int, default=1, help="Corpus and latency RNG seed")
+    ap.add_argument("--blocks", default="4-40", help="Top-level blocks per post, e.g. 4-40")
+    ap.add_argument("--words", default="8-30", help="Words per sentence, e.g. 8-30")
+    ap.add_argument("--mix", default="", help="Block mix weights, e.g. paragraph=6,heading=2,list=1,image=1,code=1,quote=1")
+    ap.add_argument("--draft-ratio", dest="draft_ratio", type=float, default=0.1, help="Fraction of drafts")
+    ap.add_argument("--page-ratio", dest="page_ratio", type=float, default=0.1, help="Fraction of pages")
+    ap.add_argument("--latency", default="none", choices=sorted(LATENCY_PROFILES), help="Injected latency profile")
+    ap.add_argument("--latency-ms", dest="latency_ms", type=float, default=None, help="Override profile base latency (ms)")
+    ap.add_argument("--jitter-ms", dest="jitter_ms", type=float, default=None, help="Override profile jitter stddev (ms)")
+    ap.add_argument("--user", help="Require this Basic-auth user on private routes (default: accept any)")
+    ap.add_argument("--app-pass", dest="app_pass", help="Application Password for --user")
+    ap.add_argument("--bad-digest-ratio", dest="bad_digest_ratio", type=float, default=0.0, help="Fraction of bodies served with a wrong Content-Digest (fault injection)")
+    ap.add_argument("--profiler", action="store_true", help="Emit X-Bench-* and Server-Timing profiler headers")
+    ap.add_argument("--compress", action="store_true", help="Compress bodies per Accept-Encoding (gzip, deflate; br if brotli is installed)")
+    ap.add_argument("--capacity", type=int, default=0, help="Requests served at once (0 = unlimited); more queue, then get --busy-status")
+    ap.add_argument("--backlog", type=int, default=None, help="Requests queued beyond --capacity before refusing (default: --capacity)")
+    ap.add_argument("--busy-status", dest="busy_status", type=int, default=503, choices=(429, 503), help="Status for refused requests")
+    ap.add_argument("--retry-after", dest="retry_after", type=int, default=1, help="Retry-After seconds on refused requests")
+    ap.add_argument("--verbose", action="store_true", help="Log every request")
+    args = ap.parse_args()
+
+    try:
+        posts = generate_corpus(
+            posts=args.posts,
+            seed=args.seed,
+            blocks=parse_range(args.blocks, (4, 40)),
+            words=parse_range(args.words, (8, 30)),
+            mix=parse_mix(args.mix),
+            draft_ratio=args.draft_ratio,
+            page_ratio=args.page_ratio,
+        )
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    site = Site(posts, args.public_url or f"http://{args.host}:{args.port}", args.user, args.app_pass, args.bad_digest_ratio)
+    latency = Latency(args.latency, args.latency_ms, args.jitter_ms, args.seed)
+    capacity = Capacity(args.capacity, args.backlog, args.busy_status, args.retry_after) if args.capacity > 0 else None
+    server = make_server(site, latency, args.host, args.port, quiet=not args.verbose, profiler=args.profiler,
+                         compress=args.compress, capacity=capacity)
+    print(f"Dual-Native stand-in serving {len(posts)} posts at {site.base_url} (latency: {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Statistics helpers for the benchmark tools.
+
+Histogram is an HDR-style log-linear latency histogram: values are bucketed
+with a fixed relative precision (2^-sub_bits, ~0.1% by default), so memory is
+bounded regardless of sample count and histograms from several runs or load
+generators can be merged exactly.
+
+quantile / describe / bootstrap_ci work on plain sample lists (per-post
+medians from a benchmark protocol run): exact percentiles and percentile
+bootstrap confidence intervals for any statistic, e.g. a ratio of medians.
+wilcoxon_greater is the paired significance test dni_compare.py uses.
+"""
+
+import math
+import random
+
+
+class Histogram:
+    """Mergeable latency histogram. Values are recorded in ms, stored as integer µs."""
+
+    def __init__(self, sub_bits=10):
+        self.sub_bits = sub_bits
+        self.counts = {}
+        self.total = 0
+        self.sum_us = 0
+        self.min_us = None
+        self.max_us = None
+
+    def _index(self, v):
+        shift = max(0, v.bit_length() - self.sub_bits)
+        return (shift << self.sub_bits) | (v >> shift)
+
+    def _value(self, idx):
+        """Midpoint (µs) of the bucket at idx."""
+        shift = idx >> self.sub_bits
+        low = (idx & ((1 << self.sub_bits) - 1)) << shift
+        return low + ((1 << shift) - 1) / 2.0
+
+    def record(self, value_ms, count=1):
+        v = max(0, int(round(value_ms * 1000.0)))
+        idx = self._index(v)
+        self.counts[idx] = self.counts.get(idx, 0) + count
+        self.total += count
+        self.sum_us += v * count
+        self.min_us = v if self.min_us is None else min(self.min_us, v)
+        self.max_us = v if self.max_us is None else max(self.max_us, v)
+
+    def record_corrected(self, value_ms, expected_interval_ms):
+        """Record value and back-fill the samples a stalled closed-loop client never sent.
+
+        Same correction as HdrHistogram's recordValueWithExpectedInterval.
+        """
+        self.record(value_ms)
+        if expected_interval_ms <= 0:
+            return
+        missing = value_ms - expected_interval_ms
+        while missing >= expected_interval_ms:
+            self.record(missing)
+            missing -= expected_interval_ms
+
+    def merge(self, other):
+        if other.sub_bits != self.sub_bits:
+            raise ValueError("Cannot merge histograms with different precision")
+        for idx, c in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + c
+        self.total += other.total
+        self.sum_us += other.sum_us
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+            self.max_us = other.max_us if self.max_us is None else max(self.max_us, other.max_us)
+        return self
+
+    def percentile(self, p):
+        """Value (ms) at percentile p (0-100)."""
+        if not self.total:
+            return 0.0
+        rank = max(1, int(math.ceil(p / 100.0 * self.total)))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                v = min(max(self._value(idx), self.min_us), self.max_us)
+                return v / 1000.0
+        return self.max_us / 1000.0
+
+    def mean(self):
+        return (self.sum_us / self.total / 1000.0) if self.total else 0.0
+
+    def summary(self, percentiles=(50, 90, 99, 99.9)):
+        out = {
+            "count": self.total,
+            "min_ms": round((self.min_us or 0) / 1000.0, 3),
+            "mean_ms": round(self.mean(), 3),
+            "max_ms": round((self.max_us or 0) / 1000.0, 3),
+        }
+        for p in percentiles:
+            out[f"p{p:g}_ms".replace(".", "_")] = round(self.percentile(p), 3)
+        return out
+
+    def to_dict(self):
+        return {
+            "sub_bits": self.sub_bits,
+            "total": self.total,
+            "sum_us": self.sum_us,
+            "min_us": self.min_us,
+            "max_us": self.max_us,
+            "counts": {str(k): v for k, v in sorted(self.counts.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        h = cls(d.get("sub_bits", 10))
+        h.counts = {int(k): int(v) for k, v in d.get("counts", {}).items()}
+        h.total = int(d.get("total", sum(h.counts.values())))
+        h.sum_us = int(d.get("sum_us", 0))
+        h.min_us = d.get("min_us")
+        h.max_us = d.get("max_us")
+        return h
+
+
+def quantile(values, q):
+    """q-quantile (0-1) of values with linear interpolation between order statistics."""
+    xs = sorted(values)
+    if not xs:
+        return 0.0
+    pos = (len(xs) - 1) * q
+    lo = int(math.floor(pos))
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (pos - lo)
+
+
+def median(values):
+    return quantile(values, 0.5)
+
+
+def bootstrap_ci(samples, statistic=median, n_boot=2000, conf=0.95, seed=0):
+    """Percentile bootstrap (lo, hi) for statistic(samples).
+
+    samples may hold tuples (e.g. paired per-post timings) as long as
+    statistic knows how to reduce them; resampling keeps pairs together.
+    """
+    if len(samples) < 2:
+        v = statistic(samples) if samples else 0.0
+        return v, v
+    rng = random.Random(seed)
+    n = len(samples)
+    stats = sorted(statistic([samples[rng.randrange(n)] for _ in range(n)]) for _ in range(n_boot))
+    alpha = (1.0 - conf) / 2.0
+    return quantile(stats, alpha), quantile(stats, 1.0 - alpha)
+
+
+def bootstrap_resamples(n, most=2000, least=200, budget=2_000_000):
+    """Resample count for n samples: `most` for small runs, fewer as n grows.
+
+    Each resample sorts n values in pure Python, so the count is scaled to
+    keep n * resamples near budget; `least` still gives usable 95% CIs.
+    """
+    return max(least, min(most, budget // max(1, n)))
+
+
+def wilcoxon_greater(diffs):
+    """One-sided Wilcoxon signed-rank test that paired differences tend to be > 0.
+
+    Zero differences are dropped, tied |d| get average ranks, and the p-value
+    uses the normal approximation with tie and continuity corrections (fine
+    from ~10 pairs up). Returns (n_nonzero, W+, p); p is 1.0 with no data.
+    """
+    d = [x for x in diffs if x != 0]
+    n = len(d)
+    if n == 0:
+        return 0, 0.0, 1.0
+    order = sorted(range(n), key=lambda i: abs(d[i]))
+    ranks = [0.0] * n
+    tie_term = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and abs(d[order[j + 1]]) == abs(d[order[i]]):
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2.0 + 1.0
+        t = j - i + 1
+        tie_term += t ** 3 - t
+        i = j + 1
+    w_plus = sum(r for r, x in zip(ranks, d) if x > 0)
+    mean = n * (n + 1) / 4.0
+    var = n * (n + 1) * (2 * n + 1) / 24.0 - tie_term / 48.0
+    if var <= 0:
+        return n, w_plus, 0.5
+    z = (w_plus - mean - 0.5) / math.sqrt(var)
+    return n, w_plus, 0.5 * math.erfc(z / math.sqrt(2.0))
+
+
+def describe(values, percentiles=(10, 50, 90, 99), conf=0.95, n_boot=2000, seed=0):
+    """count/mean/min/max, percentiles and a bootstrap CI for the median."""
+    if not values:
+        return {"count": 0}
+    lo, hi = bootstrap_ci(list(values), median, n_boot, conf, seed)
+    out = {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "min": round(min(values), 3),
+        "max": round(max(values), 3),
+    }
+    for p in percentiles:
+        out[f"p{p:g}".replace(".", "_")] = round(quantile(values, p / 100.0), 3)
+    out["median_ci"] = [round(lo, 3), round(hi, 3)]
+    return out
+
+
+def median_fields(records):
+    """Per-key median over a list of {name: value} dicts (keys may differ between records)."""
+    values = {}
+    for rec in records:
+        for k, v in rec.items():
+            values.setdefault(k, []).append(v)
+    return {k: median(vs) for k, vs in values.items()}
+
+
+def describe_fields(records, percentiles=(50, 90, 99), n_boot=500, seed=0):
+    """describe() for every key that appears in a list of {name: value} dicts."""
+    values = {}
+    for rec in records:
+        for k, v in rec.items():
+            values.setdefault(k, []).append(v)
+    return {k: describe(vs, percentiles, n_boot=n_boot, seed=seed) for k, vs in sorted(values.items())}
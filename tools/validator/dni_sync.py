@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+DNI Sync: incremental catalog mirror
+
+Keeps a local SQLite index of rid -> (cid, modified, status, title) plus the
+MR bodies, and persists the catalog cursor between runs. Each run pulls only
+the catalog delta since the last cursor, compares CIDs against the index and
+fetches just the MRs that changed (with If-None-Match on the stored CID), so
+a refresh costs about one request per changed post.
+
+Usage:
+  python tools/validator/dni_sync.py \
+    --base https://example.com \
+    --user USERNAME \
+    --app-pass "APPLICATION PASSWORD" \
+    --db dni_mirror.sqlite \
+    [--status any] [--types post,page] [--concurrency 4] [--full] [--json sync.json]
+
+Notes:
+  - The catalog 'since' filter is strict (modified > cursor) at one-second
+    resolution, so each delta re-reads --overlap seconds before the cursor;
+    the CID comparison makes the overlap free.
+  - Deleted posts never appear in a delta. --full re-reads the whole catalog
+    and prunes rids that are gone.
+  - An MR fetch that fails leaves its row with mr_cid != cid. Every run
+    retries such rows, even when the delta no longer contains them, and the
+    cursor only moves when no MR fetch failed.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import sqlite3
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+
+from dni_client import DualNativeClient, DualNativeError
+from dni_engine import Engine, format_rate_stats, run_pipeline
+from dni_http import HttpPool, format_pool_stats
+from dni_jsonstream import CatalogStreamError, open_catalog
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    site TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (site, key)
+);
+CREATE TABLE IF NOT EXISTS posts (
+    site TEXT NOT NULL,
+    rid INTEGER NOT NULL,
+    cid TEXT NOT NULL,
+    modified TEXT,
+    status TEXT,
+    title TEXT,
+    mr_cid TEXT,
+    mr BLOB,
+    synced_at TEXT,
+    PRIMARY KEY (site, rid)
+);
+"""
+
+
+def b64_basic(user, pw):
+    raw = f"{user}:{pw}".encode("utf-8")
+    return base64.b64encode(raw).decode("ascii")
+
+
+class MirrorIndex:
+    """SQLite-backed rid -> cid index (one file can hold several sites)."""
+
+    def __init__(self, path, site):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.site = site
+
+    def get_state(self, key):
+        row = self.db.execute("SELECT value FROM sync_state WHERE site=? AND key=?", (self.site, key)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO sync_state (site, key, value) VALUES (?, ?, ?)", (self.site, key, value))
+
+    def entries(self):
+        """rid -> (cid, mr_cid) for every indexed post."""
+        rows = self.db.execute("SELECT rid, cid, mr_cid FROM posts WHERE site=?", (self.site,))
+        return {rid: (cid, mr_cid) for rid, cid, mr_cid in rows}
+
+    def upsert_item(self, item):
+        self.db.execute(
+            "INSERT INTO posts (site, rid, cid, modified, status, title) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(site, rid) DO UPDATE SET cid=excluded.cid, modified=excluded.modified, "
+            "status=excluded.status, title=excluded.title",
+            (self.site, item["rid"], item.get("cid", ""), item.get("modified"), item.get("status"), item.get("title")),
+        )
+
+    def store_mr(self, rid, mr_cid, body):
+        self.db.execute(
+            "UPDATE posts SET mr_cid=?, mr=?, synced_at=? WHERE site=? AND rid=?",
+            (mr_cid, zlib.compress(body), datetime.now(timezone.utc).isoformat(), self.site, rid),
+        )
+
+    def touch(self, rid, mr_cid):
+        self.db.execute("UPDATE posts SET mr_cid=?, synced_at=? WHERE site=? AND rid=?",
+                        (mr_cid, datetime.now(timezone.utc).isoformat(), self.site, rid))
+
+    def get_mr(self, rid):
+        row = self.db.execute("SELECT mr FROM posts WHERE site=? AND rid=?", (self.site, rid)).fetchone()
+        return json.loads(zlib.decompress(row[0]).decode("utf-8")) if row and row[0] else None
+
+    def prune(self, keep_rids):
+        gone = [rid for rid in self.entries() if rid not in keep_rids]
+        self.db.executemany("DELETE FROM posts WHERE site=? AND rid=?", [(self.site, rid) for rid in gone])
+        return gone
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def delta_since(cursor, overlap_s):
+    """Cursor minus the overlap window, in the ISO form the catalog accepts."""
+    try:
+        dt = datetime.fromisoformat(cursor.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return cursor
+    return (dt - timedelta(seconds=overlap_s)).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base", required=True, help="WordPress base URL")
+    ap.add_argument("--user", required=True, help="WordPress username")
+    ap.add_argument("--app-pass", dest="app_pass", required=True, help="WordPress Application Password")
+    ap.add_argument("--db", default="dni_mirror.sqlite", help="SQLite index path")
+    ap.add_argument("--status", default="any", help="Catalog status filter (publish, draft, any)")
+    ap.add_argument("--types", default="", help="Catalog post types (comma list; default: plugin default)")
+    ap.add_argument("--full", action="store_true", help="Ignore the stored cursor, re-read the whole catalog and prune deleted posts")
+    ap.add_argument("--overlap", type=int, default=2, help="Seconds re-read before the stored cursor")
+    ap.add_argument("--index-only", dest="index_only", action="store_true", help="Only update the rid->cid index, do not fetch MRs")
+    ap.add_argument("--concurrency", type=int, default=4, help="Max in-flight MR requests")
+    ap.add_argument("--rate", default="adaptive", choices=("adaptive", "fixed"), help="adaptive: find the concurrency the site sustains, up to --concurrency; fixed: always --concurrency")
+    ap.add_argument("--throttle-retries", dest="throttle_retries", type=int, default=3, help="Retries of a request throttled with 429/503 (after Retry-After)")
+    ap.add_argument("--json", help="Write a sync report JSON here")
+    args = ap.parse_args()
+
+    base = args.base.rstrip("/")
+    headers = {"Authorization": f"Basic {b64_basic(args.user, args.app_pass)}", "Accept": "application/json"}
+    pool = HttpPool()
+    index = MirrorIndex(args.db, base)
+    started = time.perf_counter()
+
+    cursor = None if args.full else index.get_state("cursor")
+    params = {"status": args.status}
+    if args.types:
+        params["types"] = args.types
+    if cursor:
+        params["cursor"] = delta_since(cursor, args.overlap)
+    catalog_url = f"{base}/wp-json/dual-native/v1/catalog?{urlencode(params)}"
+    print(f"Fetching catalog {'delta since ' + params['cursor'] if cursor else '(full)'}...")
+    st, stream = open_catalog(pool, catalog_url, headers)
+    if st != 200:
+        print(f"ERROR: Catalog fetch failed with HTTP {st}")
+        return 1
+
+    # Classify while the catalog streams in; only rids are kept for the whole run
+    known = index.entries()
+    new, changed, stale = [], [], []
+    seen = set()
+    try:
+        for it in stream:
+            rid = it.get("rid")
+            if not rid:
+                continue
+            seen.add(rid)
+            prev = known.get(rid)
+            if prev is None:
+                new.append(it)
+            elif prev[0] != it.get("cid"):
+                changed.append(it)
+            elif not args.index_only and prev[1] != it.get("cid"):
+                # Index is current but the stored MR is missing or older
+                stale.append(it)
+            index.upsert_item(it)
+    except (CatalogStreamError, OSError) as e:
+        # Nothing from a partial catalog is kept, so the next run re-reads the same delta
+        stream.close()
+        index.db.rollback()
+        print(f"ERROR: Catalog read failed: {e}")
+        return 1
+    pruned = index.prune(seen) if args.full else []
+    index.commit()
+    # MRs that an earlier run failed to fetch are outside this delta; retry them too
+    backlog = [] if args.index_only else [
+        {"rid": rid, "cid": cid} for rid, (cid, mr_cid) in known.items() if rid not in seen and cid != mr_cid
+    ]
+    print(f"Catalog: {len(seen)} items ({len(new)} new, {len(changed)} changed, {len(stale)} MR-stale, "
+          f"{len(seen) - len(new) - len(changed) - len(stale)} unchanged, {len(pruned)} pruned)"
+          + (f"; retrying {len(backlog)} earlier MR failures" if backlog else ""))
+
+    counts = {"mr_200": 0, "mr_304": 0, "mr_errors": 0, "mr_bytes": 0}
+    rate_stats = {}
+    to_fetch = [] if args.index_only else new + changed + stale + backlog
+
+    if to_fetch:
+        engine = Engine(pool.fetch, args.concurrency, adaptive=args.rate == "adaptive", max_retries=args.throttle_retries)
+        client = DualNativeClient(base, args.user, args.app_pass, pool=pool, cache_bytes=0)
+
+        async def sync_post(idx, item):
+            rid = item["rid"]
+            prev = known.get(rid)
+            # The SQLite index is the cache here, so its stored CID goes in If-None-Match
+            try:
+                res = await engine.run(client.url("mr", rid),
+                                       lambda: client.fetch("mr", rid, etag=prev[1] if prev else None), "mr")
+            except DualNativeError as e:
+                counts["mr_errors"] += 1
+                print(f"  WARN: MR {rid} fetch failed with HTTP {e.status}")
+                return None
+            if res.status == 304:
+                counts["mr_304"] += 1
+                index.touch(rid, res.etag or prev[1])
+            else:
+                counts["mr_200"] += 1
+                counts["mr_bytes"] += len(res.body)
+                index.store_mr(rid, res.etag or item.get("cid", ""), res.body)
+            if idx % 200 == 0:
+                index.commit()
+            return None
+
+        try:
+            asyncio.run(run_pipeline(to_fetch, sync_post, args.concurrency))
+        finally:
+            engine.close()
+        rate_stats = engine.rate_stats()
+
+    # Only advance the cursor once the delta is fully applied; failed MRs are
+    # retried from the index either way, but keeping the cursor also re-reads them
+    new_cursor = stream.meta.get("cursor")
+    if new_cursor and (not cursor or new_cursor > cursor) and not counts["mr_errors"]:
+        index.set_state("cursor", new_cursor)
+    index.set_state("last_sync", datetime.now(timezone.utc).isoformat())
+    index_cursor = index.get_state("cursor")
+    index.close()
+
+    pool_stats = pool.stats()
+    pool.close()
+    report = {
+        "site": args.base,
+        "db": args.db,
+        "mode": "full" if not cursor else "delta",
+        "cursor_before": cursor,
+        "cursor_after": index_cursor,
+        "catalog_items": len(seen),
+        "new": len(new),
+        "changed": len(changed),
+        "mr_stale": len(stale),
+        "mr_retried": len(backlog),
+        "unchanged": len(seen) - len(new) - len(changed) - len(stale),
+        "pruned": len(pruned),
+        "mr_fetched_200": counts["mr_200"],
+        "mr_not_modified_304": counts["mr_304"],
+        "mr_errors": counts["mr_errors"],
+        "mr_bytes": counts["mr_bytes"],
+        "requests": pool_stats["requests"],
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "http_pool": pool_stats,
+        "rate_control": rate_stats,
+    }
+    print(format_pool_stats(pool_stats))
+    if rate_stats:
+        print(format_rate_stats(rate_stats))
+    print(json.dumps({k: v for k, v in report.items() if k not in ("http_pool", "rate_control")}, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as jf:
+            json.dump(report, jf, ensure_ascii=False, indent=2)
+    return 0 if not counts["mr_errors"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
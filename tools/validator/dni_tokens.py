@@ -0,0 +1,250 @@
+"""
+Token counting for the measurement tools.
+
+Backends (--tokenizer):
+  auto            tiktoken cl100k_base if installed, else approx
+  tiktoken[:ENC]  tiktoken encoding (default cl100k_base; e.g. o200k_base)
+  hf:PATH         Hugging Face tokenizers, tokenizer.json at PATH
+  approx          stdlib estimate: GPT-style pre-tokenization with per-piece
+                  costs; much closer than bytes/4 for code and non-Latin text
+  bytes           the original ~1 token per 4 bytes heuristic
+
+tiktoken and tokenizers are optional; they are imported only when selected.
+A backend is loaded once per process (load_backend is memoized).
+
+TokenCounter adds an on-disk SQLite cache keyed by backend and content
+identity (ETag/CID where the server sends one, a body hash otherwise), so a
+post whose CID did not change is never tokenized again across runs. Misses
+are tokenized as one batch (tiktoken's encode_ordinary_batch uses threads).
+The tools default the cache to DEFAULT_CACHE in the user's cache directory
+($XDG_CACHE_HOME or ~/.cache), never the working directory. Concurrent runs
+share it: the database is in WAL mode with a busy timeout, each batch
+commits on its own, and a cache that still cannot be used is dropped with a
+warning so counting carries on without it. ETag keys carry the site, since
+two sites can send the same ETag for different bodies.
+"""
+
+import functools
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# cl100k-style pre-tokenizer: contractions, words with one leading space or
+# punctuation char, 1-3 digit groups, punctuation runs, whitespace
+PRETOKEN = re.compile(r"'(?:[sdmt]|ll|ve|re)|[^\r\n\w]?[^\W\d_]+|\d{1,3}| ?[^\s\w]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+")
+
+CACHE_BUSY_TIMEOUT_S = 30
+
+DEFAULT_CACHE = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                             "dual-native", "tokens.sqlite")
+
+# ASCII punctuation a word piece may start with
+PUNCT = "".join(chr(c) for c in range(33, 127) if not chr(c).isalnum())
+
+
+class BytesBackend:
+    """~1 token per 4 bytes (the tools' original estimate)."""
+
+    name = "bytes/4"
+
+    def count_batch(self, texts):
+        return [int(round(len(t.encode("utf-8")) / 4.0)) for t in texts]
+
+
+class ApproxBackend:
+    """Stdlib approximation of a BPE tokenizer.
+
+    Short ASCII words are one token, longer ones split roughly every 4-5
+    characters; each non-ASCII character adds about one token (CJK is ~1 per
+    character in cl100k); punctuation runs cost one token per 3 characters.
+    """
+
+    # Part of the cache key: bump when the formula changes
+    name = "approx-v1"
+
+    def _count(self, text):
+        # Pieces repeat heavily (words, markup), so their costs are memoized
+        return sum(map(_piece_cost, PRETOKEN.findall(text)))
+
+    def count_batch(self, texts):
+        return [self._count(t) for t in texts]
+
+
+@functools.lru_cache(maxsize=65536)
+def _piece_cost(piece):
+    if piece.isspace():
+        return 1
+    core = piece.lstrip()
+    if not core.isascii():
+        wide = sum(1 for ch in core if ord(ch) > 127)
+        return wide + math.ceil((len(core) - wide) / 4.5)
+    if core[-1].isalpha():
+        letters = len(core.lstrip(PUNCT))
+        return 1 if letters <= 6 else math.ceil(letters / 4.5)
+    if core.isdigit():
+        return 1
+    return math.ceil(len(core.rstrip("\r\n")) / 3)
+
+
+class TiktokenBackend:
+    def __init__(self, encoding="cl100k_base"):
+        import tiktoken  # optional dependency
+
+        self.enc = tiktoken.get_encoding(encoding)
+        self.name = f"tiktoken:{encoding}"
+
+    def count_batch(self, texts):
+        return [len(ids) for ids in self.enc.encode_ordinary_batch(list(texts))]
+
+
+class HFBackend:
+    def __init__(self, path):
+        from tokenizers import Tokenizer  # optional dependency
+
+        self.tok = Tokenizer.from_file(path)
+        self.name = f"hf:{path}"
+
+    def count_batch(self, texts):
+        return [len(e.ids) for e in self.tok.encode_batch(list(texts), add_special_tokens=False)]
+
+
+@functools.lru_cache(maxsize=None)
+def load_backend(spec="auto"):
+    """Backend for a --tokenizer spec; raises ValueError (bad spec) or ImportError."""
+    kind, _, arg = (spec or "auto").partition(":")
+    if kind == "auto":
+        try:
+            return TiktokenBackend(arg or "cl100k_base")
+        except ImportError:
+            return ApproxBackend()
+    if kind == "tiktoken":
+        return TiktokenBackend(arg or "cl100k_base")
+    if kind == "hf":
+        if not arg:
+            raise ValueError("hf tokenizer needs a path: hf:/path/to/tokenizer.json")
+        return HFBackend(arg)
+    if kind == "approx":
+        return ApproxBackend()
+    if kind in ("bytes", "bytes/4"):
+        return BytesBackend()
+    raise ValueError(f"Unknown tokenizer: {spec}")
+
+
+def content_key(kind, body, etag="", site=""):
+    """Cache key: kind plus the site's ETag/CID when there is one, else a body hash.
+
+    site is the host (netloc) that issued the ETag; body hashes need none.
+    """
+    if etag and not etag.startswith("W/"):
+        return f"{kind}:{site}:{etag}"
+    return f"{kind}:sha256-{hashlib.sha256(body).hexdigest()}"
+
+
+class TokenCounter:
+    """Counts tokens through one backend with an optional SQLite cache.
+
+    Thread-safe: tools call count_many() from engine worker threads.
+    """
+
+    def __init__(self, backend, cache_path=None):
+        self.backend = backend
+        self.db = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.tokenize_ms = 0.0
+        self.cache_error = None
+        if cache_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+                # Other runs may hold the file: wait for their short write transactions
+                self.db = sqlite3.connect(cache_path, timeout=CACHE_BUSY_TIMEOUT_S, check_same_thread=False)
+                self.db.execute("PRAGMA journal_mode=WAL")
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS tokens (backend TEXT NOT NULL, key TEXT NOT NULL, "
+                    "count INTEGER NOT NULL, PRIMARY KEY (backend, key))"
+                )
+                self.db.commit()
+            except (OSError, sqlite3.Error) as e:
+                self._drop_cache(e)
+
+    def _drop_cache(self, error):
+        """Carry on without the cache after an error; caller holds self.lock or is __init__."""
+        self.cache_error = str(error)
+        print(f"  WARN: token cache disabled: {error}")
+        if self.db is not None:
+            try:
+                self.db.close()
+            except sqlite3.Error:
+                pass
+            self.db = None
+
+    def count_many(self, items):
+        """Token counts for [(key, body_bytes), ...], in order."""
+        out = [None] * len(items)
+        if self.db is not None and items:
+            keys = [k for k, _ in items]
+            rows = []
+            with self.lock:
+                try:
+                    if self.db is not None:
+                        rows = self.db.execute(
+                            f"SELECT key, count FROM tokens WHERE backend=? AND key IN ({','.join('?' * len(keys))})",
+                            [self.backend.name] + keys,
+                        ).fetchall()
+                except sqlite3.Error as e:
+                    self._drop_cache(e)
+            cached = dict(rows)
+            for i, k in enumerate(keys):
+                out[i] = cached.get(k)
+        todo = [i for i, c in enumerate(out) if c is None]
+        if todo:
+            t0 = time.perf_counter()
+            counts = self.backend.count_batch([items[i][1].decode("utf-8", errors="replace") for i in todo])
+            elapsed = (time.perf_counter() - t0) * 1000
+            for i, c in zip(todo, counts):
+                out[i] = c
+        with self.lock:
+            self.hits += len(items) - len(todo)
+            self.misses += len(todo)
+            if todo:
+                self.tokenize_ms += elapsed
+                if self.db is not None:
+                    # One short transaction per batch, so other runs are never locked out for long
+                    try:
+                        with self.db:
+                            self.db.executemany(
+                                "INSERT OR REPLACE INTO tokens (backend, key, count) VALUES (?, ?, ?)",
+                                [(self.backend.name, items[i][0], out[i]) for i in todo],
+                            )
+                    except sqlite3.Error as e:
+                        self._drop_cache(e)
+        return out
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "tokenizer": self.backend.name,
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate_pct": round(self.hits / total * 100.0, 2) if total else 0.0,
+            "tokenize_ms_total": round(self.tokenize_ms, 2),
+            "cache_error": self.cache_error,
+        }
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+
+def format_token_stats(stats):
+    """One-line human summary of TokenCounter.stats()."""
+    return (f"Tokens: {stats['tokenizer']}, {stats['cache_hits']} cache hits, {stats['cache_misses']} tokenized "
+            f"in {stats['tokenize_ms_total']:.0f} ms"
+            + (f" (cache disabled: {stats['cache_error']})" if stats.get("cache_error") else ""))
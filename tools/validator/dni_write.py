@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+DNI Write: chained safe-write batch insert
+
+Applies a list of block inserts to many posts through
+POST /dual-native/v1/posts/{id}/blocks. Each post's edits run in order and
+each request sends If-Match with the CID from the previous response's ETag,
+so a post is never re-read between writes. Different posts run in parallel.
+
+Adjacent edits to the same post are coalesced into one blocks[] request:
+appends into one append, and prepends into one prepend, with their order kept
+so the post ends up as if they had been sent one by one. Index inserts are
+sent one per request, because the server counts positions in parsed
+top-level blocks, including whitespace, which a client cannot predict.
+
+On 412 the post changed underneath the batch. With --on-conflict rebase
+(default) the request is retried on the response's currentCid, up to
+--max-retries times. Append/prepend keep their meaning on any base. Index
+inserts do not, so they are only rebased with --rebase-index.
+
+Edits file (JSON Lines, or a JSON array), one insert per entry:
+  {"rid": 123, "insert": "append", "block": {"type": "core/paragraph", "content": "Hi"}}
+  {"rid": 123, "insert": "prepend", "blocks": [{...}, {...}]}
+  {"rid": 456, "insert": "index", "index": 2, "block": {...}, "if_match": "sha256-..."}
+"if_match" pins the CID the edit was planned against (first edit of a post).
+
+Usage:
+  python tools/validator/dni_write.py \
+    --base https://example.com \
+    --user USERNAME \
+    --app-pass "APPLICATION PASSWORD" \
+    --edits edits.jsonl \
+    [--base-cid catalog|read|none] [--concurrency 4] [--max-blocks 50] \
+    [--on-conflict rebase|fail] [--max-retries 3] [--rebase-index] [--dry-run] [--json write.json]
+
+Notes:
+  - This tool MODIFIES content. Try it with --dry-run or against dni_standin.py first.
+  - --base-cid catalog (default) takes each post's starting CID from one
+    streamed catalog request; posts not in the catalog fall back to a GET.
+    'read' GETs every post's MR first, and 'none' sends the first write of
+    each post without If-Match.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from dni_client import DualNativeClient, DualNativeError, PreconditionFailed
+from dni_engine import Engine, format_rate_stats, run_pipeline
+from dni_http import HttpPool, format_pool_stats
+from dni_stats import describe
+
+INSERT_MODES = ("append", "prepend", "index")
+
+
+def load_edits(path):
+    """Normalized edits [{rid, insert, index, blocks, if_match}] in file order; raises ValueError."""
+    with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as f:
+        text = f.read()
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        raw = [(i + 1, e) for i, e in enumerate(json.loads(stripped))]
+    else:
+        raw = [(n, json.loads(line)) for n, line in enumerate(text.splitlines(), 1) if line.strip()]
+    edits = []
+    for n, e in raw:
+        if not isinstance(e, dict):
+            raise ValueError(f"edit {n}: not an object")
+        try:
+            rid = int(e["rid"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"edit {n}: missing or invalid rid")
+        insert = str(e.get("insert", "append"))
+        if insert not in INSERT_MODES:
+            raise ValueError(f"edit {n}: insert must be one of {', '.join(INSERT_MODES)}")
+        blocks = e.get("blocks") if isinstance(e.get("blocks"), list) else (
+            [e["block"]] if isinstance(e.get("block"), dict) else [])
+        if not blocks:
+            raise ValueError(f"edit {n}: needs block or blocks")
+        index = e.get("index")
+        if insert == "index" and index is None:
+            raise ValueError(f"edit {n}: index insert needs an index")
+        edits.append({
+            "rid": rid,
+            "insert": insert,
+            "index": int(index) if index is not None else None,
+            "blocks": blocks,
+            "if_match": e.get("if_match"),
+        })
+    return edits
+
+
+def coalesce(edits, max_blocks=50):
+    """Group edits by post (first-seen order) and merge adjacent appends / prepends.
+
+    Returns [(rid, if_match, [batch, ...])] where a batch is
+    {insert, index, blocks, edits}. A run of prepends is merged in reverse,
+    since each prepend lands in front of the previous one.
+    """
+    posts = {}
+    for e in edits:
+        entry = posts.setdefault(e["rid"], [e["if_match"], []])
+        if entry[0] is None:
+            entry[0] = e["if_match"]
+        batches = entry[1]
+        last = batches[-1] if batches else None
+        if (last is not None and e["insert"] == last["insert"] and e["insert"] != "index"
+                and len(last["blocks"]) + len(e["blocks"]) <= max_blocks):
+            if e["insert"] == "append":
+                last["blocks"] = last["blocks"] + e["blocks"]
+            else:
+                last["blocks"] = e["blocks"] + last["blocks"]
+            last["edits"] += 1
+        else:
+            batches.append({"insert": e["insert"], "index": e["index"], "blocks": list(e["blocks"]), "edits": 1})
+    return [(rid, ifm, batches) for rid, (ifm, batches) in posts.items()]
+
+
+def catalog_cids(client, rids, status, types):
+    """rid -> CID for the wanted rids, from one streamed catalog request."""
+    wanted = set(rids)
+    cids = {}
+    for it in client.catalog(status=status, types=types or None):
+        rid = it.get("rid")
+        if rid in wanted and it.get("cid"):
+            cids[rid] = it["cid"]
+            if len(cids) == len(wanted):
+                break
+    return cids
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Apply block inserts to many posts with chained If-Match")
+    ap.add_argument("--base", required=True, help="WordPress base URL")
+    ap.add_argument("--user", required=True, help="WordPress username")
+    ap.add_argument("--app-pass", dest="app_pass", required=True, help="WordPress Application Password")
+    ap.add_argument("--edits", required=True, help="Edits file (JSON Lines or JSON array; - for stdin)")
+    ap.add_argument("--base-cid", dest="base_cid", choices=("catalog", "read", "none"), default="catalog",
+                    help="Where each post's first If-Match comes from")
+    ap.add_argument("--status", default="any", help="Catalog status filter for --base-cid catalog")
+    ap.add_argument("--types", default="", help="Catalog post types for --base-cid catalog (comma list)")
+    ap.add_argument("--concurrency", type=int, default=4, help="Posts written in parallel")
+    ap.add_argument("--rate", default="adaptive", choices=("adaptive", "fixed"), help="adaptive: find the concurrency the site sustains, up to --concurrency; fixed: always --concurrency")
+    ap.add_argument("--throttle-retries", dest="throttle_retries", type=int, default=3, help="Retries of a base read throttled with 429/503 (after Retry-After); writes are never retried")
+    ap.add_argument("--max-blocks", dest="max_blocks", type=int, default=50, help="Max blocks per coalesced request")
+    ap.add_argument("--on-conflict", dest="on_conflict", choices=("rebase", "fail"), default="rebase",
+                    help="On 412: retry on the server's currentCid, or give up on the post")
+    ap.add_argument("--max-retries", dest="max_retries", type=int, default=3, help="Rebase retries per request")
+    ap.add_argument("--rebase-index", dest="rebase_index", action="store_true",
+                    help="Also rebase index inserts (positions may shift under concurrent edits)")
+    ap.add_argument("--dry-run", dest="dry_run", action="store_true", help="Print the coalesced plan and exit")
+    ap.add_argument("--json", help="Write a per-post report JSON here")
+    args = ap.parse_args()
+
+    try:
+        edits = load_edits(args.edits)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        return 2
+    plan = coalesce(edits, max(1, args.max_blocks))
+    n_requests = sum(len(b) for _, _, b in plan)
+    print(f"Edits: {len(edits)} inserts into {len(plan)} posts -> {n_requests} requests "
+          f"({len(edits) - n_requests} saved by coalescing)")
+    if args.dry_run:
+        for rid, ifm, batches in plan:
+            steps = ", ".join(f"{b['insert']}{'@' + str(b['index']) if b['insert'] == 'index' else ''}"
+                              f"x{len(b['blocks'])}" for b in batches)
+            print(f"  {rid}{' (if-match ' + ifm + ')' if ifm else ''}: {steps}")
+        return 0
+
+    pool = HttpPool()
+    client = DualNativeClient(args.base, args.user, args.app_pass, pool=pool, cache_bytes=0)
+    started = time.perf_counter()
+
+    base_cids = {}
+    if args.base_cid == "catalog":
+        try:
+            base_cids = catalog_cids(client, [rid for rid, ifm, _ in plan if not ifm], args.status, args.types)
+        except DualNativeError as e:
+            print(f"ERROR: Catalog fetch failed ({e}); use --base-cid read")
+            pool.close()
+            return 1
+
+    engine = Engine(pool.fetch, args.concurrency, adaptive=args.rate == "adaptive", max_retries=args.throttle_retries)
+    latencies = []
+    results = []
+
+    async def write_post(idx, job):
+        rid, ifm, batches = job
+        url = client.url("mr", rid)
+        res = {"rid": rid, "edits": sum(b["edits"] for b in batches), "requests": 0, "write_requests": 0,
+               "write_errors": 0, "conflicts": 0, "rebased": 0, "applied_edits": 0, "status": "ok", "error": None, "inserted_at": [],
+               "base_cid": None, "final_cid": None}
+        cid = ifm or base_cids.get(rid)
+        if not cid and args.base_cid != "none":
+            res["requests"] += 1
+            try:
+                cid = (await engine.run(url, lambda: client.fetch("mr", rid), "read")).etag
+            except DualNativeError as e:
+                res.update(status="error", error=f"base read failed with HTTP {e.status}")
+                return res
+        res["base_cid"] = cid
+        for batch in batches:
+            retries = 0
+            while True:
+                res["requests"] += 1
+                res["write_requests"] += 1
+                try:
+                    w = await engine.run(url, lambda b=batch, c=cid: client.write_blocks(
+                        rid, b["blocks"], b["insert"], b["index"], if_match=c), "write", idempotent=False)
+                except PreconditionFailed as e:
+                    res["conflicts"] += 1
+                    can_rebase = args.on_conflict == "rebase" and (batch["insert"] != "index" or args.rebase_index)
+                    if can_rebase and e.current_cid and retries < args.max_retries:
+                        retries += 1
+                        res["rebased"] += 1
+                        cid = e.current_cid
+                        continue
+                    res.update(status="conflict", error=f"412: post is at {e.current_cid}, expected {cid}")
+                    return res
+                except DualNativeError as e:
+                    res["write_errors"] += 1
+                    res.update(status="error", error=str(e))
+                    return res
+                break
+            latencies.append(w.elapsed_ms)
+            # Chain: the response ETag is the If-Match of the next write
+            cid = w.cid
+            res["final_cid"] = cid
+            res["applied_edits"] += batch["edits"]
+            res["inserted_at"].append(w.inserted_at)
+        return res
+
+    try:
+        results = asyncio.run(run_pipeline(plan, write_post, args.concurrency))
+    finally:
+        engine.close()
+    elapsed = time.perf_counter() - started
+
+    failed = [r for r in results if r["status"] != "ok"]
+    for r in failed:
+        print(f"  FAIL {r['rid']}: {r['error']} ({r['applied_edits']}/{r['edits']} edits applied)")
+    pool_stats = pool.stats()
+    pool.close()
+    summary = {
+        "site": args.base,
+        "posts": len(results),
+        "posts_failed": len(failed),
+        "edits": len(edits),
+        "edits_applied": sum(r["applied_edits"] for r in results),
+        # Every write sent, including ones answered 412 or with an error
+        "write_requests": sum(r["write_requests"] for r in results),
+        "write_errors": sum(r["write_errors"] for r in results),
+        "coalesced_requests_saved": len(edits) - n_requests,
+        "conflicts_412": sum(r["conflicts"] for r in results),
+        "rebased": sum(r["rebased"] for r in results),
+        "requests_total": pool_stats["requests"],
+        "elapsed_s": round(elapsed, 3),
+        "edits_per_s": round(sum(r["applied_edits"] for r in results) / elapsed, 2) if elapsed > 0 else 0.0,
+        "write_ms": describe(latencies, (50, 90, 99), n_boot=500),
+    }
+    rate_stats = engine.rate_stats()
+    print(format_pool_stats(pool_stats))
+    print(format_rate_stats(rate_stats))
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as jf:
+            json.dump({"summary": summary, "posts": results, "http_pool": pool_stats, "rate_control": rate_stats},
+                      jf, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
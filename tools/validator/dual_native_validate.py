@@ -11,42 +11,72 @@ Usage:
     --post 956 \
     --user USERNAME \
     --app-pass APPLICATION_PASSWORD \
-    [--exclude modified,published,status]
+    [--exclude cid,links,modified]
+
+  # Validate a list / range of posts, or every post in the catalog
+  python tools/validator/dual_native_validate.py \
+    --base https://example.com --posts 12,40-60 | --all \
+    --user USERNAME --app-pass APPLICATION_PASSWORD \
+    [--status any] [--concurrency 8] [--workers 4] [--limit 0] \
+    [--checks mr,mr_304,cid] [--json report.json] [--junit report.xml]
+
+Checks, per post:
+  mr            MR is 200 JSON with rid/title/status/blocks/word_count and a sha256- CID
+  mr_digest     MR Content-Digest matches the body (warn when absent)
+  etag_cid      MR ETag equals its CID
+  cid           CID recomputed locally (dni_cid.py) equals the server's
+                (fails in batch runs; warns with a single --post, as it always did)
+  catalog_cid   catalog entry's CID equals the MR's (--all only; warn)
+  mr_304        If-None-Match with the CID returns 304
+  md            Markdown is 200 text/markdown with a matching Content-Digest
+  md_304        If-None-Match with the Markdown ETag returns 304
+  public_mr, public_md  public routes answer 200 (--public; warn otherwise)
+plus one site-level check that /catalog answers with JSON.
 
 Notes:
-  - Requires 'requests' (pip install requests)
+  - Stdlib only; requests share one keep-alive pool (dni_http.py).
   - Does not modify content.
-  - For published posts, you may also test public routes with --public.
+  - Posts are validated concurrently, and the checks of one post overlap
+    (MR and Markdown in parallel, probes while the CID is recomputed in a
+    process pool from PROCESS_POOL_MIN_POSTS posts up, on a thread below
+    that). A failing post or check never stops the run.
+  - Results are per post and per check, with the time each one took;
+    --json and --junit write them for pipelines. Exit status is 1 if any
+    check failed.
+  - Memory stays flat on large catalogs: each post's result is spooled to a
+    temporary file as it completes, and only per-check counters and latency
+    histograms stay in memory. The reports read the spool back in rid order.
 """
 
 import argparse
+import asyncio
 import base64
-import hashlib
+import itertools
 import json
+import os
 import sys
-from typing import Any, Dict, List
-
-try:
-    import requests  # type: ignore
-except Exception as e:
-    print("ERROR: Missing dependency 'requests'. Install with: pip install requests", file=sys.stderr)
-    sys.exit(2)
+import tempfile
+import textwrap
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List
+from xml.sax.saxutils import quoteattr
 
+from dni_cid import DEFAULT_EXCLUDE, recompute_from_json
+from dni_engine import Engine, format_rate_stats, iterate_in_thread, run_pipeline
+from dni_http import HttpPool, format_pool_stats
+from dni_jsonstream import CatalogStreamError, open_catalog
+from dni_stats import Histogram
 
-def canonicalize(obj: Any) -> Any:
-    if isinstance(obj, dict):
-        return {k: canonicalize(obj[k]) for k in sorted(obj.keys())}
-    if isinstance(obj, list):
-        return [canonicalize(v) for v in obj]
-    return obj
-
-
-def compute_cid(mr: Dict[str, Any], exclude: List[str]) -> str:
-    clean = {k: v for k, v in mr.items() if k not in set(exclude)}
-    canon = canonicalize(clean)
-    data = json.dumps(canon, ensure_ascii=False, separators=(",", ":"))
-    h = hashlib.sha256(data.encode("utf-8")).hexdigest()
-    return f"sha256-{h}"
+CHECKS = ("mr", "mr_digest", "etag_cid", "cid", "catalog_cid", "mr_304", "md", "md_304", "public_mr", "public_md")
+MR_KEYS = ("rid", "title", "status", "blocks", "word_count", "cid")
+# Worst status wins when a post's checks are combined
+SEVERITY = {"pass": 0, "skip": 0, "warn": 1, "fail": 2}
+# Fewer posts than this hash their CIDs in-process: starting worker
+# processes costs more than the hashing it would offload
+PROCESS_POOL_MIN_POSTS = 64
 
 
 def b64_basic(user: str, pw: str) -> str:
@@ -54,120 +84,443 @@ def b64_basic(user: str, pw: str) -> str:
     return base64.b64encode(raw).decode("ascii")
 
 
+def parse_post_list(spec: str) -> List[int]:
+    """"12,40-60" -> [12, 40, 41, ..., 60] (order kept, duplicates dropped); raises ValueError."""
+    out = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, sep, hi = part.partition("-")
+        if sep:
+            a, b = int(lo), int(hi)
+            if b < a:
+                raise ValueError(f"empty range {part}")
+            out.extend(range(a, b + 1))
+        else:
+            out.append(int(part))
+    return list(dict.fromkeys(out))
+
+
+def check(name: str, status: str, ms: float = 0.0, message: str = "") -> Dict:
+    return {"name": name, "status": status, "ms": round(ms, 2), "message": message}
+
+
+def digest_check(name: str, res) -> Dict:
+    """Content-Digest verdict HttpPool computed while reading the body."""
+    if res.digest_ok is None:
+        return check(name, "warn", res[3], "no verifiable Content-Digest")
+    if not res.digest_ok:
+        return check(name, "fail", res[3], f"Content-Digest does not match the body ({res[1].get('content-digest')})")
+    return check(name, "pass", res[3], "Content-Digest matches the body")
+
+
+class ResultSpool:
+    """Per-post results in a temporary JSONL file, read back in rid order.
+
+    Only (rid, offset) pairs stay in memory, so a 100k-post run holds about
+    1.6 MB of index instead of every result.
+    """
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.rids = array("q")
+        self.offsets = array("q")
+
+    def add(self, result: Dict):
+        self.offsets.append(self.file.seek(0, os.SEEK_END))
+        self.rids.append(int(result["rid"]))
+        self.file.write(json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+
+    def __len__(self):
+        return len(self.rids)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in sorted(range(len(self.rids)), key=self.rids.__getitem__):
+            self.file.seek(self.offsets[i])
+            yield json.loads(self.file.readline())
+
+    def close(self):
+        self.file.close()
+
+
+class Tally:
+    """Post counts by status, plus per-check status counts and a latency histogram."""
+
+    def __init__(self):
+        self.posts = 0
+        self.status = {"pass": 0, "warn": 0, "fail": 0}
+        self.checks = {}
+
+    def add(self, result: Dict):
+        self.posts += 1
+        self.status[result["status"]] += 1
+        for c in result["checks"]:
+            pc = self.checks.get(c["name"])
+            if pc is None:
+                pc = self.checks[c["name"]] = {"pass": 0, "warn": 0, "fail": 0, "skip": 0, "_hist": Histogram()}
+            pc[c["status"]] += 1
+            if c["status"] != "skip":
+                pc["_hist"].record(c["ms"])
+
+
+def hist_summary(h: Histogram) -> Dict:
+    """count/mean/min/max and p50/p90/p99 (ms) of a histogram, keyed like describe()."""
+    if not h.total:
+        return {"count": 0}
+    out = {"count": h.total, "mean": round(h.mean(), 3),
+           "min": round(h.min_us / 1000.0, 3), "max": round(h.max_us / 1000.0, 3)}
+    for p in (50, 90, 99):
+        out[f"p{p}"] = round(h.percentile(p), 3)
+    return out
+
+
+class Validator:
+    """Runs the per-post checks over one pool/engine; tallies results and spools them for the reports."""
+
+    def __init__(self, args, base: str, pool: HttpPool, headers: Dict[str, str], exclude_keys, n_posts: int = 0):
+        self.args = args
+        self.base = base
+        self.pool = pool
+        self.headers = headers
+        self.exclude_keys = exclude_keys
+        self.checks = set(CHECKS if args.checks == "all" else [c.strip() for c in args.checks.split(",") if c.strip()])
+        if not args.public:
+            self.checks -= {"public_mr", "public_md"}
+        self.engine = Engine(pool.fetch, args.concurrency, adaptive=args.rate == "adaptive",
+                             max_retries=args.throttle_retries)
+        use_procs = "cid" in self.checks and n_posts >= PROCESS_POOL_MIN_POSTS
+        # None runs the recompute on the event loop's default thread pool
+        self.procs = ProcessPoolExecutor(max_workers=args.workers) if use_procs else None
+        # A single --post keeps the original tool's verdict: a local CID mismatch
+        # may only mean the site excludes more keys, so it warns
+        self.cid_mismatch = "warn" if args.post else "fail"
+        self.tally = Tally()
+        self.spool = ResultSpool() if args.json or args.junit else None
+        self.verbose = False
+
+    def close(self):
+        self.engine.close()
+        if self.procs:
+            self.procs.shutdown()
+            self.procs = None
+
+    def _fetch(self, path: str, endpoint: str, extra: Dict[str, str] = None, auth: bool = True):
+        h = dict(self.headers) if auth else {"Accept": self.headers["Accept"]}
+        if extra:
+            h.update(extra)
+        return self.engine.fetch(f"{self.base}{path}", h, endpoint)
+
+    async def validate_post(self, idx: int, item: Dict):
+        rid = item.get("rid")
+        if not rid:
+            return None
+        want = self.checks
+        out = []
+        mr_path = f"/wp-json/dual-native/v1/posts/{rid}"
+        started = time.perf_counter()
+        md_task = asyncio.ensure_future(self._fetch(mr_path + "/md", "md")) if want & {"md", "md_304"} else None
+        res = await self._fetch(mr_path, "mr")
+        st, h_mr, body, mr_ms = res
+
+        mr = None
+        if st != 200:
+            out.append(check("mr", "fail", mr_ms, f"HTTP {st}, expected 200"))
+        else:
+            try:
+                mr = json.loads(body.decode("utf-8"))
+                if not isinstance(mr, dict):
+                    raise ValueError("not an object")
+            except ValueError as e:
+                mr = None
+                out.append(check("mr", "fail", mr_ms, f"MR response not JSON: {e}"))
+        cid = ""
+        if mr is not None:
+            missing = [k for k in MR_KEYS if k not in mr]
+            cid = str(mr.get("cid") or "")
+            if missing:
+                out.append(check("mr", "fail", mr_ms, f"missing MR keys: {', '.join(missing)}"))
+            elif not cid.startswith("sha256-"):
+                out.append(check("mr", "fail", mr_ms, f"CID format invalid: {cid!r}"))
+            elif not mr.get("blocks"):
+                out.append(check("mr", "warn", mr_ms, "MR blocks[] is empty"))
+            else:
+                out.append(check("mr", "pass", mr_ms, f"{len(body)} bytes, {len(mr['blocks'])} blocks"))
+
+        etag = h_mr.get("etag", "").strip().strip('"')
+        dependent = ("mr_digest", "etag_cid", "cid", "mr_304") + (("catalog_cid",) if item.get("cid") else ())
+        if mr is None:
+            out.extend(check(name, "skip", message="MR unavailable") for name in dependent if name in want)
+        else:
+            if "mr_digest" in want:
+                out.append(digest_check("mr_digest", res))
+            if "etag_cid" in want:
+                out.append(check("etag_cid", "pass" if etag == cid else "fail", 0.0,
+                                 "ETag equals CID" if etag == cid else f"ETag {etag or '(none)'} vs CID {cid}"))
+            if "catalog_cid" in want and item.get("cid"):
+                same = item["cid"] == cid
+                out.append(check("catalog_cid", "pass" if same else "warn", 0.0,
+                                 "catalog CID is current" if same else f"catalog {item['cid']} vs MR {cid}"))
+            # The probe goes out while the worker process hashes the body
+            probe = asyncio.ensure_future(self._fetch(mr_path, "probe", {"If-None-Match": f'"{cid}"'})) \
+                if "mr_304" in want else None
+            if "cid" in want:
+                t0 = time.perf_counter()
+                loop = asyncio.get_running_loop()
+                try:
+                    declared, local = await loop.run_in_executor(self.procs, recompute_from_json, body, self.exclude_keys)
+                    ms = (time.perf_counter() - t0) * 1000
+                    if local == declared:
+                        out.append(check("cid", "pass", ms, "CID recompute matches"))
+                    else:
+                        out.append(check("cid", self.cid_mismatch, ms, f"server {declared} vs local {local}; if the "
+                                         "site excludes more keys via dni_cid_exclude_keys, pass --exclude to match"))
+                except ValueError as e:
+                    out.append(check("cid", self.cid_mismatch, (time.perf_counter() - t0) * 1000, f"recompute error: {e}"))
+            if probe is not None:
+                st_p, _, _, ms = await probe
+                out.append(check("mr_304", "pass" if st_p == 304 else "fail", ms,
+                                 f"HTTP {st_p}" + ("" if st_p == 304 else ", expected 304 for a matching If-None-Match")))
+
+        if md_task is not None:
+            res_md = await md_task
+            st_md, h_md, _, md_ms = res_md
+            etag_md = h_md.get("etag", "").strip().strip('"')
+            if "md" in want:
+                ctype = h_md.get("content-type", "")
+                if st_md != 200:
+                    out.append(check("md", "fail", md_ms, f"HTTP {st_md}, expected 200"))
+                elif res_md.digest_ok is False:
+                    out.append(digest_check("md", res_md))
+                elif "text/markdown" not in ctype:
+                    out.append(check("md", "warn", md_ms, f"Content-Type not text/markdown (got {ctype})"))
+                elif res_md.digest_ok is None:
+                    out.append(check("md", "warn", md_ms, "no verifiable Content-Digest"))
+                else:
+                    out.append(check("md", "pass", md_ms, "text/markdown, Content-Digest matches"))
+            if "md_304" in want:
+                if st_md != 200 or not etag_md:
+                    out.append(check("md_304", "skip", message="no Markdown ETag to revalidate"))
+                else:
+                    st_p, _, _, ms = await self._fetch(mr_path + "/md", "probe", {"If-None-Match": f'"{etag_md}"'})
+                    out.append(check("md_304", "pass" if st_p == 304 else "fail", ms,
+                                     f"HTTP {st_p}" + ("" if st_p == 304 else ", expected 304 for Markdown")))
+
+        for name, path in (("public_mr", f"/wp-json/dual-native/v1/public/posts/{rid}"),
+                           ("public_md", f"/wp-json/dual-native/v1/public/posts/{rid}/md")):
+            if name in want:
+                st_p, _, _, ms = await self._fetch(path, "public", auth=False)
+                out.append(check(name, "pass" if st_p == 200 else "warn", ms,
+                                 f"HTTP {st_p}" + ("" if st_p == 200 else " (expected for unpublished posts)")))
+
+        status = max((c["status"] for c in out), key=SEVERITY.get, default="pass")
+        result = {"rid": rid, "status": status, "ms": round((time.perf_counter() - started) * 1000, 2), "checks": out}
+        self.tally.add(result)
+        if self.spool is not None:
+            self.spool.add(result)
+        self._report(result)
+        return None
+
+    def _report(self, result: Dict):
+        for c in result["checks"]:
+            if self.verbose or c["status"] in ("fail", "warn"):
+                label = {"pass": "OK", "skip": "SKIP"}.get(c["status"], c["status"].upper())
+                print(f"  {label}: post {result['rid']}: {c['name']}: {c['message']} ({c['ms']:.1f} ms)")
+        n = self.tally.posts
+        if n % 500 == 0:
+            print(f"  ... {n} posts validated")
+
+
+def catalog_check(base: str, pool: HttpPool, headers: Dict[str, str]) -> Dict:
+    st, _, body, ms = pool.fetch(f"{base}/wp-json/dual-native/v1/catalog", headers, 20)
+    if st != 200:
+        return check("catalog", "warn", ms, f"HTTP {st}; catalog not accessible (auth?)")
+    try:
+        return check("catalog", "pass", ms, f"count={int(json.loads(body.decode('utf-8')).get('count', 0))}")
+    except (ValueError, AttributeError):
+        return check("catalog", "warn", ms, "catalog not JSON")
+
+
+def summarize(base: str, tally: Tally, site_checks: List[Dict], elapsed: float) -> Dict:
+    checks = {}
+    for name in CHECKS:
+        if name in tally.checks:
+            pc = dict(tally.checks[name])
+            pc["ms"] = hist_summary(pc.pop("_hist"))
+            checks[name] = pc
+    counts, posts = tally.status, tally.posts
+    return {
+        "site": base,
+        "posts": posts,
+        "passed": counts["pass"],
+        "warned": counts["warn"],
+        "failed": counts["fail"],
+        "pass_rate_pct": round((counts["pass"] + counts["warn"]) / posts * 100.0, 2) if posts else 0.0,
+        "site_checks": site_checks,
+        "checks": checks,
+        "elapsed_s": round(elapsed, 3),
+        "posts_per_s": round(posts / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def write_json(path: str, report: Dict, results: ResultSpool):
+    """json.dump(dict(report, results=[...]), indent=2), streaming the results from the spool."""
+    head = json.dumps(report, ensure_ascii=False, indent=2)
+    with open(path, "w", encoding="utf-8") as jf:
+        jf.write(head[:-2] + ',\n  "results": [')
+        n = 0
+        for n, r in enumerate(results, 1):
+            jf.write(("," if n > 1 else "") + "\n" + textwrap.indent(json.dumps(r, ensure_ascii=False, indent=2), "    "))
+        jf.write("\n  ]\n}" if n else "]\n}")
+
+
+def junit_case(cls: str, c: Dict) -> str:
+    tc = ET.Element("testcase", {"classname": cls, "name": c["name"], "time": f"{c['ms'] / 1000:.4f}"})
+    if c["status"] == "fail":
+        ET.SubElement(tc, "failure", {"message": c["message"]}).text = c["message"]
+    elif c["status"] == "skip":
+        ET.SubElement(tc, "skipped", {"message": c["message"]})
+    elif c["status"] == "warn":
+        ET.SubElement(tc, "system-out").text = f"WARN: {c['message']}"
+    return ET.tostring(tc, encoding="unicode")
+
+
+def write_junit(path: str, summary: Dict, results: ResultSpool):
+    """One testcase per (post, check); warnings pass with the message in system-out.
+
+    The suite totals come from the summary, so the cases stream from the spool.
+    """
+    site = summary["site_checks"]
+    per_check = summary["checks"].values()
+    attrs = {
+        "name": f"dual-native {summary['site']}",
+        "tests": len(site) + sum(pc["pass"] + pc["warn"] + pc["fail"] + pc["skip"] for pc in per_check),
+        "failures": sum(1 for c in site if c["status"] == "fail") + sum(pc["fail"] for pc in per_check),
+        "skipped": sum(1 for c in site if c["status"] == "skip") + sum(pc["skip"] for pc in per_check),
+        "errors": 0,
+        "time": f"{summary['elapsed_s']:.3f}",
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n<testsuite "
+                + " ".join(f"{k}={quoteattr(str(v))}" for k, v in attrs.items()) + ">")
+        for c in site:
+            f.write(junit_case("site", c))
+        for r in results:
+            for c in r["checks"]:
+                f.write(junit_case(f"post.{r['rid']}", c))
+        f.write("</testsuite>")
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--base", required=True, help="Site base URL e.g., https://yoursite")
-    ap.add_argument("--post", type=int, required=True, help="Post ID to validate")
+    target = ap.add_mutually_exclusive_group(required=True)
+    target.add_argument("--post", type=int, help="Post ID to validate")
+    target.add_argument("--posts", help="Post IDs and ranges to validate, e.g. 12,40-60")
+    target.add_argument("--all", action="store_true", help="Validate every post in the catalog")
     ap.add_argument("--user", help="WP username (for Application Password auth)")
     ap.add_argument("--app-pass", dest="app_pass", help="WP Application Password")
-    ap.add_argument("--exclude", default="cid", help="Comma list of MR keys to exclude in CID check (default: cid)")
+    ap.add_argument("--exclude", default=",".join(DEFAULT_EXCLUDE), help="Comma list of MR keys to exclude in CID check (default: cid,links as the plugin)")
     ap.add_argument("--public", action="store_true", help="Also validate public read-only routes (published posts)")
+    ap.add_argument("--checks", default="all", help=f"Comma list of checks to run (default: all): {', '.join(CHECKS)}")
+    ap.add_argument("--status", default="any", help="--all: catalog status filter (publish, draft, any)")
+    ap.add_argument("--limit", type=int, default=0, help="--all: max posts to validate (0 = all)")
+    ap.add_argument("--concurrency", type=int, default=8, help="Max in-flight requests")
+    ap.add_argument("--rate", default="adaptive", choices=("adaptive", "fixed"), help="adaptive: find the concurrency the site sustains, up to --concurrency; fixed: always --concurrency")
+    ap.add_argument("--throttle-retries", dest="throttle_retries", type=int, default=3, help="Retries of a request throttled with 429/503 (after Retry-After)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="CID recompute processes")
+    ap.add_argument("--json", help="Write per-post, per-check results as JSON here")
+    ap.add_argument("--junit", help="Write JUnit XML here (one testcase per post and check)")
     args = ap.parse_args()
 
+    unknown = [c for c in args.checks.split(",") if args.checks != "all" and c.strip() and c.strip() not in CHECKS]
+    if unknown:
+        print(f"ERROR: Unknown check(s): {', '.join(unknown)} (known: {', '.join(CHECKS)})")
+        return 2
+    try:
+        rids = [args.post] if args.post else (parse_post_list(args.posts) if args.posts else None)
+    except ValueError as e:
+        print(f"ERROR: Invalid --posts: {e}")
+        return 2
+
     base = args.base.rstrip("/")
-    pid = args.post
     exclude_keys = [k.strip() for k in args.exclude.split(",") if k.strip()]
-    sess = requests.Session()
+    pool = HttpPool()
     headers = {"Accept": "application/json"}
     if args.user and args.app_pass:
         headers["Authorization"] = f"Basic {b64_basic(args.user, args.app_pass)}"
 
-    def get(path: str, extra_headers: Dict[str, str] = None):
-        h = dict(headers)
-        if extra_headers:
-            h.update(extra_headers)
-        url = f"{base}{path}"
-        return sess.get(url, headers=h, timeout=20)
-
-    ok = True
-    print(f"\n== MR JSON (/dual-native/v1/posts/{pid}) ==")
-    r = get(f"/wp-json/dual-native/v1/posts/{pid}")
-    print(f"HTTP {r.status_code}")
-    if r.status_code != 200:
-        print("FAIL: Expected 200 for MR JSON")
-        sys.exit(1)
-    etag = (r.headers.get("ETag") or r.headers.get("Etag") or "").strip().strip('"')
-    try:
-        mr = r.json()
-    except Exception:
-        print("FAIL: MR response not JSON")
-        sys.exit(1)
-    for key in ["rid","title","status","blocks","word_count","cid"]:
-        if key not in mr:
-            print(f"FAIL: Missing MR key: {key}")
-            ok = False
-    if not mr.get("blocks"):
-        print("WARN: MR blocks[] is empty")
-    cid = mr.get("cid","")
-    if not cid.startswith("sha256-"):
-        print("FAIL: CID format invalid")
-        ok = False
-    if etag and etag != cid:
-        print(f"FAIL: ETag != CID ({etag} vs {cid})")
-        ok = False
-    # CID recompute
-    try:
-        recomputed = compute_cid({k:v for k,v in mr.items()}, exclude_keys)
-        if recomputed != cid:
-            print(f"WARN: Local CID recompute mismatch (server {cid} vs local {recomputed}).\n      If you exclude additional keys server-side via dni_cid_exclude_keys, pass --exclude to match.")
-        else:
-            print("OK: CID recompute matches")
-    except Exception as e:
-        print(f"WARN: CID recompute error: {e}")
-
-    # Zero-fetch check
-    print("\n-- Zero-fetch with If-None-Match --")
-    r2 = get(f"/wp-json/dual-native/v1/posts/{pid}", {"If-None-Match": f'"{cid}"'})
-    print(f"HTTP {r2.status_code} (expected 304)")
-    if r2.status_code != 304:
-        print("FAIL: Expected 304 when ETag matches")
-        ok = False
-
-    # Markdown MR
-    print(f"\n== Markdown MR (/dual-native/v1/posts/{pid}/md) ==")
-    rmd = get(f"/wp-json/dual-native/v1/posts/{pid}/md")
-    print(f"HTTP {rmd.status_code}")
-    if rmd.status_code != 200:
-        print("FAIL: Expected 200 for Markdown MR")
-        ok = False
-    ctype = rmd.headers.get("Content-Type","")
-    if "text/markdown" not in ctype:
-        print(f"WARN: Content-Type not text/markdown (got {ctype})")
-    etag_md = (rmd.headers.get("ETag") or rmd.headers.get("Etag") or "").strip().strip('"')
-    # Zero-fetch for MD
-    rmd2 = get(f"/wp-json/dual-native/v1/posts/{pid}/md", {"If-None-Match": f'"{etag_md}"'})
-    print(f"HTTP {rmd2.status_code} (expected 304 for Markdown)")
-    if rmd2.status_code != 304:
-        print("FAIL: Expected 304 for Markdown when ETag matches")
-        ok = False
-
-    # Catalog
-    print("\n== Catalog (/dual-native/v1/catalog) ==")
-    rc = get("/wp-json/dual-native/v1/catalog")
-    print(f"HTTP {rc.status_code}")
-    if rc.status_code == 200:
-        try:
-            data = rc.json()
-            cnt = int(data.get("count", 0))
-            print(f"OK: Catalog count={cnt}")
-        except Exception:
-            print("WARN: Catalog not JSON")
+    started = time.perf_counter()
+    site_checks = []
+    stream = None
+    if rids is not None:
+        site_checks.append(catalog_check(base, pool, headers))
+        items = [{"rid": rid} for rid in rids]
+        n = len(items)
+        print(f"\n== Validating {n} post{'s' if n != 1 else ''} ==")
     else:
-        print("WARN: Catalog not accessible (auth?)")
+        st, stream = open_catalog(pool, f"{base}/wp-json/dual-native/v1/catalog?status={args.status}", headers)
+        try:
+            if st != 200:
+                raise CatalogStreamError(f"HTTP {st}")
+            total = int(stream.read_header().get("count") or 0)
+        except CatalogStreamError as e:
+            print(f"FAIL: Catalog fetch failed: {e}")
+            if stream is not None:
+                stream.close()
+            pool.close()
+            return 1
+        n = min(total, args.limit) if args.limit > 0 else total
+        print(f"\n== Validating {n} of {total} catalog posts ==")
+        sample = itertools.islice(stream, args.limit) if args.limit > 0 else stream
+        items = iterate_in_thread(sample)
+    validator = Validator(args, base, pool, headers, exclude_keys, n)
+    validator.verbose = bool(args.post)
 
-    # Public routes
-    if args.public:
-        print("\n== Public MR routes (no auth) ==")
-        rpub = requests.get(f"{base}/wp-json/dual-native/v1/public/posts/{pid}", timeout=20)
-        print(f"HTTP {rpub.status_code} (MR public)")
-        rpubmd = requests.get(f"{base}/wp-json/dual-native/v1/public/posts/{pid}/md", timeout=20)
-        print(f"HTTP {rpubmd.status_code} (MD public)")
+    async def run():
+        await run_pipeline(items, validator.validate_post, args.concurrency)
 
+    try:
+        asyncio.run(run())
+        if stream is not None:
+            site_checks.append(check("catalog", "pass", (time.perf_counter() - started) * 1000,
+                                     f"count={stream.meta.get('count')}, streamed"))
+    except CatalogStreamError as e:
+        # Posts read before the error keep their results
+        site_checks.append(check("catalog", "fail", (time.perf_counter() - started) * 1000, f"catalog not JSON: {e}"))
+    finally:
+        validator.close()
+        if stream is not None:
+            stream.close()
+    elapsed = time.perf_counter() - started
+
+    summary = summarize(base, validator.tally, site_checks, elapsed)
+    for c in site_checks:
+        print(f"  {'OK' if c['status'] == 'pass' else c['status'].upper()}: site: catalog: {c['message']}")
+    print(f"\n{'Check':<12} {'pass':>6} {'warn':>6} {'fail':>6} {'skip':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, pc in summary["checks"].items():
+        ms = pc["ms"]
+        print(f"{name:<12} {pc['pass']:>6} {pc['warn']:>6} {pc['fail']:>6} {pc['skip']:>6} "
+              f"{ms.get('p50', 0):>8.1f} {ms.get('p99', 0):>8.1f}")
+    print(f"\nValidated {summary['posts']} posts in {elapsed:.1f}s ({summary['posts_per_s']:.0f} posts/s): "
+          f"{summary['passed']} passed, {summary['warned']} with warnings, {summary['failed']} failed")
+    pool_stats = pool.stats()
+    rate_stats = validator.engine.rate_stats()
+    print("\n" + format_pool_stats(pool_stats))
+    print(format_rate_stats(rate_stats))
+    pool.close()
+
+    ok = summary["failed"] == 0 and not any(c["status"] == "fail" for c in site_checks)
+    if args.json:
+        write_json(args.json, dict(summary, http_pool=pool_stats, rate_control=rate_stats), validator.spool)
+    if args.junit:
+        write_junit(args.junit, summary, validator.spool)
+    if validator.spool is not None:
+        validator.spool.close()
     print("\nSummary:")
     print("PASS" if ok else "FAIL")
-    sys.exit(0 if ok else 1)
+    return 0 if ok else 1
 
 
 if __name__ == "__main__":
-    main()
-
+    sys.exit(main())
@@ -12,42 +12,28 @@ Usage:
     --app-pass "APPLICATION PASSWORD" \
     --limit 20 \
     --out results.csv \
-    --json summary.json
+    --json summary.json \
+    [--resume] [--checkpoint-every 50] \
+    [--record run.dnirec | --replay run.dnirec [--replay-timing original]]
+
+Rows are written to the CSV as posts complete and checkpointed; after a
+crash or Ctrl-C, rerun with the same arguments plus --resume to continue.
 """
 
 import argparse
+import asyncio
 import base64
-import csv
+import itertools
 import json
 import sys
-import time
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
-
+from urllib.parse import urlsplit
 
-def fetch(url, headers=None, timeout=20):
-    """Fetch URL and return (status, headers_dict, body_bytes, elapsed_ms)"""
-    req = Request(url)
-    if headers:
-        for k, v in headers.items():
-            req.add_header(k, v)
-
-    start = time.time()
-    try:
-        with urlopen(req, timeout=timeout) as resp:
-            status = resp.getcode()
-            body = resp.read()
-            elapsed = (time.time() - start) * 1000  # ms
-            hdrs = {k.lower(): v for k, v in resp.headers.items()}
-            return status, hdrs, body, elapsed
-    except HTTPError as e:
-        elapsed = (time.time() - start) * 1000
-        hdrs = {k.lower(): v for k, v in (e.headers.items() if e.headers else [])}
-        body = e.read() if hasattr(e, 'read') else b""
-        return e.code, hdrs, body, elapsed
-    except URLError as e:
-        elapsed = (time.time() - start) * 1000
-        return 0, {}, b"", elapsed
+from dni_engine import Engine, format_rate_stats, iterate_in_thread, run_pipeline
+from dni_http import ACCEPT_ENCODING, PHASES, digest_label, fmt_metric, format_pool_stats, phase_values, server_metrics
+from dni_jsonstream import CatalogStreamError, open_catalog
+from dni_replay import TIMINGS, format_archive_stats, make_pool
+from dni_report import ReportError, RunningStats, StreamingReport
+from dni_tokens import DEFAULT_CACHE, TokenCounter, content_key, format_token_stats, load_backend
 
 
 def b64_basic(user, pw):
@@ -76,98 +62,168 @@ def main():
     ap.add_argument("--limit", type=int, default=20, help="Max number of posts to test")
     ap.add_argument("--out", required=True, help="CSV output path")
     ap.add_argument("--json", required=True, help="Summary JSON output path")
-    ap.add_argument("--delay", type=float, default=0.5, help="Delay between requests (seconds)")
+    ap.add_argument("--concurrency", type=int, default=1, help="Max in-flight requests per host, and posts in flight (default: 1 = serial)")
+    ap.add_argument("--rate", default="adaptive", choices=("adaptive", "fixed"), help="adaptive: find the concurrency the site sustains, up to --concurrency; fixed: always --concurrency")
+    ap.add_argument("--throttle-retries", dest="throttle_retries", type=int, default=3, help="Retries of a request throttled with 429/503 (after Retry-After)")
+    ap.add_argument("--endpoint-concurrency", dest="endpoint_concurrency", type=int, default=None, help="Max in-flight requests per endpoint (MR/MD/HTML); default: --concurrency")
     ap.add_argument("--status", default="publish", help="Post status filter (publish, draft, any)")
+    ap.add_argument("--accept-encoding", dest="accept_encoding", default=ACCEPT_ENCODING,
+                    help=f"Accept-Encoding to negotiate (default: {ACCEPT_ENCODING}; 'identity' = uncompressed)")
+    ap.add_argument("--resume", action="store_true", help="Continue an interrupted run from <out>.ckpt, skipping posts already written")
+    ap.add_argument("--checkpoint-every", dest="checkpoint_every", type=int, default=50, help="Posts between CSV/journal checkpoints")
+    ap.add_argument("--tokenizer", default="auto", help="Token counter: auto, tiktoken[:ENC], hf:PATH, approx, bytes (see dni_tokens.py)")
+    ap.add_argument("--token-cache", dest="token_cache", default=DEFAULT_CACHE, help=f"SQLite cache of token counts by ETag/CID (default {DEFAULT_CACHE}; '' to disable)")
+    archive = ap.add_mutually_exclusive_group()
+    archive.add_argument("--record", help="Also write every HTTP exchange to this archive (see dni_replay.py)")
+    archive.add_argument("--replay", help="Answer every request from this archive instead of the network")
+    ap.add_argument("--replay-timing", dest="replay_timing", default="fast", choices=TIMINGS, help="fast: memory speed; original: recorded TTFB and download times")
     args = ap.parse_args()
 
+    try:
+        counter = TokenCounter(load_backend(args.tokenizer), args.token_cache or None)
+    except (ImportError, ValueError) as e:
+        print(f"ERROR: Tokenizer {args.tokenizer!r} unavailable: {e}")
+        sys.exit(1)
+    print(f"Tokenizer: {counter.backend.name}")
+
     base = args.base.rstrip("/")
+    site = urlsplit(base).netloc
+    # Per-post values stream into running accumulators; phase and server
+    # metrics keep their samples for percentiles
+    stats = RunningStats(keep=("phase.", "srv."))
+    report = StreamingReport(args.out, stats, resume=args.resume, checkpoint_every=args.checkpoint_every, fingerprint={
+        "tool": "measure_dni_savings", "base": base, "status": args.status, "limit": args.limit,
+        "accept_encoding": args.accept_encoding,
+    })
+    try:
+        resumed = report.open()
+    except (ReportError, OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    if resumed:
+        print(f"Resuming: {resumed} posts already in {args.out}")
     auth_header = f"Basic {b64_basic(args.user, args.app_pass)}"
     headers = {"Authorization": auth_header, "Accept": "application/json"}
+    # One keep-alive pool for every request, so timings exclude per-request handshakes
+    try:
+        pool = make_pool(args.record, args.replay, args.replay_timing, accept_encoding=args.accept_encoding)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
 
-    # Fetch catalog
+    # Stream the catalog: posts start as soon as their catalog entry arrives
     print(f"Fetching catalog from {base}/wp-json/dual-native/v1/catalog...")
     catalog_url = f"{base}/wp-json/dual-native/v1/catalog?status={args.status}"
-    st, hdrs, body, elapsed = fetch(catalog_url, headers)
+    st, stream = open_catalog(pool, catalog_url, headers)
 
     if st != 200:
         print(f"ERROR: Catalog fetch failed with HTTP {st}")
         sys.exit(1)
 
     try:
-        catalog = json.loads(body.decode("utf-8"))
-    except Exception as e:
+        meta = stream.read_header()
+    except CatalogStreamError as e:
         print(f"ERROR: Invalid catalog JSON: {e}")
         sys.exit(1)
 
-    items = catalog.get("items", [])
-    total = len(items)
+    # The plugin emits count before items, so the total is known up front
+    total = int(meta.get("count") or 0)
     print(f"Found {total} posts in catalog")
 
-    sample = items[:args.limit] if args.limit > 0 else items
-    print(f"Testing {len(sample)} posts...\n")
+    sample = itertools.islice(stream, args.limit) if args.limit > 0 else stream
+    n_sample = min(total, args.limit) if args.limit > 0 else total
+    # --limit picks the same catalog prefix on every attempt; finished posts are skipped
+    todo = (it for it in sample if it.get("rid") not in report.done)
+    print(f"Testing {n_sample - report.resumed} posts...\n")
 
-    rows = []
-    n_304 = 0
-    total_html_ms = 0
-    total_mr_ms = 0
-    total_md_ms = 0
+    engine = Engine(pool.fetch, args.concurrency, args.endpoint_concurrency, adaptive=args.rate == "adaptive",
+                    max_retries=args.throttle_retries)
 
-    for idx, item in enumerate(sample, 1):
+    async def measure_post(idx, item):
         rid = item.get("rid")
         cid = item.get("cid", "")
         title = item.get("title", "")
         status_val = item.get("status", "")
 
         if not rid:
-            continue
-
-        print(f"[{idx}/{len(sample)}] Post {rid}: {title[:50]}")
+            return None
 
         # Construct URLs
-        # For HTML, we need to fetch the actual permalink
-        # First get MR to find the human_url
+        # The catalog already carries the permalink ("hr"), so HTML can be
+        # fetched alongside MR/MD; fall back to MR links.human_url otherwise.
         mr_url = f"{base}/wp-json/dual-native/v1/posts/{rid}"
         md_url = f"{base}/wp-json/dual-native/v1/posts/{rid}/md"
-
-        # Fetch MR (JSON) - first time
-        st_mr, h_mr, b_mr, time_mr_initial = fetch(mr_url, headers)
+        hr_url = item.get("hr") or ""
+
+        # Fetch MR (JSON) first time, Markdown and (if known) HTML in parallel
+        # HTML is fetched without auth (published posts)
+        jobs = [
+            engine.fetch(mr_url, headers, "mr"),
+            engine.fetch(md_url, headers, "md"),
+        ]
+        if hr_url:
+            jobs.append(engine.fetch(hr_url, {}, "html"))
+        res = await asyncio.gather(*jobs)
+        st_mr, h_mr, b_mr, time_mr_initial = res[0]
+        st_md, h_md, b_md, time_md = res[1]
 
         if st_mr != 200:
-            print(f"  WARN: MR fetch failed with HTTP {st_mr}")
-            continue
+            print(f"[{idx}/{n_sample}] Post {rid}: WARN: MR fetch failed with HTTP {st_mr}")
+            return None
 
         # Parse MR to get human_url
         try:
             mr_data = json.loads(b_mr.decode("utf-8"))
             human_url = mr_data.get("links", {}).get("human_url", "")
         except Exception:
-            print(f"  WARN: Invalid MR JSON")
-            continue
+            print(f"[{idx}/{n_sample}] Post {rid}: WARN: Invalid MR JSON")
+            return None
 
         if not human_url:
-            print(f"  WARN: No human_url found")
-            continue
+            print(f"[{idx}/{n_sample}] Post {rid}: WARN: No human_url found")
+            return None
 
-        # Fetch HTML (no auth needed for published posts)
-        st_html, h_html, b_html, time_html = fetch(human_url, {})
-
-        # Fetch Markdown
-        st_md, h_md, b_md, time_md = fetch(md_url, headers)
+        # Permalink was not in the catalog: fetch HTML now, next to the 304 probe
+        late = []
+        if not hr_url:
+            late.append(engine.fetch(human_url, {}, "html"))
 
         # Test zero-fetch with If-None-Match
         got_304 = False
         etag = h_mr.get("etag", "").strip().strip('"')
         if etag:
-            st_cg, h_cg, b_cg, time_mr_304 = fetch(mr_url, {**headers, "If-None-Match": f'"{etag}"'})
+            late.append(engine.fetch(mr_url, {**headers, "If-None-Match": f'"{etag}"'}, "mr"))
+        res_late = list(await asyncio.gather(*late))
+        r_html = res[2] if hr_url else res_late.pop(0)
+        st_html, h_html, b_html, time_html = r_html
+        if etag:
+            st_cg, h_cg, b_cg, time_mr_304 = res_late.pop(0)
             if st_cg == 304:
                 got_304 = True
-                n_304 += 1
+
+        # Server-side profiler values (X-Bench-*, Server-Timing), when the site emits them
+        srv = {
+            "html": server_metrics(h_html) if st_html == 200 else {},
+            "mr": server_metrics(h_mr),
+            "md": server_metrics(h_md) if st_md == 200 else {},
+        }
+
+        # Connection phases (dns/connect/tls are 0 on a reused keep-alive connection)
+        ph = {"html": phase_values(r_html), "mr": phase_values(res[0]), "md": phase_values(res[1])}
 
         # Calculate sizes
         html_kb = kb(len(b_html)) if st_html == 200 else 0.0
         mr_kb = kb(len(b_mr)) if st_mr == 200 else 0.0
         md_kb = kb(len(b_md)) if st_md == 200 else 0.0
 
+        # Tokenize (or look up by ETag/CID) off the event loop
+        html_body, mr_body, md_body = (b if st == 200 else b"" for st, b in ((st_html, b_html), (st_mr, b_mr), (st_md, b_md)))
+        html_tokens, mr_tokens, md_tokens = await asyncio.get_running_loop().run_in_executor(None, counter.count_many, [
+            (content_key("html", html_body, h_html.get("etag", ""), urlsplit(hr_url or human_url).netloc), html_body),
+            (content_key("mr", mr_body, etag, site), mr_body),
+            (content_key("md", md_body, h_md.get("etag", "").strip('"'), site), md_body),
+        ])
+
         # Calculate tokens
         html_tokens_raw = estimate_tokens_raw(len(b_html)) if st_html == 200 else 0
         mr_tokens_raw = estimate_tokens_raw(len(b_mr)) if st_mr == 200 else 0
@@ -179,104 +235,156 @@ def main():
 
         # Calculate savings
         bandwidth_savings_pct = round(((html_kb - mr_kb) / html_kb * 100), 2) if html_kb > 0 else 0.0
-        token_savings_pct = round(((html_tokens_raw - mr_tokens_raw) / html_tokens_raw * 100), 2) if html_tokens_raw > 0 else 0.0
-
-        total_html_ms += time_html
-        total_mr_ms += time_mr_initial
-        total_md_ms += time_md
-
-        print(f"  HTML: {html_kb:.2f} KB ({time_html:.0f}ms) | MR: {mr_kb:.2f} KB ({time_mr_initial:.0f}ms) | MD: {md_kb:.2f} KB ({time_md:.0f}ms)")
-        print(f"  Savings: {bandwidth_savings_pct:.1f}% bandwidth, {token_savings_pct:.1f}% tokens | 304: {got_304}")
-
-        rows.append([
-            rid,
-            title,
-            status_val,
-            human_url,
-            mr_url,
-            f"{html_kb:.2f}",
-            f"{mr_kb:.2f}",
-            f"{md_kb:.2f}",
-            html_tokens_raw,
-            mr_tokens_raw,
-            md_tokens_raw,
-            html_tokens_policy,
-            mr_tokens_policy,
-            md_tokens_policy,
-            f"{bandwidth_savings_pct:.2f}",
-            f"{token_savings_pct:.2f}",
-            f"{time_html:.0f}",
-            f"{time_mr_initial:.0f}",
-            f"{time_md:.0f}",
-            cid,
-            str(got_304).lower(),
-        ])
 
-        time.sleep(args.delay)
-
-    # Write CSV
-    print(f"\nWriting results to {args.out}...")
-    with open(args.out, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow([
-            "rid",
-            "title",
-            "status",
-            "human_url",
-            "mr_url",
-            "html_kb",
-            "mr_kb",
-            "md_kb",
-            "html_tokens_raw",
-            "mr_tokens_raw",
-            "md_tokens_raw",
-            "html_tokens_policy",
-            "mr_tokens_policy",
-            "md_tokens_policy",
-            "bandwidth_savings_pct",
-            "token_savings_pct",
-            "time_html_ms",
-            "time_mr_ms",
-            "time_md_ms",
-            "cid",
-            "got_304",
-        ])
-        w.writerows(rows)
-
-    # Calculate summary statistics
-    def avg(vals):
-        vals = [v for v in vals if isinstance(v, (int, float))]
-        return round(sum(vals) / len(vals), 2) if vals else 0.0
-
-    html_kbs = [float(r[5]) for r in rows]
-    mr_kbs = [float(r[6]) for r in rows]
-    md_kbs = [float(r[7]) for r in rows]
-    html_tokens = [int(r[8]) for r in rows]
-    mr_tokens = [int(r[9]) for r in rows]
-    md_tokens = [int(r[10]) for r in rows]
-    bandwidth_savings = [float(r[14]) for r in rows]
-    token_savings = [float(r[15]) for r in rows]
-    html_times = [float(r[16]) for r in rows]
-    mr_times = [float(r[17]) for r in rows]
-    md_times = [float(r[18]) for r in rows]
-
-    total_tested = len(rows)
+        # Bytes on the wire (after Content-Encoding) and client-side decompression time
+        transfers = [r.transfer if r[0] == 200 else {} for r in (r_html, res[0], res[1])]
+        html_wire_kb, mr_wire_kb, md_wire_kb = (kb(t.get("wire_bytes", 0)) for t in transfers)
+        wire_savings_pct = round(((html_wire_kb - mr_wire_kb) / html_wire_kb * 100), 2) if html_wire_kb > 0 else 0.0
+        token_savings_pct = round(((html_tokens - mr_tokens) / html_tokens * 100), 2) if html_tokens > 0 else 0.0
+
+        # Content-Digest was checked while the bodies streamed in
+        mr_digest = digest_label(res[0].digest_ok)
+        md_digest = digest_label(res[1].digest_ok)
+        if "mismatch" in (mr_digest, md_digest):
+            print(f"[{idx}/{n_sample}] Post {rid}: WARN: Content-Digest mismatch (MR: {mr_digest}, MD: {md_digest})")
+
+        print(f"[{idx}/{n_sample}] Post {rid}: {title[:50]}\n"
+              f"  HTML: {html_kb:.2f} KB ({time_html:.0f}ms) | MR: {mr_kb:.2f} KB ({time_mr_initial:.0f}ms) | MD: {md_kb:.2f} KB ({time_md:.0f}ms)\n"
+              f"  Wire: HTML {html_wire_kb:.2f} KB | MR: {mr_wire_kb:.2f} KB | MD: {md_wire_kb:.2f} KB ({transfers[1].get('encoding', '-')})\n"
+              f"  Savings: {bandwidth_savings_pct:.1f}% bandwidth ({wire_savings_pct:.1f}% on the wire), {token_savings_pct:.1f}% tokens | 304: {got_304}")
+
+        row = {
+            "rid": rid,
+            "title": title,
+            "status": status_val,
+            "human_url": human_url,
+            "mr_url": mr_url,
+            "html_kb": f"{html_kb:.2f}",
+            "mr_kb": f"{mr_kb:.2f}",
+            "md_kb": f"{md_kb:.2f}",
+            "html_tokens_raw": html_tokens_raw,
+            "mr_tokens_raw": mr_tokens_raw,
+            "md_tokens_raw": md_tokens_raw,
+            "html_tokens_policy": html_tokens_policy,
+            "mr_tokens_policy": mr_tokens_policy,
+            "md_tokens_policy": md_tokens_policy,
+            "bandwidth_savings_pct": f"{bandwidth_savings_pct:.2f}",
+            "token_savings_pct": f"{token_savings_pct:.2f}",
+            "time_html_ms": f"{time_html:.0f}",
+            "time_mr_ms": f"{time_mr_initial:.0f}",
+            "time_md_ms": f"{time_md:.0f}",
+            "cid": cid,
+            "got_304": str(got_304).lower(),
+            "mr_digest": mr_digest,
+            "md_digest": md_digest,
+            "html_tokens": html_tokens,
+            "mr_tokens": mr_tokens,
+            "md_tokens": md_tokens,
+            "html_wire_kb": f"{html_wire_kb:.2f}",
+            "mr_wire_kb": f"{mr_wire_kb:.2f}",
+            "md_wire_kb": f"{md_wire_kb:.2f}",
+            "wire_savings_pct": f"{wire_savings_pct:.2f}",
+        }
+        kinds = ("html", "mr", "md")
+        row.update({f"{kind}_encoding": t.get("encoding", "") for kind, t in zip(kinds, transfers)})
+        row.update({f"{kind}_decode_ms": f"{t.get('decode_ms', 0.0):.3f}" for kind, t in zip(kinds, transfers)})
+        row.update({f"{kind}_{p}": fmt_metric(ph[kind].get(p)) for kind in kinds for p in PHASES})
+        row.update({f"{kind}_srv_{n}": fmt_metric(v) for kind in kinds for n, v in sorted(srv[kind].items())})
+
+        # Exact numbers behind the summary; journaled so --resume can replay them
+        values = {
+            "html_kb": html_kb, "mr_kb": mr_kb, "md_kb": md_kb,
+            "html_tokens_raw": html_tokens_raw, "mr_tokens_raw": mr_tokens_raw, "md_tokens_raw": md_tokens_raw,
+            "html_tokens": html_tokens, "mr_tokens": mr_tokens, "md_tokens": md_tokens,
+            "bandwidth_savings_pct": bandwidth_savings_pct, "token_savings_pct": token_savings_pct,
+            "html_wire_kb": html_wire_kb, "mr_wire_kb": mr_wire_kb, "md_wire_kb": md_wire_kb,
+            "wire_savings_pct": wire_savings_pct,
+            "time_html_ms": time_html, "time_mr_ms": time_mr_initial, "time_md_ms": time_md,
+            "got_304": int(got_304),
+            "digest_mismatch": (mr_digest == "mismatch") + (md_digest == "mismatch"),
+            "digest_missing": (mr_digest == "none") + (md_digest == "none"),
+        }
+        values.update({f"{kind}_decode_ms": t.get("decode_ms", 0.0) for kind, t in zip(kinds, transfers)})
+        values.update({f"phase.{kind}.{p}": v for kind in kinds for p, v in ph[kind].items()})
+        values.update({f"srv.{kind}.{n}": v for kind in kinds for n, v in srv[kind].items()})
+        report.write(rid, row, values)
+        return None
+
+    async def run():
+        return await run_pipeline(iterate_in_thread(todo), measure_post, args.concurrency)
+
+    try:
+        asyncio.run(run())
+    except CatalogStreamError as e:
+        print(f"ERROR: Invalid catalog JSON: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted after {report.rows} posts; rerun with --resume to continue")
+        sys.exit(130)
+    finally:
+        engine.close()
+        stream.close()
+        report.close()
+    catalog_stats = {
+        "items_read": stream.items_seen,
+        "first_item_ms": round(stream.first_item_ms or 0.0, 1),
+        "stream_ms": round(stream.response.elapsed_ms or 0.0, 1),
+    }
+    pool_stats = pool.stats()
+    archive_stats = pool.archive_stats() if args.record or args.replay else {}
+    pool.close()
+    rate_stats = engine.rate_stats()
+    token_stats = counter.stats()
+    counter.close()
+    print("\n" + format_pool_stats(pool_stats))
+    if archive_stats:
+        print(format_archive_stats(archive_stats))
+    print(format_rate_stats(rate_stats))
+    print(format_token_stats(token_stats))
+
+    print(f"\nWrote {report.rows} rows to {args.out}")
+
+    total_tested = report.rows
     summary = {
         "site": args.base,
         "count": total_tested,
-        "avg_html_kb": avg(html_kbs),
-        "avg_mr_kb": avg(mr_kbs),
-        "avg_md_kb": avg(md_kbs),
-        "avg_html_tokens_raw": avg(html_tokens),
-        "avg_mr_tokens_raw": avg(mr_tokens),
-        "avg_md_tokens_raw": avg(md_tokens),
-        "avg_bandwidth_savings_pct": avg(bandwidth_savings),
-        "avg_token_savings_pct": avg(token_savings),
-        "avg_time_html_ms": avg(html_times),
-        "avg_time_mr_ms": avg(mr_times),
-        "avg_time_md_ms": avg(md_times),
-        "zero_fetch_rate_pct": round((n_304 / total_tested) * 100.0, 2) if total_tested else 0.0,
-        "speedup_factor": round(avg(html_times) / avg(mr_times), 2) if avg(mr_times) > 0 else 0.0,
+        "avg_html_kb": stats.mean("html_kb"),
+        "avg_mr_kb": stats.mean("mr_kb"),
+        "avg_md_kb": stats.mean("md_kb"),
+        "avg_html_tokens_raw": stats.mean("html_tokens_raw"),
+        "avg_mr_tokens_raw": stats.mean("mr_tokens_raw"),
+        "avg_md_tokens_raw": stats.mean("md_tokens_raw"),
+        "avg_html_tokens": stats.mean("html_tokens"),
+        "avg_mr_tokens": stats.mean("mr_tokens"),
+        "avg_md_tokens": stats.mean("md_tokens"),
+        "avg_bandwidth_savings_pct": stats.mean("bandwidth_savings_pct"),
+        "avg_html_wire_kb": stats.mean("html_wire_kb"),
+        "avg_mr_wire_kb": stats.mean("mr_wire_kb"),
+        "avg_md_wire_kb": stats.mean("md_wire_kb"),
+        "avg_wire_savings_pct": stats.mean("wire_savings_pct"),
+        "avg_html_decode_ms": stats.mean("html_decode_ms"),
+        "avg_mr_decode_ms": stats.mean("mr_decode_ms"),
+        "avg_md_decode_ms": stats.mean("md_decode_ms"),
+        "accept_encoding": args.accept_encoding,
+        "avg_token_savings_pct": stats.mean("token_savings_pct"),
+        "avg_time_html_ms": stats.mean("time_html_ms"),
+        "avg_time_mr_ms": stats.mean("time_mr_ms"),
+        "avg_time_md_ms": stats.mean("time_md_ms"),
+        "zero_fetch_rate_pct": round(stats.total("got_304") / total_tested * 100.0, 2) if total_tested else 0.0,
+        "speedup_factor": round(stats.mean("time_html_ms") / stats.mean("time_mr_ms"), 2) if stats.mean("time_mr_ms") > 0 else 0.0,
+        "digest_mismatches": int(stats.total("digest_mismatch")),
+        "digest_missing": int(stats.total("digest_missing")),
+        "digest_mb_per_s": pool_stats["digest_mb_per_s"],
+        "resumed_posts": report.resumed,
+        "phases": {kind: stats.describe_prefix(f"phase.{kind}.") for kind in ("html", "mr", "md")},
+        "server_metrics": {
+            kind: stats.describe_prefix(f"srv.{kind}.") for kind in ("html", "mr", "md")
+        } if stats.names("srv.") else {},
+        "tokens": token_stats,
+        "catalog": catalog_stats,
+        "http_pool": pool_stats,
+        "archive": archive_stats,
+        "rate_control": rate_stats,
     }
 
     print(f"Writing summary to {args.json}...")
@@ -0,0 +1,46 @@
+"""Order of the Standard/DNI fetches within a benchmark pair."""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_api_vs_dni import standard_first  # noqa: E402
+
+
+def standard_first_share(order, posts, warmup, repeat):
+    """Share of measured pairs that ran Standard first, numbering pairs like benchmark_post()."""
+    first = total = 0
+    for idx in range(1, posts + 1):
+        rng = random.Random(f"0:{idx}")
+        for pair in range(warmup + repeat):
+            s_first = standard_first(order, idx, pair, rng)
+            if pair >= warmup:
+                first += s_first
+                total += 1
+    return first / total
+
+
+class StandardFirstTest(unittest.TestCase):
+    def test_alternate_splits_posts_at_default_settings(self):
+        self.assertEqual(standard_first_share("alternate", 1000, 0, 1), 0.5)
+
+    def test_alternate_splits_with_warmup_and_repeat(self):
+        for warmup, repeat in ((1, 1), (2, 9), (3, 4)):
+            self.assertAlmostEqual(standard_first_share("alternate", 1000, warmup, repeat), 0.5, places=2)
+
+    def test_alternate_flips_between_neighbouring_posts(self):
+        rng = random.Random(0)
+        self.assertNotEqual(standard_first("alternate", 1, 0, rng), standard_first("alternate", 2, 0, rng))
+
+    def test_random_is_about_even(self):
+        self.assertAlmostEqual(standard_first_share("random", 2000, 0, 1), 0.5, delta=0.05)
+
+    def test_fixed_is_always_standard_first(self):
+        self.assertEqual(standard_first_share("fixed", 10, 2, 3), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
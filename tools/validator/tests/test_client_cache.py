@@ -0,0 +1,74 @@
+"""DualNativeClient reads when a 304 cannot be answered from the cache."""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dni_client import DualNativeClient  # noqa: E402
+
+
+def mr_body(rid, cid):
+    return json.dumps({"rid": rid, "cid": cid, "title": f"Post {rid}", "blocks": []}).encode("utf-8")
+
+
+class FakeSite:
+    """Stands in for HttpPool: serves each post's current MR, 304 when If-None-Match names any tag."""
+
+    def __init__(self, posts):
+        self.posts = posts
+        self.requests = []
+        self.before_reply = None
+
+    def request(self, method, url, headers, body=None, timeout=None):
+        self.requests.append(dict(headers))
+        rid = int(url.rstrip("/").rsplit("/", 1)[-1])
+        cid = self.posts[rid]
+        if self.before_reply:
+            self.before_reply()
+        etag = {"etag": f'"{cid}"'}
+        # Like a shared cache in front of the site that answers any conditional request
+        if headers.get("If-None-Match"):
+            return 304, etag, b"", 1.0
+        return 200, etag, mr_body(rid, cid), 1.0
+
+    def close(self):
+        pass
+
+
+class NotModifiedWithoutBodyTest(unittest.TestCase):
+    def test_304_after_eviction_refetches_unconditionally(self):
+        site = FakeSite({1: "sha256-a", 2: "sha256-b"})
+        client = DualNativeClient("http://site.test", "u", "p", pool=site, cache_bytes=len(mr_body(1, "sha256-a")) + 10)
+        client.get_mr(1)
+        # Post 1 changes and is evicted while the conditional request is in flight
+        site.posts[1] = "sha256-a2"
+        site.before_reply = lambda: client.cache.put(("mr", 2), "sha256-b", mr_body(2, "sha256-b"))
+        mr = client.get_mr(1)
+        self.assertGreaterEqual(client.cache.evictions, 1)
+        self.assertEqual(mr["cid"], "sha256-a2")
+        self.assertIn("If-None-Match", site.requests[1])
+        self.assertNotIn("If-None-Match", site.requests[-1])
+
+    def test_304_with_a_different_validator_refetches(self):
+        site = FakeSite({7: "sha256-x"})
+        client = DualNativeClient("http://site.test", "u", "p", pool=site)
+        client.get_mr(7)
+        site.posts[7] = "sha256-y"
+        self.assertEqual(client.get_mr(7)["cid"], "sha256-y")
+        self.assertEqual(client.cached_cid(7), "sha256-y")
+        self.assertEqual(len(site.requests), 3)
+
+    def test_matching_304_is_served_from_cache(self):
+        site = FakeSite({3: "sha256-c"})
+        client = DualNativeClient("http://site.test", "u", "p", pool=site)
+        first = client.get_mr(3)
+        self.assertEqual(client.get_mr(3), first)
+        self.assertEqual(len(site.requests), 2)
+        self.assertEqual(client.stats()["not_modified"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
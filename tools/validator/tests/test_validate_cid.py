@@ -0,0 +1,86 @@
+"""dual_native_validate: CID mismatch severity and when the process pool is used."""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dni_cid import compute_cid  # noqa: E402
+from dni_http import FetchResult  # noqa: E402
+from dual_native_validate import PROCESS_POOL_MIN_POSTS, Validator  # noqa: E402
+
+
+def make_args(**over):
+    args = dict(checks="mr,etag_cid,cid", public=False, concurrency=2, rate="fixed", throttle_retries=0,
+                workers=2, json=None, junit=None, post=None)
+    args.update(over)
+    return argparse.Namespace(**args)
+
+
+class FakePool:
+    """Serves one MR whose declared CID is either right or deliberately wrong."""
+
+    def __init__(self, correct):
+        mr = {"rid": 5, "title": "T", "status": "publish", "word_count": 2,
+              "blocks": [{"type": "core/paragraph", "content": "Hello there"}]}
+        mr["cid"] = compute_cid(mr, ["cid", "links"]) if correct else "sha256-" + "0" * 64
+        self.body = json.dumps(mr).encode("utf-8")
+        self.cid = mr["cid"]
+
+    def fetch(self, url, headers=None, timeout=None):
+        return FetchResult(200, {"etag": f'"{self.cid}"', "content-type": "application/json"}, self.body, 1.0)
+
+
+def cid_status(args, correct=False, n_posts=1):
+    pool = FakePool(correct)
+    validator = Validator(args, "http://site.test", pool, {"Accept": "application/json"}, ["cid", "links"], n_posts)
+    try:
+        asyncio.run(validator.validate_post(1, {"rid": 5}))
+    finally:
+        validator.close()
+    counts = validator.tally.checks["cid"]
+    return next(s for s in ("pass", "warn", "fail") if counts[s])
+
+
+class CidSeverityTest(unittest.TestCase):
+    def test_single_post_mismatch_warns(self):
+        self.assertEqual(cid_status(make_args(post=5)), "warn")
+
+    def test_batch_mismatch_fails(self):
+        self.assertEqual(cid_status(make_args(posts="5")), "fail")
+
+    def test_match_passes_in_both_modes(self):
+        self.assertEqual(cid_status(make_args(post=5), correct=True), "pass")
+        self.assertEqual(cid_status(make_args(posts="5"), correct=True), "pass")
+
+
+class ProcessPoolTest(unittest.TestCase):
+    def pool_for(self, n_posts, **over):
+        validator = Validator(make_args(**over), "http://site.test", FakePool(True), {}, ["cid"], n_posts)
+        try:
+            return validator.procs is not None
+        finally:
+            validator.close()
+
+    def test_single_post_runs_in_process(self):
+        self.assertFalse(self.pool_for(1, post=5))
+
+    def test_small_batch_runs_in_process(self):
+        self.assertFalse(self.pool_for(PROCESS_POOL_MIN_POSTS - 1))
+
+    def test_large_batch_uses_the_pool(self):
+        self.assertTrue(self.pool_for(PROCESS_POOL_MIN_POSTS))
+
+    def test_no_pool_without_the_cid_check(self):
+        self.assertFalse(self.pool_for(10 * PROCESS_POOL_MIN_POSTS, checks="mr,mr_304"))
+
+    def test_large_batch_recomputes_in_the_pool(self):
+        self.assertEqual(cid_status(make_args(posts="5"), correct=True, n_posts=PROCESS_POOL_MIN_POSTS), "pass")
+
+
+if __name__ == "__main__":
+    unittest.main()